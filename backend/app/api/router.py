@@ -1,16 +1,30 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from app.models.air_quality import AirQualityData, AirQualityAnomaly
+from pydantic import ValidationError
+from app.config import settings
+from app.models.air_quality import AirQualityInput
 from app.services.database import db
 from app.services.rabbitmq import rabbitmq
-from app.utils.json_encoder import convert_mongo_document, dump_json
+from app.services.cache import aggregation_cache
+from app.services.rollups import rollups
+from app.services.stations import station_registry
+from app.services.sharding import raw_routing_key, group_by_routing_key
+from app.services.metrics import API_PUBLISH_SECONDS
+from app.services.tracing import tracer
+from app.utils.json_encoder import MongoJSONResponse
 import json
 import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+async def get_db() -> AsyncIOMotorDatabase:
+    """Aktif MongoDB veritabanı nesnesini döndürür."""
+    return db.db
+
 # Bu dosya, API endpoint'lerini organize etmek için kullanılacak
 # Şu an sadece temel yapı oluşturuluyor, ileride farklı router'lar eklenebilir:
 # - data_router.py (veri girişi ve sorgulamaları için)
@@ -18,59 +32,156 @@ router = APIRouter()
 # - map_router.py (harita görselleştirmesi için) 
 
 @router.post("/data", status_code=201)
-async def add_air_quality_data(data: AirQualityData):
+async def add_air_quality_data(data: AirQualityInput):
     """
     Yeni hava kalitesi verisi ekler ve RabbitMQ'ya mesaj gönderir.
     """
-    # Veriyi MongoDB dokümanına dönüştür
-    mongo_doc = data.to_mongo_document()
+    # Okumaya sunucuda kalıcı kimlik ver ve kayıtlı istasyona eşle
+    station_id = await station_registry.resolve(data.latitude, data.longitude, data.city, data.country)
+    reading = data.to_reading(station_id)
     
-    # RabbitMQ'ya gönder
-    await rabbitmq.publish("data.raw", mongo_doc)
+    # İstasyonun parça kuyruğuna gönder (location worker'da yeniden oluşturulur)
+    message = reading.to_message()
+    with API_PUBLISH_SECONDS.labels(endpoint="data").time():
+        await rabbitmq.publish(raw_routing_key(message), message, headers=tracer.start_headers())
     
     return {"status": "success", "message": "Veri başarıyla kuyruğa eklendi."}
 
+def _parse_batch_body(body: bytes, content_type: str) -> List[Tuple[Optional[Any], Optional[str]]]:
+    """
+    Toplu veri isteğinin gövdesini kayıt listesine ayırır.
+
+    JSON dizisi ve NDJSON (satır başına bir JSON nesnesi) formatlarını destekler.
+    NDJSON'da bozuk bir satır (geçersiz JSON ya da UTF-8) tüm isteği değil sadece o kaydı
+    geçersiz kılar.
+
+    Args:
+        body (bytes): İstek gövdesi
+        content_type (str): İsteğin Content-Type başlığı
+
+    Returns:
+        List[Tuple[Optional[Any], Optional[str]]]: (kayıt, hata mesajı) çiftleri
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        # Satırlar ayrı ayrı çözülür; bozuk UTF-8 sadece bulunduğu satırı geçersiz kılar
+        for raw_line in body.splitlines():
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                items.append((json.loads(raw_line.decode("utf-8")), None))
+            except UnicodeDecodeError:
+                items.append((None, "Geçersiz UTF-8 satırı"))
+            except json.JSONDecodeError as e:
+                items.append((None, f"Geçersiz JSON satırı: {e.msg}"))
+        return items
+
+    try:
+        payload = json.loads(body)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="İstek gövdesi geçerli UTF-8 değil")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Geçersiz JSON formatı: {e.msg}")
+
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="İstek gövdesi bir JSON dizisi olmalıdır")
+
+    return [(item, None) for item in payload]
+
+@router.post("/data/batch", status_code=201)
+async def add_air_quality_data_batch(request: Request):
+    """
+    Çok sayıda hava kalitesi verisini tek istekte kabul eder.
+
+    Gövde bir JSON dizisi ya da NDJSON (Content-Type: application/x-ndjson) olabilir.
+    Geçerli kayıtlar BATCH_PUBLISH_SIZE'lık gruplar halinde tek RabbitMQ mesajı
+    olarak yayınlanır, her kayıt için kabul/ret sonucu döndürülür.
+    """
+    items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tek istekte en fazla {settings.BATCH_MAX_ITEMS} kayıt gönderilebilir"
+        )
+
+    # Tüm kayıtları tek geçişte doğrula
+    accepted = []
+    results = []
+    for index, (item, parse_error) in enumerate(items):
+        if parse_error:
+            results.append({"index": index, "status": "rejected", "errors": [{"msg": parse_error}]})
+            continue
+        try:
+            accepted.append(AirQualityInput.parse_obj(item))
+        except ValidationError as e:
+            results.append({"index": index, "status": "rejected", "errors": e.errors()})
+            continue
+        results.append({"index": index, "status": "accepted"})
+
+    # Yeni konumların istasyonları okuma başına sırayla değil, birlikte çözülür
+    station_ids = await station_registry.resolve_many(
+        [(data.latitude, data.longitude, data.city, data.country) for data in accepted],
+        settings.STATION_RESOLVE_CONCURRENCY
+    )
+    accepted_docs = [data.to_reading(station_id).to_message() for data, station_id in zip(accepted, station_ids)]
+
+    if not accepted_docs:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Geçerli kayıt bulunamadı", "results": results}
+        )
+
+    # Kabul edilen kayıtları toplu mesajlar halinde RabbitMQ'ya gönder
+    # Parçalı düzende her parçanın okumaları kendi kuyruğuna gider
+    message_count = 0
+    with API_PUBLISH_SECONDS.labels(endpoint="batch").time():
+        for routing_key, docs in group_by_routing_key(accepted_docs).items():
+            message_count += await rabbitmq.publish_batch(
+                routing_key, docs, settings.BATCH_PUBLISH_SIZE, headers=tracer.start_headers()
+            )
+    logger.info(f"Toplu veri kuyruğa eklendi: {len(accepted_docs)} kayıt, {message_count} mesaj")
+
+    return {
+        "status": "success",
+        "accepted": len(accepted_docs),
+        "rejected": len(items) - len(accepted_docs),
+        "messages": message_count,
+        "results": results
+    }
+
 @router.get("/air-quality/{latitude}/{longitude}")
 async def get_air_quality_by_location(
     latitude: float, 
     longitude: float,
-    radius: float = Query(10.0, description="Arama yarıçapı (km)"),
+    radius: float = Query(10.0, gt=0, description="Arama yarıçapı (km)"),
     start_time: Optional[datetime] = Query(None, description="Başlangıç zamanı"),
     end_time: Optional[datetime] = Query(None, description="Bitiş zamanı"),
-    limit: int = Query(100, description="Maksimum sonuç sayısı")
+    limit: int = Query(100, description="Maksimum sonuç sayısı"),
+    sort: str = Query("time", pattern="^(time|distance)$", description="Sıralama: time (yeniden eskiye) veya distance (yakından uzağa)")
 ):
     """
     Belirli bir konuma yakın hava kalitesi verilerini getirir.
     """
     try:
-        # Basitleştirilmiş yaklaşım: sadece zamana göre filtrele
         if not start_time:
             start_time = datetime.utcnow() - timedelta(days=1)
         if not end_time:
             end_time = datetime.utcnow()
         
-        # Konum filtrelemeyi devre dışı bırak
-        query = {
-            "timestamp": {
-                "$gte": start_time,
-                "$lte": end_time
-            }
-        }
-        
-        # Veritabanından doğrudan veriler getir
-        logging.info(f"Hava kalitesi verisi sorgulanıyor (manüel): tarih={start_time} - {end_time}")
-        
-        # MongoDB'den doğrudan sorgula
-        collection = db.db.air_quality_data
-        cursor = collection.find(query).sort("timestamp", -1).limit(limit)
-        results = await cursor.to_list(length=limit)
+        logging.info(
+            f"Hava kalitesi verisi sorgulanıyor: konum={latitude}, {longitude}, "
+            f"yarıçap={radius} km, tarih={start_time} - {end_time}"
+        )
         
-        # ObjectId'leri string'e dönüştür
-        for result in results:
-            if "_id" in result:
-                result["_id"] = str(result["_id"])
+        # Konum + zaman bileşik indeksi ile sorgula
+        results = await db.get_air_quality_near(
+            latitude, longitude, radius, start_time, end_time, limit,
+            order_by_distance=(sort == "distance")
+        )
         
-        return results
+        return MongoJSONResponse(results)
     except Exception as e:
         logging.error(f"Hava kalitesi verisi alınırken hata: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Veri alınırken hata oluştu: {str(e)}")
@@ -86,16 +197,10 @@ async def get_anomalies(
     try:
         # Veritabanından anomalileri sorgula
         cursor = db.anomalies.find().sort("detected_at", -1).limit(limit)
-        anomalies = []
-        
-        # ObjectId dönüşümü ile anomalileri listele
-        async for doc in cursor:
-            # ObjectId'leri string'e dönüştür
-            doc["_id"] = str(doc["_id"])
-            anomalies.append(doc)
+        anomalies = await cursor.to_list(length=limit)
             
         logger.info(f"{len(anomalies)} anomali bulundu ve döndürüldü")
-        return anomalies
+        return MongoJSONResponse(anomalies)
     except Exception as e:
         logger.error(f"Anomalileri alırken hata: {str(e)}")
         raise HTTPException(
@@ -103,6 +208,59 @@ async def get_anomalies(
             detail=f"Anomaliler alınırken bir hata oluştu: {str(e)}"
         )
 
+async def _aggregate_pollution_density(
+    parameter: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime]
+) -> List[Dict[str, Any]]:
+    """
+    Şehir bazında kirlilik yoğunluğu aggregation'ını çalıştırır.
+    
+    Args:
+        parameter (str): Kirlilik parametresi
+        start_time (Optional[datetime]): Başlangıç zamanı, yoksa son 24 saat
+        end_time (Optional[datetime]): Bitiş zamanı, yoksa şimdi
+    
+    Returns:
+        List[Dict[str, Any]]: Şehir bazında yoğunluk sonuçları
+    """
+    if not start_time:
+        start_time = datetime.utcnow() - timedelta(days=1)
+    if not end_time:
+        end_time = datetime.utcnow()
+    
+    # Aggregate sorgusu oluştur
+    pipeline = [
+        {
+            "$match": {
+                parameter: {"$exists": True},
+                "timestamp": {
+                    "$gte": start_time,
+                    "$lte": end_time
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "city": "$city",
+                    "country": "$country"
+                },
+                "avg_value": {"$avg": f"${parameter}"},
+                "max_value": {"$max": f"${parameter}"},
+                "count": {"$sum": 1},
+                "location": {"$first": "$location"}
+            }
+        },
+        {
+            "$sort": {"avg_value": -1}
+        }
+    ]
+    
+    # Veritabanından yoğunluk verilerini getir
+    logging.info(f"Kirlilik yoğunluğu verisi sorgulanıyor: parametre={parameter}")
+    return await db.aggregate_pollution_data(pipeline)
+
 @router.get("/pollution-density")
 async def get_pollution_density(
     parameter: str = Query(..., description="Yoğunluğu görüntülenecek kirlilik parametresi"),
@@ -113,43 +271,20 @@ async def get_pollution_density(
     Coğrafi bölgeye göre kirlilik yoğunluğunu getirir.
     """
     try:
-        if not start_time:
-            start_time = datetime.utcnow() - timedelta(days=1)
-        if not end_time:
-            end_time = datetime.utcnow()
-        
-        # Aggregate sorgusu oluştur
-        pipeline = [
-            {
-                "$match": {
-                    parameter: {"$exists": True},
-                    "timestamp": {
-                        "$gte": start_time,
-                        "$lte": end_time
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "city": "$city",
-                        "country": "$country"
-                    },
-                    "avg_value": {"$avg": f"${parameter}"},
-                    "max_value": {"$max": f"${parameter}"},
-                    "count": {"$sum": 1},
-                    "location": {"$first": "$location"}
-                }
-            },
-            {
-                "$sort": {"avg_value": -1}
-            }
-        ]
+        async def compute():
+            if settings.ROLLUP_READS:
+                end = end_time or datetime.utcnow()
+                start = start_time or end - timedelta(days=1)
+                return await rollups.density(parameter, start, end)
+            return await _aggregate_pollution_density(parameter, start_time, end_time)
         
-        # Veritabanından yoğunluk verilerini getir
-        logging.info(f"Kirlilik yoğunluğu verisi sorgulanıyor: parametre={parameter}")
-        results = await db.aggregate_pollution_data(pipeline)
-        return results
+        # Sadece varsayılan pencere (son 24 saat) önbelleğe alınır; göreli olduğu için tüm istemciler
+        # aynı kaydı paylaşır. İsteğe özel pencereler tekrar kullanılmaz, önbelleği sadece doldururlar.
+        if start_time or end_time:
+            results = await compute()
+        else:
+            results = await aggregation_cache.get_or_compute(("density", parameter, "24h", "city"), compute)
+        return MongoJSONResponse(results)
     except Exception as e:
         logging.error(f"Kirlilik yoğunluğu verisi alınırken hata: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Veri alınırken hata oluştu: {str(e)}") 
\ No newline at end of file
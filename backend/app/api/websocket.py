@@ -1,38 +1,99 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple, Deque
 import asyncio
 import json
 import logging
+import time
+from collections import deque
 from datetime import datetime, timedelta
+from app.config import settings
 from app.services.database import db
 from app.services.rabbitmq import rabbitmq
-from app.services.anomaly_detection import anomaly_detector
-import json
+from app.services.codec import decode_message
+from app.services.cache import aggregation_cache
+from app.services.rollups import rollups
+from app.services.metrics import WEBSOCKET_BROADCAST_SECONDS, WEBSOCKET_SEND_SECONDS
+from app.services.tracing import TraceContext, tracer
+from app.utils.json_encoder import dump_json
 from pydantic import BaseModel, Field
 from bson import ObjectId
 
 logger = logging.getLogger(__name__)
 
+# Kanal başına yavaş istemci politikası:
+#   drop_oldest: kuyruk doluysa en eski bekleyen mesaj atılır
+#   coalesce:    aynı türdeki bekleyen mesaj en yenisiyle değiştirilir, yine doluysa en eskisi atılır
+#   disconnect:  kuyruk doluysa bağlantı kapatılır (istemci yeniden bağlanıp baştan alır)
+SLOW_CONSUMER_POLICIES = {
+    "air_quality": "drop_oldest",
+    "anomalies": "disconnect",
+    "map_data": "coalesce"
+}
+
+class _Outbound:
+    """
+    Tek bir WebSocket bağlantısının sınırlı gönderim kuyruğu ve gönderici görevi.
+    Kuyruk, (birleştirme anahtarı, JSON metni) çiftlerini eskiden yeniye tutar.
+    """
+    
+    __slots__ = ("websocket", "channel", "queue", "ready", "task", "send_seconds")
+    
+    def __init__(self, websocket: WebSocket, channel: str):
+        self.websocket = websocket
+        self.channel = channel
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Gönderim süresi histogramı; etiket bağlantı başına bir kez çözülür
+        self.send_seconds = WEBSOCKET_SEND_SECONDS.labels(channel=channel)
+
 # WebSocket bağlantılarını yönetmek için manager sınıfı
 class ConnectionManager:
-    def __init__(self):
+    """
+    WebSocket bağlantılarını kanal bazında yönetir.
+    
+    Her bağlantının sınırlı bir gönderim kuyruğu ve kendi gönderici görevi vardır. Yayın,
+    mesajı bir kez serileştirip tüm kuyruklara bekletmeden ekler; böylece yavaş bir istemci
+    diğer istemcilere teslimatı geciktirmez. Kuyruğu dolan bağlantıya kanalın politikası uygulanır.
+    """
+    
+    def __init__(self, queue_size: int = 100, send_timeout: float = 10.0):
+        self.queue_size = max(1, queue_size)
+        self.send_timeout = send_timeout
         # Tüm aktif bağlantılar
         self.active_connections: Dict[str, List[WebSocket]] = {
             "air_quality": [],     # Hava kalitesi verileri için bağlantılar
             "anomalies": [],       # Anomali bildirimleri için bağlantılar
             "map_data": []         # Harita verisi için bağlantılar
         }
+        self._outbound: Dict[WebSocket, _Outbound] = {}
+        # Kanal başına gönderim sayaçları
+        self._counters: Dict[str, Dict[str, int]] = {
+            channel: {"sent": 0, "dropped": 0, "coalesced": 0, "slow_disconnects": 0}
+            for channel in self.active_connections
+        }
+        # Kanal başına histogramlar bir kez bağlanır; yayın başına etiket çözümlemesi yapılmaz
+        self._broadcast_seconds = {
+            channel: WEBSOCKET_BROADCAST_SECONDS.labels(channel=channel)
+            for channel in self.active_connections
+        }
     
     async def connect(self, websocket: WebSocket, channel: str):
         await websocket.accept()
         if channel in self.active_connections:
             self.active_connections[channel].append(websocket)
+            outbound = _Outbound(websocket, channel)
+            outbound.task = asyncio.create_task(self._sender(outbound))
+            self._outbound[websocket] = outbound
             logger.info(f"Yeni WebSocket bağlantısı ({channel}): {websocket.client.host}")
         else:
             await websocket.close(code=1003, reason=f"Bilinmeyen kanal: {channel}")
             logger.warning(f"Bilinmeyen kanala bağlantı isteği: {channel}")
     
     def disconnect(self, websocket: WebSocket, channel: str):
+        outbound = self._outbound.pop(websocket, None)
+        if outbound and outbound.task and outbound.task is not asyncio.current_task():
+            outbound.task.cancel()
         if channel in self.active_connections:
             try:
                 self.active_connections[channel].remove(websocket)
@@ -44,27 +105,107 @@ class ConnectionManager:
         """Belirli bir kanaldaki tüm bağlantılara mesaj gönderir"""
         if channel not in self.active_connections:
             return
-            
-        if isinstance(message, dict) or isinstance(message, list):
-            message_json = json.dumps(message)
+        
+        await self.send_to(list(self.active_connections[channel]), message, channel)
+    
+    async def send_personal(self, websocket: WebSocket, message: Any, channel: str):
+        """
+        Tek bir bağlantıya, yayınlarla aynı gönderim kuyruğu üzerinden mesaj gönderir.
+        
+        Args:
+            websocket (WebSocket): Hedef bağlantı
+            message (Any): Gönderilecek mesaj
+            channel (str): Bağlantının ait olduğu kanal
+        """
+        await self.send_to([websocket], message, channel)
+    
+    async def send_to(self, websockets: List[WebSocket], message: Any, channel: str,
+                      coalesce_key: Optional[str] = None):
+        """
+        Mesajı bir kez serileştirip verilen bağlantıların gönderim kuyruklarına ekler.
+        Gönderimi beklemez; mesajlar her bağlantının kendi görevi tarafından iletilir.
+        
+        Args:
+            websockets (List[WebSocket]): Hedef bağlantılar
+            message (Any): Gönderilecek mesaj (dict/list ise JSON'a dönüştürülür)
+            channel (str): Bağlantıların ait olduğu kanal
+            coalesce_key (Optional[str], optional): Birleştirme anahtarı; verilmezse mesaj türünden türetilir
+        """
+        started = time.perf_counter()
+        if isinstance(message, dict):
+            if coalesce_key is None and "type" in message:
+                coalesce_key = f"{message['type']}:{message.get('parameter', '')}"
+            message_json = dump_json(message)
+        elif isinstance(message, list):
+            message_json = dump_json(message)
         else:
             message_json = str(message)
+        
+        for websocket in websockets:
+            outbound = self._outbound.get(websocket)
+            if outbound is not None:
+                self._enqueue(outbound, coalesce_key, message_json)
+        histogram = self._broadcast_seconds.get(channel)
+        if histogram is None:
+            histogram = self._broadcast_seconds[channel] = WEBSOCKET_BROADCAST_SECONDS.labels(channel=channel)
+        histogram.observe(time.perf_counter() - started)
+    
+    def _enqueue(self, outbound: _Outbound, key: Optional[str], message_json: str):
+        """Mesajı bağlantının kuyruğuna ekler, kuyruk doluysa kanalın politikasını uygular."""
+        policy = SLOW_CONSUMER_POLICIES.get(outbound.channel, "drop_oldest")
+        counters = self._counters[outbound.channel]
+        queue = outbound.queue
+        
+        if policy == "coalesce" and key is not None:
+            for index, (queued_key, _) in enumerate(queue):
+                if queued_key == key:
+                    # Bekleyen eski sürüm yerine yenisi, sıradaki yerini koruyarak gönderilir
+                    queue[index] = (key, message_json)
+                    counters["coalesced"] += 1
+                    return
+        
+        if len(queue) >= self.queue_size:
+            if policy == "disconnect":
+                counters["slow_disconnects"] += 1
+                logger.warning(
+                    f"Yavaş WebSocket istemcisi bağlantısı kesiliyor ({outbound.channel}): "
+                    f"{outbound.websocket.client.host}"
+                )
+                self.disconnect(outbound.websocket, outbound.channel)
+                asyncio.create_task(self._close(outbound.websocket))
+                return
+            queue.popleft()
+            counters["dropped"] += 1
+        
+        queue.append((key, message_json))
+        outbound.ready.set()
+    
+    async def _sender(self, outbound: _Outbound):
+        """Bağlantının kuyruğundaki mesajları sırayla gönderir."""
+        while True:
+            while not outbound.queue:
+                outbound.ready.clear()
+                await outbound.ready.wait()
             
-        # İlgili kanaldaki tüm bağlantılara mesajı gönder
-        disconnected_ws = []
-        for connection in self.active_connections[channel]:
+            _, message_json = outbound.queue.popleft()
+            started = time.perf_counter()
             try:
-                await connection.send_text(message_json)
+                await asyncio.wait_for(outbound.websocket.send_text(message_json), timeout=self.send_timeout)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"WebSocket mesajı gönderilirken hata: {str(e)}")
-                disconnected_ws.append(connection)
-        
-        # Hata alınan bağlantıları kaldır
-        for ws in disconnected_ws:
-            try:
-                self.active_connections[channel].remove(ws)
-            except ValueError:
-                pass
+                logger.error(f"WebSocket mesajı gönderilirken hata: {str(e) or type(e).__name__}")
+                self.disconnect(outbound.websocket, outbound.channel)
+                return
+            outbound.send_seconds.observe(time.perf_counter() - started)
+            self._counters[outbound.channel]["sent"] += 1
+    
+    async def _close(self, websocket: WebSocket):
+        """Bağlantıyı 1013 (daha sonra tekrar deneyin) koduyla kapatır."""
+        try:
+            await websocket.close(code=1013, reason="Gönderim kuyruğu doldu")
+        except Exception:
+            pass
     
     def get_connection_count(self, channel: str = None) -> Dict[str, int]:
         """Aktif bağlantı sayısını döndürür"""
@@ -74,9 +215,25 @@ class ConnectionManager:
             return {channel: 0}
         else:
             return {k: len(v) for k, v in self.active_connections.items()}
+    
+    def get_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Kanal başına gönderim kuyruğu derinliği ve atılan/birleştirilen mesaj sayaçlarını döndürür"""
+        stats = {}
+        for channel, counters in self._counters.items():
+            depths = [len(o.queue) for o in self._outbound.values() if o.channel == channel]
+            stats[channel] = {
+                "policy": SLOW_CONSUMER_POLICIES.get(channel, "drop_oldest"),
+                "queue_depth": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                **counters
+            }
+        return stats
 
 # Manager oluştur
-manager = ConnectionManager()
+manager = ConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    send_timeout=settings.WS_SEND_TIMEOUT
+)
 
 # WebSocket Router
 websocket_router = APIRouter()
@@ -119,25 +276,25 @@ async def websocket_air_quality(websocket: WebSocket):
                 results = await db.get_air_quality_data(query, limit)
                 
                 # İstemciye verilerti gönder
-                await websocket.send_json({
+                await manager.send_personal(websocket, {
                     "type": "air_quality_data",
                     "data": results,
                     "timestamp": datetime.utcnow().isoformat(),
                     "count": len(results)
-                })
+                }, "air_quality")
                 
             except json.JSONDecodeError:
                 logger.error(f"WebSocket mesajı JSON formatında değil: {data}")
-                await websocket.send_json({
+                await manager.send_personal(websocket, {
                     "type": "error",
                     "message": "Geçersiz JSON formatı"
-                })
+                }, "air_quality")
             except Exception as e:
                 logger.error(f"WebSocket veri işlenirken hata: {str(e)}")
-                await websocket.send_json({
+                await manager.send_personal(websocket, {
                     "type": "error",
                     "message": f"İşlem hatası: {str(e)}"
-                })
+                }, "air_quality")
             
             # Her istek arasında kısa bir süre bekle (rate limiting)
             await asyncio.sleep(1)
@@ -160,12 +317,12 @@ async def websocket_anomalies(websocket: WebSocket):
         }
         recent_anomalies = await db.get_anomalies(query, 50)
         
-        await websocket.send_json({
+        await manager.send_personal(websocket, {
             "type": "initial_anomalies",
             "data": recent_anomalies,
             "timestamp": datetime.utcnow().isoformat(),
             "count": len(recent_anomalies)
-        })
+        }, "anomalies")
         
         # Bağlantı açık kaldığı sürece bekle
         while True:
@@ -173,10 +330,10 @@ async def websocket_anomalies(websocket: WebSocket):
                 # İstemciden mesaj bekle (ping için)
                 data = await websocket.receive_text()
                 # Heartbeat cevabı gönder
-                await websocket.send_json({
+                await manager.send_personal(websocket, {
                     "type": "heartbeat",
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }, "anomalies")
             except Exception as e:
                 logger.error(f"WebSocket mesajı alınırken hata: {str(e)}")
                 await asyncio.sleep(30)  # Hata durumunda bekle
@@ -186,59 +343,184 @@ async def websocket_anomalies(websocket: WebSocket):
         logger.error(f"WebSocket bağlantısında hata: {str(e)}")
         manager.disconnect(websocket, "anomalies")
 
-@websocket_router.websocket("/ws/map-data")
-async def websocket_map_data(websocket: WebSocket):
-    """Harita görselleştirmesi için gerçek zamanlı veri"""
-    await manager.connect(websocket, "map_data")
-    try:
-        while True:
+def _map_window(time_window: str) -> Tuple[datetime, datetime]:
+    """
+    Harita zaman penceresini (başlangıç, bitiş) aralığına çevirir.
+    
+    Args:
+        time_window (str): Zaman penceresi (1h, 24h, 7d)
+    
+    Returns:
+        Tuple[datetime, datetime]: Pencerenin başlangıç ve bitiş zamanı
+    """
+    end_time = datetime.utcnow()
+    if time_window == "1h":
+        start_time = end_time - timedelta(hours=1)
+    elif time_window == "24h":
+        start_time = end_time - timedelta(days=1)
+    elif time_window == "7d":
+        start_time = end_time - timedelta(days=7)
+    else:
+        start_time = end_time - timedelta(hours=1)  # Varsayılan
+    return start_time, end_time
+
+async def _aggregate_map_data(parameter: str, time_window: str) -> List[Dict[str, Any]]:
+    """
+    Harita için konum bazında kirlilik aggregation'ını ham veriler üzerinde çalıştırır.
+    
+    Args:
+        parameter (str): Kirlilik parametresi
+        time_window (str): Zaman penceresi (1h, 24h, 7d)
+    
+    Returns:
+        List[Dict[str, Any]]: Konum bazında harita verisi
+    """
+    # Zaman penceresi seçimi
+    start_time, end_time = _map_window(time_window)
+    
+    # Harita verisi için aggregate pipeline oluştur
+    pipeline = [
+        {
+            "$match": {
+                parameter: {"$exists": True},
+                "timestamp": {"$gte": start_time, "$lte": end_time}
+            }
+        },
+        {
+            "$group": {
+                # İstasyonu bilinmeyen eski okumalar konumlarına göre gruplanır
+                "_id": {"$ifNull": ["$meta.station", "$location"]},
+                "avg_value": {"$avg": f"${parameter}"},
+                "max_value": {"$max": f"${parameter}"},
+                "latest": {"$max": "$timestamp"},
+                "count": {"$sum": 1},
+                "latitude": {"$first": "$latitude"},
+                "longitude": {"$first": "$longitude"},
+                "city": {"$first": "$city"},
+                "country": {"$first": "$country"},
+                "location": {"$first": "$location"}
+            }
+        },
+        {
+            "$addFields": {"_id": "$location"}
+        },
+        {
+            "$project": {"location": 0}
+        }
+    ]
+    
+    return await db.aggregate_pollution_data(pipeline)
+
+async def get_map_data(parameter: str, time_window: str) -> List[Dict[str, Any]]:
+    """
+    Harita verisini paylaşılan aggregation önbelleğinden döndürür.
+    Aynı (parametre, pencere) için tüm istemciler tek bir aggregation sonucunu paylaşır.
+    
+    Args:
+        parameter (str): Kirlilik parametresi
+        time_window (str): Zaman penceresi (1h, 24h, 7d)
+    
+    Returns:
+        List[Dict[str, Any]]: Konum bazında harita verisi
+    """
+    async def compute():
+        if settings.ROLLUP_READS:
+            start_time, end_time = _map_window(time_window)
+            return await rollups.map_data(parameter, start_time, end_time)
+        return await _aggregate_map_data(parameter, time_window)
+    
+    return await aggregation_cache.get_or_compute(("map", parameter, time_window, "location"), compute)
+
+class MapDataPublisher:
+    """
+    Harita verisini (parametre, zaman penceresi) aboneliği başına tek bir üretici görevle
+    hesaplayıp o aboneliğe bağlı tüm WebSocket'lere iter.
+    
+    Veritabanı yükü istemci sayısından bağımsızdır; aktif abonelik sayısıyla orantılıdır.
+    Bir aboneliğin son abonesi ayrıldığında üretici görevi durdurulur.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        # Abonelik -> abone WebSocket'ler
+        self._subscribers: Dict[Tuple[str, str], Set[WebSocket]] = {}
+        # WebSocket -> aboneliği
+        self._subscriptions: Dict[WebSocket, Tuple[str, str]] = {}
+        self._producers: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Yeni veri geldiğinde üreticiyi beklemeden uyandırmak için
+        self._wakeups: Dict[Tuple[str, str], asyncio.Event] = {}
+        # Son üretilen anlık görüntü; yeni abonelere hemen gönderilir
+        self._snapshots: Dict[Tuple[str, str], str] = {}
+    
+    async def subscribe(self, websocket: WebSocket, parameter: str, time_window: str):
+        """
+        WebSocket'i bir aboneliğe bağlar, varsa önceki aboneliğinden çıkarır.
+        
+        Args:
+            websocket (WebSocket): Abone olacak bağlantı
+            parameter (str): Kirlilik parametresi
+            time_window (str): Zaman penceresi (1h, 24h, 7d)
+        """
+        key = (parameter, time_window)
+        if self._subscriptions.get(websocket) == key:
+            return
+        self.unsubscribe(websocket)
+        
+        self._subscribers.setdefault(key, set()).add(websocket)
+        self._subscriptions[websocket] = key
+        
+        if key not in self._producers:
+            self._wakeups[key] = asyncio.Event()
+            self._producers[key] = asyncio.create_task(self._produce(key))
+            logger.info(f"Harita üreticisi başlatıldı: {parameter}/{time_window}")
+        elif key in self._snapshots:
+            await manager.send_to([websocket], self._snapshots[key], "map_data", coalesce_key="map_data")
+    
+    def unsubscribe(self, websocket: WebSocket):
+        """
+        WebSocket'i aboneliğinden çıkarır; abonelik boşaldıysa üreticisini durdurur.
+        
+        Args:
+            websocket (WebSocket): Ayrılan bağlantı
+        """
+        key = self._subscriptions.pop(websocket, None)
+        if key is None:
+            return
+        
+        subscribers = self._subscribers.get(key)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if subscribers:
+                return
+            del self._subscribers[key]
+        
+        task = self._producers.pop(key, None)
+        if task:
+            task.cancel()
+        self._wakeups.pop(key, None)
+        self._snapshots.pop(key, None)
+        logger.info(f"Harita üreticisi durduruldu: {key[0]}/{key[1]}")
+    
+    def notify(self, parameter: Optional[str] = None):
+        """
+        Parametreye ait üreticileri bir sonraki periyodu beklemeden yeniden hesaplamaya çağırır.
+        
+        Args:
+            parameter (Optional[str], optional): Değişen parametre, None ise tüm üreticiler
+        """
+        for key, wakeup in self._wakeups.items():
+            if parameter is None or key[0] == parameter:
+                wakeup.set()
+    
+    async def _produce(self, key: Tuple[str, str]):
+        """Aboneliğin anlık görüntüsünü periyodik olarak hesaplayıp abonelere gönderir."""
+        parameter, time_window = key
+        wakeup = self._wakeups[key]
+        
+        while key in self._subscribers:
             try:
-                # İstemciden gelen filtreleri al
-                data = await websocket.receive_text()
-                message = json.loads(data)
-                
-                parameter = message.get("parameter", "pm25")
-                time_window = message.get("time_window", "1h")
-                
-                # Zaman penceresi seçimi
-                end_time = datetime.utcnow()
-                if time_window == "1h":
-                    start_time = end_time - timedelta(hours=1)
-                elif time_window == "24h":
-                    start_time = end_time - timedelta(days=1)
-                elif time_window == "7d":
-                    start_time = end_time - timedelta(days=7)
-                else:
-                    start_time = end_time - timedelta(hours=1)  # Varsayılan
-                
-                # Harita verisi için aggregate pipeline oluştur
-                pipeline = [
-                    {
-                        "$match": {
-                            parameter: {"$exists": True},
-                            "timestamp": {"$gte": start_time, "$lte": end_time}
-                        }
-                    },
-                    {
-                        "$group": {
-                            "_id": "$location",
-                            "avg_value": {"$avg": f"${parameter}"},
-                            "max_value": {"$max": f"${parameter}"},
-                            "latest": {"$max": "$timestamp"},
-                            "count": {"$sum": 1},
-                            "latitude": {"$first": "$latitude"},
-                            "longitude": {"$first": "$longitude"},
-                            "city": {"$first": "$city"},
-                            "country": {"$first": "$country"}
-                        }
-                    }
-                ]
-                
-                # Verileri getir
-                results = await db.aggregate_pollution_data(pipeline)
-                
-                # Sonuçları istemciye gönder
-                await websocket.send_json({
+                results = await get_map_data(parameter, time_window)
+                snapshot = dump_json({
                     "type": "map_data",
                     "parameter": parameter,
                     "time_window": time_window,
@@ -246,25 +528,76 @@ async def websocket_map_data(websocket: WebSocket):
                     "timestamp": datetime.utcnow().isoformat(),
                     "count": len(results)
                 })
-                
+                self._snapshots[key] = snapshot
+                await manager.send_to(list(self._subscribers.get(key, ())), snapshot, "map_data", coalesce_key="map_data")
+            except Exception as e:
+                logger.error(f"Harita verisi hazırlanırken hata: {str(e)}")
+            
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Abonelik istatistiklerini döndürür."""
+        return {
+            "subscriptions": len(self._subscribers),
+            "subscribers": len(self._subscriptions)
+        }
+
+# Harita yayıncısı oluştur
+map_publisher = MapDataPublisher(interval=settings.MAP_REFRESH_INTERVAL)
+
+# Harita aboneliklerinde kabul edilen değerler
+MAP_PARAMETERS = {"pm25", "pm10", "no2", "so2", "o3"}
+MAP_TIME_WINDOWS = {"1h", "24h", "7d"}
+
+@websocket_router.websocket("/ws/map-data")
+async def websocket_map_data(websocket: WebSocket):
+    """
+    Harita görselleştirmesi için gerçek zamanlı veri.
+    
+    Bağlantı varsayılan olarak pm25/1h aboneliğiyle başlar. İstemci
+    {"parameter": ..., "time_window": ...} göndererek aboneliğini değiştirebilir;
+    güncellemeler istemciden mesaj beklenmeden paylaşılan üreticiden gelir.
+    """
+    await manager.connect(websocket, "map_data")
+    try:
+        await map_publisher.subscribe(websocket, "pm25", "1h")
+        
+        while True:
+            # İstemciden gelen abonelik değişikliklerini al
+            data = await websocket.receive_text()
+            try:
+                message = json.loads(data)
             except json.JSONDecodeError:
-                await websocket.send_json({
+                await manager.send_personal(websocket, {
                     "type": "error",
                     "message": "Geçersiz JSON formatı"
-                })
-            except Exception as e:
-                logger.error(f"Harita verisi hazırlanırken hata: {str(e)}")
-                await websocket.send_json({
+                }, "map_data")
+                continue
+            
+            parameter = message.get("parameter", "pm25")
+            time_window = message.get("time_window", "1h")
+            if time_window not in MAP_TIME_WINDOWS:
+                time_window = "1h"  # Varsayılan
+            
+            if parameter not in MAP_PARAMETERS:
+                await manager.send_personal(websocket, {
                     "type": "error",
-                    "message": str(e)
-                })
+                    "message": f"Bilinmeyen parametre: {parameter}"
+                }, "map_data")
+                continue
             
-            await asyncio.sleep(5)  # Her güncelleme arasında 5 saniye bekle
+            await map_publisher.subscribe(websocket, parameter, time_window)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket, "map_data")
+        pass
     except Exception as e:
         logger.error(f"WebSocket bağlantısında hata: {str(e)}")
+    finally:
+        map_publisher.unsubscribe(websocket)
         manager.disconnect(websocket, "map_data")
 
 @websocket_router.get("/ws/stats")
@@ -273,83 +606,129 @@ async def get_websocket_stats():
     stats = manager.get_connection_count()
     return {
         "active_connections": stats,
-        "total_connections": sum(stats.values())
+        "total_connections": sum(stats.values()),
+        "aggregation_cache": aggregation_cache.get_stats(),
+        "map_subscriptions": map_publisher.get_stats(),
+        "send_queues": manager.get_queue_stats()
     }
 
+async def _broadcast_anomaly_batch(messages: List[Any]):
+    """
+    Kuyruktan alınmış bir grup anomali mesajını WebSocket istemcilerine yayınlar
+    ve mesajları tek bir toplu onay (multiple ack) ile onaylar.
+    
+    Args:
+        messages (List[Any]): Geliş sırasıyla aio_pika mesajları
+    """
+    parameters = set()
+    
+    for message in messages:
+        trace = TraceContext.from_headers(message.headers)
+        if trace is not None:
+            trace.mark("anomaly_queue")
+        
+        try:
+            data = decode_message(message)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"Anomali mesajı çözümlenemedi, atlanıyor: {str(e)}")
+            continue
+        if not isinstance(data, dict):
+            # Geçerli JSON olsa da nesne olmayan bildirim grubun geri kalanını düşürmesin
+            logger.error(f"Anomali mesajı nesne değil ({type(data).__name__}), atlanıyor")
+            continue
+        
+        # WebSocket üzerinden yayınla
+        await manager.broadcast({
+            "type": "new_anomaly",
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat()
+        }, "anomalies")
+        
+        # Worker bildirimi anomali dokümanını "data" alanında taşır
+        anomaly = data.get("data") if isinstance(data.get("data"), dict) else data
+        parameters.add(anomaly.get("parameter"))
+        
+        if trace is not None:
+            trace.mark("fanout")
+            tracer.record(
+                trace, "anomaly",
+                parameter=anomaly.get("parameter"),
+                severity=anomaly.get("severity"),
+                connections=len(manager.active_connections.get("anomalies", []))
+            )
+    
+    # Harita verisi güncelleme sinyali (parametre başına bir kez)
+    for parameter in parameters:
+        map_publisher.notify(parameter)
+        await manager.broadcast({
+            "type": "map_update_needed",
+            "source": "anomaly",
+            "parameter": parameter,
+            "timestamp": datetime.utcnow().isoformat()
+        }, "map_data")
+    
+    # Son mesajı multiple=True ile onaylamak, aynı kanaldaki önceki tüm mesajları da onaylar
+    await messages[-1].ack(multiple=True)
+    logger.info(f"{len(messages)} anomali mesajı WebSocket üzerinden yayınlandı")
+
 # RabbitMQ'dan gelen anomali bildirimlerini dinlemek için task
 async def listen_for_anomalies():
-    """RabbitMQ'dan anomali bildirimlerini dinler ve WebSocket üzerinden yayınlar"""
+    """
+    RabbitMQ'dan anomali bildirimlerini dinler ve WebSocket üzerinden yayınlar.
+    
+    Kuyruk, prefetch uygulanmış bir push tüketici ile dinlenir. Gelen mesajlar yerel bir
+    kuyrukta toplanır; yayın döngüsü her uyanışında biriken mesajları (en fazla
+    ANOMALY_DRAIN_BATCH_SIZE) tek seferde boşaltıp hemen yayınlar.
+    """
     logger.info("Anomali dinleme görevi başlatıldı")
-    # Başlangıçta RabbitMQ bağlantısının hazır olması için bekle
-    await asyncio.sleep(5)
+    inbox: asyncio.Queue = asyncio.Queue()
+    
+    async def on_message(message):
+        inbox.put_nowait(message)
     
+    # RabbitMQ bağlantısı ve kuyruk hazır olana kadar tüketiciyi başlatmayı dene
     while True:
         try:
-            # Anomali bildirimlerini doğrudan RabbitMQ'dan al
-            try:
-                # RabbitMQ bağlantısı ve kuyruk kontrolü
-                if not rabbitmq.connection or not rabbitmq.channel:
-                    logger.warning("RabbitMQ bağlantısı hazır değil. Yeniden denenecek...")
-                    await asyncio.sleep(5)
-                    continue
-                
-                # Kuyruklar hazır mı kontrol et
-                if "anomaly_notifications" not in rabbitmq.queues:
-                    logger.warning("Anomali kuyruğu bulunamadı. Yeniden denenecek...")
-                    # Kuyrukları yeniden oluşturmayı dene
-                    try:
-                        await rabbitmq.setup_exchanges_and_queues()
-                    except Exception as e:
-                        logger.error(f"Kuyruklar oluşturulurken hata: {str(e)}")
-                    await asyncio.sleep(5)
-                    continue
-                
-                # Kuyruk nesnesini al
-                queue = rabbitmq.queues["anomaly_notifications"]
-                
-                # Mesaj alma işlemini güvenli bir şekilde yap
-                try:
-                    # aio_pika kütüphanesini doğrudan kullan
-                    message = await queue.get(fail=False)
-                    if message:
-                        # Mesajı ack'le
-                        await message.ack()
-                        
-                        # Mesaj içeriğini parse et
-                        message_body = message.body.decode()
-                        data = json.loads(message_body)
-                        
-                        # WebSocket üzerinden yayınla (ObjectId'leri string'e dönüştür)
-                        message_json = json.dumps(data, default=lambda o: str(o) if isinstance(o, ObjectId) else o)
-                        parsed_data = json.loads(message_json)
-                        
-                        # WebSocket üzerinden yayınla
-                        await manager.broadcast({
-                            "type": "new_anomaly",
-                            "data": parsed_data,
-                            "timestamp": datetime.utcnow().isoformat()
-                        }, "anomalies")
-                        
-                        # Harita verisi güncelleme sinyali
-                        await manager.broadcast({
-                            "type": "map_update_needed",
-                            "source": "anomaly",
-                            "parameter": data.get("parameter"),
-                            "timestamp": datetime.utcnow().isoformat()
-                        }, "map_data")
-                        
-                        logger.info(f"Anomali mesajı WebSocket üzerinden yayınlandı: {data.get('parameter')}")
-                except Exception as e:
-                    logger.error(f"Mesaj alınırken/işlenirken hata: {str(e)}")
-            except Exception as e:
-                logger.error(f"Anomali mesajı alınırken hata: {str(e)}")
+            if not rabbitmq.connection or not rabbitmq.channel:
+                logger.warning("RabbitMQ bağlantısı hazır değil. Yeniden denenecek...")
+                await asyncio.sleep(5)
+                continue
             
-            # Kısa bir süre bekle
-            await asyncio.sleep(0.5)
+            if "anomaly_notifications" not in rabbitmq.queues:
+                logger.warning("Anomali kuyruğu bulunamadı. Yeniden denenecek...")
+                # Kuyrukları yeniden oluşturmayı dene
+                await rabbitmq.setup_exchanges_and_queues()
+                continue
             
+            await rabbitmq.consume(
+                "anomaly_notifications",
+                on_message,
+                prefetch_count=settings.ANOMALY_PREFETCH_COUNT
+            )
+            break
+        except Exception as e:
+            logger.error(f"Anomali tüketicisi başlatılırken hata: {str(e)}")
+            await asyncio.sleep(5)
+    
+    while True:
+        batch = [await inbox.get()]
+        while len(batch) < settings.ANOMALY_DRAIN_BATCH_SIZE:
+            try:
+                batch.append(inbox.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        
+        try:
+            await _broadcast_anomaly_batch(batch)
         except Exception as e:
-            logger.error(f"Anomali dinleme sırasında hata: {str(e)}")
-            await asyncio.sleep(5)  # Hata durumunda daha uzun bekle
+            # Onaylanmayan mesajlar prefetch penceresini doldurup tüketiciyi durdurur; yeniden
+            # kuyruğa almak ise istemcilerin bir kısmına gitmiş bildirimleri tekrarlar ve kalıcı
+            # hatalarda döngüye girer, bu yüzden grup reddedilir
+            try:
+                await batch[-1].nack(multiple=True, requeue=False)
+            except Exception as nack_error:
+                logger.error(f"Anomali mesajları reddedilemedi: {str(nack_error)}")
+            logger.error(f"Anomali mesajları yayınlanırken hata, {len(batch)} mesaj düşürüldü: {str(e)}")
 
 # Uygulama başlangıcında anomali dinleme görevini başlat
 @websocket_router.on_event("startup")
@@ -14,6 +14,15 @@ class Settings:
         # MongoDB bağlantı bilgileri
         self.MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/air_quality_db")
         self.MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "air_quality_db")
+        self.MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))       # İstemci başına en fazla bağlantı
+        self.MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))         # Açık tutulan en az bağlantı
+        self.MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")                   # Ağ sıkıştırması, tercih sırasıyla: zstd,snappy,zlib (boş: kapalı)
+        self.MONGODB_BULK_CHUNK_SIZE = int(os.getenv("MONGODB_BULK_CHUNK_SIZE", "1000"))  # Toplu yazma yardımcılarında çağrı başına doküman sayısı
+
+        # air_quality_data için MongoDB zaman serisi koleksiyonu (MongoDB 6.0+, isteğe bağlı)
+        self.MONGODB_TIMESERIES = os.getenv("MONGODB_TIMESERIES", "False").lower() == "true"
+        self.MONGODB_TIMESERIES_GRANULARITY = os.getenv("MONGODB_TIMESERIES_GRANULARITY", "minutes")  # seconds, minutes, hours
+        self.MONGODB_RETENTION_DAYS = int(os.getenv("MONGODB_RETENTION_DAYS", "0"))                    # Ham verinin saklama süresi (gün), 0: süresiz
 
         # RabbitMQ bağlantı bilgileri
         self.RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
@@ -21,6 +30,16 @@ class Settings:
         self.RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
         self.RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
         self.RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
+
+        # Yayınlama ayarları
+        self.RABBITMQ_PUBLISH_MODE = os.getenv("RABBITMQ_PUBLISH_MODE", "safety")                # safety: kalıcı mesaj, onay beklenir; throughput: geçici mesaj, onay arka planda
+        self.RABBITMQ_CONFIRM_WINDOW = int(os.getenv("RABBITMQ_CONFIRM_WINDOW", "256"))          # Onayı beklenen en fazla mesaj sayısı
+        self.RABBITMQ_PUBLISH_RETRIES = int(os.getenv("RABBITMQ_PUBLISH_RETRIES", "3"))          # Nack/return/zaman aşımında tekrar sayısı
+        self.RABBITMQ_PUBLISH_TIMEOUT = float(os.getenv("RABBITMQ_PUBLISH_TIMEOUT", "10"))       # Tek onay için bekleme süresi (saniye)
+        self.RABBITMQ_SYNC_POOL_SIZE = int(os.getenv("RABBITMQ_SYNC_POOL_SIZE", "4"))            # Senkron yayıncının (app.utils.messaging) en fazla bağlantı sayısı
+        self.MESSAGE_CODEC = os.getenv("MESSAGE_CODEC", "json")                                   # Mesaj gövdesi kodlaması: json (orjson), msgpack
+        self.MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "none")                      # Sıkıştırma: none, zstd, lz4
+        self.MESSAGE_COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "4096"))   # Bu boyuttan küçük gövdeler sıkıştırılmaz
         
         # WHO standartlarına göre hava kirliliği eşik değerleri (μg/m³)
         self.THRESHOLD_PM25 = float(os.getenv("THRESHOLD_PM25", "25"))  # PM2.5 24-saatlik ortalama
@@ -29,6 +48,65 @@ class Settings:
         self.THRESHOLD_SO2 = float(os.getenv("THRESHOLD_SO2", "500"))   # SO2 10-dakikalık ortalama
         self.THRESHOLD_O3 = float(os.getenv("THRESHOLD_O3", "100"))     # O3 8-saatlik ortalama
 
+        # Toplu veri girişi (POST /api/data/batch) ayarları
+        self.BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))        # Tek istekteki en fazla okuma sayısı
+        self.BATCH_PUBLISH_SIZE = int(os.getenv("BATCH_PUBLISH_SIZE", "500"))    # Tek RabbitMQ mesajındaki okuma sayısı
+
+        # Worker mikro-batch ayarları
+        self.WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "200"))                  # Tek yazma işlemindeki en fazla okuma
+        self.WORKER_BATCH_MAX_LATENCY = float(os.getenv("WORKER_BATCH_MAX_LATENCY", "0.5"))  # Bir okumanın bekleyebileceği en uzun süre (saniye)
+        self.WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))                  # Eşzamanlı işleyici (şerit) sayısı
+        self.WORKER_PREFETCH_COUNT = int(os.getenv("WORKER_PREFETCH_COUNT", "1000"))         # Kanal başına onaylanmamış mesaj sınırı
+        self.WORKER_CHANNELS = int(os.getenv("WORKER_CHANNELS", "1"))                        # raw_data tüketici kanalı sayısı
+
+        # Worker süreçleri ve raw_data parçaları
+        self.WORKER_MODE = os.getenv("WORKER_MODE", "embedded")                              # embedded: API sürecinde, standalone: python -m app.worker_main
+        self.WORKER_SHARDS = int(os.getenv("WORKER_SHARDS", "1"))                            # raw_data.{i} kuyruk sayısı (1: tek raw_data kuyruğu)
+        self.WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))                      # worker_main'in başlattığı süreç sayısı
+
+        # Anomali bildirimlerinin WebSocket'e aktarımı
+        self.ANOMALY_PREFETCH_COUNT = int(os.getenv("ANOMALY_PREFETCH_COUNT", "500"))        # anomaly_notifications prefetch sınırı
+        self.ANOMALY_DRAIN_BATCH_SIZE = int(os.getenv("ANOMALY_DRAIN_BATCH_SIZE", "100"))    # Tek seferde yayınlanan en fazla mesaj
+
+        # Harita ve yoğunluk aggregation önbelleği
+        self.AGGREGATION_CACHE_TTL = float(os.getenv("AGGREGATION_CACHE_TTL", "5"))          # Sonuçların geçerlilik süresi (saniye)
+        self.AGGREGATION_CACHE_MIN_AGE = float(os.getenv("AGGREGATION_CACHE_MIN_AGE", "1"))  # Yeni veriyle yenilenmeden önceki en kısa süre (saniye)
+        self.AGGREGATION_CACHE_MAX_ENTRIES = int(os.getenv("AGGREGATION_CACHE_MAX_ENTRIES", "256"))  # En fazla kayıt; dolunca en az kullanılan çıkarılır
+
+        # Harita ve yoğunluk sorgularının ham veri yerine özet (rollup) koleksiyonlarından okunması.
+        # Worker özetleri her zaman yazar; açmadan önce scripts/backfill_rollups.py ile geçmiş doldurulmalıdır.
+        self.ROLLUP_READS = os.getenv("ROLLUP_READS", "False").lower() == "true"
+        self.ROLLUP_1M_RETENTION_DAYS = int(os.getenv("ROLLUP_1M_RETENTION_DAYS", "3"))  # rollup_1m kovalarının saklama süresi (gün), 0: süresiz
+
+        # Harita aboneliklerinin yenilenme periyodu (saniye)
+        self.MAP_REFRESH_INTERVAL = float(os.getenv("MAP_REFRESH_INTERVAL", "5"))
+
+        # WebSocket gönderim kuyrukları (yavaş istemciler için)
+        self.WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))                # Bağlantı başına bekleyen en fazla mesaj
+        self.WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))                     # Tek mesajın gönderim zaman aşımı (saniye)
+
+        # Okumaların eşlendiği istasyon kaydı
+        self.STATION_SNAP_RADIUS_M = float(os.getenv("STATION_SNAP_RADIUS_M", "100"))        # En yakın istasyona eşleme yarıçapı (metre, en fazla 500)
+        self.STATION_RESOLVE_CONCURRENCY = int(os.getenv("STATION_RESOLVE_CONCURRENCY", "16"))   # Toplu girişte aynı anda çözülen yeni konum sayısı
+
+        # Tarihsel anomali tespiti için bellek içi istatistik ayarları
+        self.ROLLING_STATS_WARMUP_DAYS = int(os.getenv("ROLLING_STATS_WARMUP_DAYS", "7"))    # Başlangıçta okunacak geçmiş ve istatistik penceresi (gün)
+        self.ROLLING_STATS_RECENT_SIZE = int(os.getenv("ROLLING_STATS_RECENT_SIZE", "48"))   # Hareketli ortalama tamponu boyutu
+
+        # Toplu anomali tespitinin hesap çekirdeğini çalıştıran yürütücü
+        self.DETECTION_EXECUTOR = os.getenv("DETECTION_EXECUTOR", "thread")                  # inline, thread, process
+        self.DETECTION_WORKERS = int(os.getenv("DETECTION_WORKERS", "0"))                    # Havuz boyutu, 0: çekirdek sayısı
+        self.DETECTION_CHUNK_ROWS = int(os.getenv("DETECTION_CHUNK_ROWS", "20000"))          # Havuza tek görevde gönderilen satır sayısı
+        self.DETECTION_MIN_ROWS = int(os.getenv("DETECTION_MIN_ROWS", "1000"))               # Bundan küçük batch'ler olay döngüsünde hesaplanır
+
+        # Prometheus metrikleri (/metrics)
+        self.METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))  # Olay döngüsü gecikmesi ölçüm aralığı (saniye)
+        self.METRICS_WORKER_PORT = int(os.getenv("METRICS_WORKER_PORT", "0"))                  # worker_main süreçlerinin metrik portu (süreç i: port + i), 0: kapalı
+
+        # Mesaj başlıklarıyla taşınan izler (/debug/traces)
+        self.TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))           # İz eklenen yayın oranı (0-1), 0: kapalı; maliyet için bkz. scripts/bench_metrics.py
+        self.TRACING_BUFFER_SIZE = int(os.getenv("TRACING_BUFFER_SIZE", "1000"))             # Tutulan son tamamlanmış iz sayısı
+
     @property
     def RABBITMQ_URL(self) -> str:
         """RabbitMQ bağlantı URL'ini oluşturur."""
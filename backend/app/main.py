@@ -1,17 +1,21 @@
 import logging
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from typing import Optional
+from fastapi import FastAPI, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.router import router as api_router
-from app.api.websocket import router as websocket_router
+from app.api.websocket import websocket_router
+from app.config import settings
 from app.services.rabbitmq import rabbitmq
 from app.services.worker import start_workers
 from app.services.database import db
-from app.utils.json_encoder import JSONEncoder
-import json
-from bson import ObjectId
-from bson.errors import InvalidId
-from fastapi.encoders import jsonable_encoder
+from app.services.cache import aggregation_cache
+from app.services.codec import decode_message
+from app.services.stations import station_registry
+from app.services.anomaly_detection import anomaly_detector
+from app.services.executor import detection_executor
+from app.services import metrics
+from app.services.tracing import STAGES, tracer
+from app.utils.json_encoder import MongoJSONResponse
 import asyncio
 
 # Loglama yapılandırması
@@ -26,6 +30,7 @@ app = FastAPI(
     title="Hava Kirliliği İzleme API",
     description="Hava kirliliği verilerini toplayan ve analiz eden API.",
     version="0.1.0",
+    default_response_class=MongoJSONResponse,
 )
 
 # CORS middleware
@@ -37,35 +42,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ObjectId'leri string'e dönüştürmek için özel JSON serileştirme
-@app.middleware("http")
-async def custom_json_serializer(request: Request, call_next):
-    response = await call_next(request)
-    
-    if response.headers.get("content-type") == "application/json":
-        body = await response.body()
-        try:
-            # JSON'u decode et
-            body_dict = json.loads(body)
-            # ObjectId'leri string'e dönüştür
-            json_compatible_body = json.dumps(body_dict, cls=JSONEncoder)
-            # Yeni response oluştur
-            return JSONResponse(
-                content=json.loads(json_compatible_body),
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type="application/json"
-            )
-        except:
-            # Hata durumunda orijinal response döndür
-            return response
-    
-    return response
-
 # API router'ları
 app.include_router(api_router, prefix="/api", tags=["api"])
 app.include_router(websocket_router, tags=["websocket"])
 
+async def on_cache_invalidation(message):
+    """Worker'ların yeni veri yazdığı parametrelerin harita/yoğunluk önbelleğini eskitir."""
+    try:
+        aggregation_cache.invalidate(decode_message(message)["parameters"])
+    except (ValueError, UnicodeDecodeError, KeyError, TypeError) as e:
+        logger.error(f"Önbellek eskitme sinyali çözümlenemedi: {str(e)}")
+
 @app.on_event("startup")
 async def startup_event():
     # RabbitMQ bağlantısı
@@ -77,15 +64,35 @@ async def startup_event():
     await db.init_db()
     logger.info("MongoDB bağlantısı kuruldu")
     
-    # Worker'ları başlat
-    asyncio.create_task(start_workers())
-    logger.info("Worker'lar başlatıldı")
+    # Worker'lar (ayrı süreçlerde de olsalar) yeni veri yazdıkça önbelleği eskitsin
+    await rabbitmq.consume_cache_invalidations(on_cache_invalidation)
+    
+    # Okumaları istasyon kimliklerine eşlemek için istasyon kaydını yükle
+    await station_registry.load()
+    
+    # Tarihsel anomali tespiti için istasyon istatistiklerini yükle; standalone modda
+    # tespit worker süreçlerinde yapılır ve her worker kendi istatistiklerini yükler
+    if settings.WORKER_MODE == "embedded":
+        await anomaly_detector.warm_up()
+    
+    # Olay döngüsü gecikmesini /metrics için ölç
+    metrics.start_loop_lag_monitor()
+    
+    # Worker'ları başlat; standalone modda okumaları ayrı worker süreçleri (app.worker_main) işler
+    if settings.WORKER_MODE == "embedded":
+        asyncio.create_task(start_workers())
+        logger.info("Worker'lar başlatıldı")
+    else:
+        logger.info("Worker'lar ayrı süreçlerde çalışıyor (WORKER_MODE=standalone)")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     # RabbitMQ bağlantısını kapat
     await rabbitmq.close()
     logger.info("RabbitMQ bağlantısı kapatıldı")
+    
+    # Anomali tespiti havuzunu kapat
+    detection_executor.shutdown()
 
 @app.get("/")
 async def root():
@@ -105,6 +112,23 @@ async def health_check():
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    # Prometheus metin formatı; kuyruk derinlikleri scrape anında broker'dan okunur
+    return Response(await metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/debug/traces", include_in_schema=False)
+async def debug_traces(
+    limit: int = Query(20, ge=1, le=500, description="En fazla iz sayısı"),
+    kind: Optional[str] = Query(None, pattern="^(reading|anomaly)$", description="İz türü: reading ya da anomaly")
+):
+    # Son tamamlanan izlerin en yavaşları, aşama aşama süre dökümüyle
+    return {
+        "stats": tracer.get_stats(),
+        "stages": STAGES,
+        "traces": tracer.slowest(limit, kind)
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,17 +1,72 @@
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
+from bson import ObjectId
 from pydantic import BaseModel, Field, validator
 from geopy.distance import geodesic
 
 
+def new_reading_id() -> str:
+    """
+    Okuma için yeni bir kalıcı kimlik üretir.
+    
+    Kimlik girişte atanır ve kayıtta _id olarak kullanılır; böylece yeniden teslim edilen
+    bir mesajın okumaları ikinci kez yazılmak yerine tekil anahtar hatasına düşer.
+    
+    Returns:
+        str: ObjectId'nin onaltılık gösterimi
+    """
+    return str(ObjectId())
+
+
+def make_station_key(latitude: float, longitude: float) -> str:
+    """
+    Koordinatlardan istasyon anahtarı üretir.
+    
+    Koordinatlar ~100 m hassasiyete yuvarlanır, böylece aynı sensörün
+    okumaları tek bir istasyon altında toplanır.
+    
+    Args:
+        latitude (float): Enlem
+        longitude (float): Boylam
+        
+    Returns:
+        str: İstasyon anahtarı
+    """
+    return f"{latitude:.3f},{longitude:.3f}"
+
+
+def station_key_of(doc: Dict[str, Any]) -> Union[int, str]:
+    """
+    Bir okuma dokümanının istasyon anahtarını döndürür.
+    
+    İstasyon kaydından çözülmüş bir station_id varsa o kullanılır; yoksa (eski veriler)
+    koordinatlardan üretilen anahtara düşülür.
+    
+    Args:
+        doc (Dict[str, Any]): Okuma dokümanı ya da ham mesaj
+        
+    Returns:
+        Union[int, str]: İstasyon kimliği veya koordinat anahtarı
+    """
+    station_id = doc.get("station_id")
+    if station_id is not None:
+        return station_id
+    return make_station_key(float(doc["latitude"]), float(doc["longitude"]))
+
+
 class GeoLocation(BaseModel):
     """Coğrafi konum için model"""
     type: str = Field(default="Point", description="GeoJSON tipi")
     coordinates: List[float] = Field(..., description="[longitude, latitude] formatında koordinatlar")
 
 
-class AirQualityData(BaseModel):
-    """Bir lokasyondaki hava kalitesi verisi için model"""
+class AirQualityInput(BaseModel):
+    """
+    İstemcinin gönderdiği hava kalitesi verisi için model (API giriş şeması).
+    
+    Okuma kimliği ve istasyon kimliği sunucuda atanır; istemci bu alanları gönderse de
+    yok sayılır. Okuma to_reading() ile AirQualityData'ya çevrilir.
+    """
     
     latitude: float = Field(..., ge=-90, le=90, description="Enlem değeri")
     longitude: float = Field(..., ge=-180, le=180, description="Boylam değeri")
@@ -36,6 +91,33 @@ class AirQualityData(BaseModel):
             return datetime.fromisoformat(v.replace('Z', '+00:00'))
         return v
     
+    def to_reading(self, station_id: Optional[int] = None) -> "AirQualityData":
+        """
+        Girişi yeni bir kalıcı okuma kimliğiyle okumaya çevirir.
+        
+        Args:
+            station_id (Optional[int], optional): İstasyon kaydından çözülen kimlik
+            
+        Returns:
+            AirQualityData: Kuyruğa gönderilecek okuma
+        """
+        return AirQualityData(**self.dict(), reading_id=new_reading_id(), station_id=station_id)
+
+
+class AirQualityData(AirQualityInput):
+    """Bir lokasyondaki hava kalitesi verisi için model"""
+    
+    # Sunucunun atadığı alanlar
+    reading_id: Optional[str] = Field(None, description="Girişte atanan kalıcı okuma kimliği (kayıtta _id)")
+    station_id: Optional[int] = Field(None, description="İstasyon kaydındaki kimlik (giriş sırasında çözülür)")
+    
+    @validator('reading_id')
+    def ensure_object_id(cls, v):
+        """Okuma kimliğinin geçerli bir ObjectId olmasını sağlar"""
+        if v is not None and not ObjectId.is_valid(v):
+            raise ValueError("reading_id geçerli bir ObjectId olmalıdır")
+        return v
+    
     def to_mongo_document(self):
         """
         MongoDB dokümanı oluşturur.
@@ -45,6 +127,11 @@ class AirQualityData(BaseModel):
         """
         doc = self.dict(exclude_none=True)
         
+        # Girişte atanan kimlik _id olur; yoksa MongoDB yeni bir kimlik üretir
+        reading_id = doc.pop("reading_id", None)
+        if reading_id is not None:
+            doc["_id"] = ObjectId(reading_id)
+        
         # MongoDB için GeoJSON formatında konum ekle
         doc["location"] = {
             "type": "Point",
@@ -53,6 +140,29 @@ class AirQualityData(BaseModel):
         
         return doc
     
+    def to_message(self):
+        """
+        Kuyruk mesajı için okumayı döndürür.
+        
+        GeoJSON location alanı enlem/boylamdan türetildiği için mesaja eklenmez;
+        tüketici to_mongo_document() ile yeniden oluşturur.
+        
+        Returns:
+            dict: Boş alanları çıkarılmış okuma
+        """
+        return self.dict(exclude_none=True)
+    
+    def station_key(self) -> Union[int, str]:
+        """
+        Okumanın ait olduğu istasyonun anahtarını döndürür.
+        
+        Returns:
+            Union[int, str]: İstasyon kimliği, çözülmemişse koordinat anahtarı
+        """
+        if self.station_id is not None:
+            return self.station_id
+        return make_station_key(self.latitude, self.longitude)
+    
     def distance_to(self, other_lat: float, other_lon: float) -> float:
         """
         Bu nokta ile verilen koordinat arasındaki mesafeyi kilometre cinsinden hesaplar.
@@ -87,5 +197,7 @@ class AirQualityAnomaly(BaseModel):
         """
         doc = self.dict(exclude={"data"})
         data_doc = self.data.to_mongo_document()
+        # Okumanın kimliği anomaliye reading_id olarak yazılır, gömülü okumada tutulmaz
+        data_doc.pop("_id", None)
         doc["data"] = data_doc
         return doc 
\ No newline at end of file
@@ -1,14 +1,217 @@
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List, Tuple
 import numpy as np
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Optional, List, Sequence, Tuple, Union
 from app.models.air_quality import AirQualityData, AirQualityAnomaly
 from app.config import settings
-from app.services.database import db
-from app.services.rabbitmq import rabbitmq
+from app.services.rolling_stats import PARAMETERS, RollingStatistics, to_naive_utc
+from app.services.executor import OutputSpec, allocate_outputs, detection_executor
+from app.services.metrics import DETECTION_SECONDS, timed
 
 logger = logging.getLogger(__name__)
 
+# Toplu tespit sonuçlarındaki şiddet kodları (0: anomali yok)
+SEVERITY_NAMES = ["none", "low", "medium", "high", "critical"]
+
+# Toplu tespit sonuçlarındaki tarihsel tespit metodu kodları (0: anomali yok)
+HISTORICAL_METHODS = ["none", "enhanced-z-score", "moving-average", "combined-analysis"]
+
+# Sütunsal batch: yapılandırılmış numpy dizisi ya da alan adı -> dizi sözlüğü
+ColumnarBatch = Union[np.ndarray, Dict[str, np.ndarray]]
+
+
+def readings_to_columns(readings: Sequence[AirQualityData]) -> Dict[str, np.ndarray]:
+    """
+    Okuma listesini detect_batch'in beklediği sütunsal biçime çevirir.
+    
+    Eksik kirlilik değerleri NaN olarak yazılır.
+    
+    Args:
+        readings (Sequence[AirQualityData]): Okumalar
+        
+    Returns:
+        Dict[str, np.ndarray]: Parametre sütunları, "station" ve "timestamp" sütunları
+    """
+    columns: Dict[str, np.ndarray] = {
+        parameter: np.array(
+            [getattr(reading, parameter) for reading in readings], dtype=np.float64
+        )
+        for parameter in PARAMETERS
+    }
+    stations = np.empty(len(readings), dtype=object)
+    stations[:] = [reading.station_key() for reading in readings]
+    columns["station"] = stations
+    columns["timestamp"] = np.array(
+        [to_naive_utc(reading.timestamp) for reading in readings], dtype="datetime64[us]"
+    )
+    return columns
+
+
+class BatchDetectionResult:
+    """
+    detect_batch sonucu: okuma x parametre boyutlu küçük sonuç dizileri.
+    
+    Dizilerin satırları batch'teki okumalara, sütunları `parameters` sırasına karşılık gelir.
+    Model nesneleri yalnızca to_anomalies() çağrıldığında ve sadece anomaliler için üretilir.
+    """
+    
+    def __init__(self, parameters: List[str], thresholds: np.ndarray, values: np.ndarray):
+        self.parameters = parameters
+        self.thresholds = thresholds
+        # Ölçülen değerler (eksikler NaN)
+        self.values = values
+        # Eşik aşım oranı ve eşik anomalisi şiddeti (SEVERITY_NAMES kodu)
+        self.ratios = values / thresholds
+        self.threshold_severity = np.zeros(values.shape, dtype=np.int8)
+        # Birleşik (saatlik + genel) Z-score, istatistik yoksa NaN
+        self.z_scores = np.full(values.shape, np.nan)
+        # Tarihsel anomali şiddeti, metodu (HISTORICAL_METHODS kodu) ve karşılaştırılan üst sınır
+        self.historical_severity = np.zeros(values.shape, dtype=np.int8)
+        self.historical_method = np.zeros(values.shape, dtype=np.int8)
+        self.historical_threshold = np.full(values.shape, np.nan)
+    
+    @property
+    def anomaly_count(self) -> int:
+        """Eşik ve tarihsel anomalilerin toplam sayısı."""
+        return int(np.count_nonzero(self.threshold_severity) + np.count_nonzero(self.historical_method))
+    
+    def to_anomalies(self, readings: Sequence[AirQualityData]) -> List[List[AirQualityAnomaly]]:
+        """
+        Anomali olarak işaretlenen hücreler için AirQualityAnomaly modellerini üretir.
+        
+        Args:
+            readings (Sequence[AirQualityData]): Batch'i oluşturan okumalar (aynı sırada)
+            
+        Returns:
+            List[List[AirQualityAnomaly]]: Okuma başına anomaliler (önce eşik, sonra tarihsel)
+        """
+        result: List[List[AirQualityAnomaly]] = [[] for _ in readings]
+        detected_at = datetime.utcnow()
+        
+        for row, col in zip(*np.nonzero(self.threshold_severity)):
+            parameter = self.parameters[col]
+            value = float(self.values[row, col])
+            severity = SEVERITY_NAMES[self.threshold_severity[row, col]]
+            result[row].append(AirQualityAnomaly(
+                data=readings[row],
+                parameter=parameter,
+                threshold=float(self.thresholds[col]),
+                actual_value=value,
+                detection_method="threshold",
+                severity=severity,
+                detected_at=detected_at
+            ))
+            logger.warning(
+                f"Anomali tespit edildi: {parameter.upper()} değeri {value} μg/m³, "
+                f"eşik değer {self.thresholds[col]} μg/m³, şiddet: {severity}, "
+                f"konum: {readings[row].latitude}, {readings[row].longitude}"
+            )
+        
+        for row, col in zip(*np.nonzero(self.historical_method)):
+            parameter = self.parameters[col]
+            value = float(self.values[row, col])
+            method = HISTORICAL_METHODS[self.historical_method[row, col]]
+            severity = SEVERITY_NAMES[self.historical_severity[row, col]]
+            result[row].append(AirQualityAnomaly(
+                data=readings[row],
+                parameter=parameter,
+                threshold=float(self.historical_threshold[row, col]),
+                actual_value=value,
+                detection_method=method,
+                severity=severity,
+                detected_at=detected_at
+            ))
+            logger.warning(
+                f"Gelişmiş anomali tespit edildi: {parameter.upper()} değeri {value} μg/m³, "
+                f"Kombinasyon Z-score: {self.z_scores[row, col]:.2f}, "
+                f"Metot: {method}, Şiddet: {severity}, "
+                f"Konum: {readings[row].latitude}, {readings[row].longitude}"
+            )
+        
+        return result
+
+def batch_output_specs(rows: int, columns: int) -> Dict[str, OutputSpec]:
+    """score_rows çıktılarının tanımları (BatchDetectionResult'taki başlangıç değerleriyle)."""
+    shape = (rows, columns)
+    return {
+        "threshold_severity": (shape, np.int8, 0),
+        "z_scores": (shape, np.float64, np.nan),
+        "historical_severity": (shape, np.int8, 0),
+        "historical_method": (shape, np.int8, 0),
+        "historical_threshold": (shape, np.float64, np.nan)
+    }
+
+
+def score_rows(inputs: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray], start: int, stop: int):
+    """
+    detect_batch'in durumsuz hesap çekirdeği: [start, stop) satırları için eşik şiddetini,
+    Z-score'ları ve tarihsel anomali metodunu hesaplayıp outputs dizilerine yazar.
+    
+    Sadece numpy dizileriyle çalıştığı için thread ya da process havuzunda çalıştırılabilir
+    (bkz. app.services.executor). İstasyon istatistikleri girdilerde yoksa sadece eşik
+    kontrolü yapılır.
+    
+    Args:
+        inputs (Dict[str, np.ndarray]): AnomalyDetector._prepare_batch girdileri
+        outputs (Dict[str, np.ndarray]): batch_output_specs çıktıları
+        start (int): İlk satır
+        stop (int): Son satır (hariç)
+    """
+    rows = slice(start, stop)
+    values = inputs["values"][rows]
+    thresholds = inputs["thresholds"]
+    
+    # 1. EŞİK KONTROLÜ (NaN karşılaştırmaları False döner)
+    with np.errstate(invalid="ignore"):
+        exceeded = values > thresholds
+    codes = np.searchsorted(inputs["severity_edges"], values / thresholds, side="right") + 1
+    outputs["threshold_severity"][rows] = np.where(exceeded, codes, 0)
+    
+    if "station_index" not in inputs:
+        return
+    
+    # 2. TARİHSEL KONTROL: okuma başına istatistikler
+    station_index = inputs["station_index"][rows]
+    hours = inputs["hours"][rows]
+    std = inputs["std"]
+    mean = inputs["mean"]
+    
+    n_std = std[station_index]
+    valid = (n_std > 0) & ~np.isnan(values)
+    safe_std = np.where(n_std > 0, n_std, 1.0)
+    z_score = (values - mean[station_index]) / safe_std
+    
+    columns = np.arange(values.shape[1])
+    h_count = inputs["hourly_count"][station_index[:, None], columns, hours[:, None]]
+    h_mean = inputs["hourly_mean"][station_index[:, None], columns, hours[:, None]]
+    h_std = inputs["hourly_std"][station_index[:, None], columns, hours[:, None]]
+    use_hourly = (h_count >= 5) & (h_std > 0)
+    hourly_z = (values - h_mean) / np.where(h_std > 0, h_std, 1.0)
+    combined = np.where(use_hourly, hourly_z * 0.7 + z_score * 0.3, z_score)
+    
+    n_moving_avg = inputs["moving_avg"][station_index]
+    with np.errstate(invalid="ignore"):
+        moving_avg_anomaly = ~np.isnan(n_moving_avg) & (values / np.maximum(1, n_moving_avg) > 1.5)
+    
+    n_count = inputs["count"][station_index]
+    z_threshold = np.where(n_count < 50, 2.5, 3.0)
+    z_anomaly = valid & (combined > z_threshold)
+    moving_avg_anomaly &= valid
+    
+    method = np.zeros(values.shape, dtype=np.int8)
+    method[moving_avg_anomaly] = 2
+    method[z_anomaly] = 1
+    method[z_anomaly & moving_avg_anomaly] = 3
+    
+    zscore_edges = np.array([3.5, 4.0, 5.0])
+    severity = np.searchsorted(zscore_edges, combined, side="right") + 1
+    
+    outputs["z_scores"][rows] = np.where(valid, combined, np.nan)
+    outputs["historical_method"][rows] = method
+    outputs["historical_severity"][rows] = np.where(method > 0, severity, 0)
+    outputs["historical_threshold"][rows] = np.where(valid, mean[station_index] + z_threshold * n_std, np.nan)
+
+
 class AnomalyDetector:
     """Hava kalitesi verilerinde anomali tespiti yapan servis."""
     
@@ -30,8 +233,12 @@ class AnomalyDetector:
     }
     
     def __init__(self):
-        pass
+        # İstasyon bazında bellek içi kayan istatistikler
+        self.stats = RollingStatistics(
+            recent_size=settings.ROLLING_STATS_RECENT_SIZE, window_days=settings.ROLLING_STATS_WARMUP_DAYS
+        )
     
+    @timed(DETECTION_SECONDS.labels(method="check_threshold_anomaly"))
     async def check_threshold_anomaly(self, data: AirQualityData) -> Optional[List[AirQualityAnomaly]]:
         """
         WHO standartlarına göre eşik değerlerini aşan kirlilik seviyelerini tespit eder.
@@ -77,7 +284,8 @@ class AnomalyDetector:
         
         return anomalies if anomalies else None
     
-    async def check_historical_anomaly(self, data: AirQualityData) -> Optional[List[AirQualityAnomaly]]:
+    @timed(DETECTION_SECONDS.labels(method="check_historical_anomaly"))
+    async def check_historical_anomaly(self, data: AirQualityData, update: bool = True) -> Optional[List[AirQualityAnomaly]]:
         """
         Gelişmiş tarihsel veri analizi ile anomali tespiti yapar.
         
@@ -87,145 +295,283 @@ class AnomalyDetector:
         3. Hareketli ortalama tabanlı anomali tespiti
         4. Lokal bölgeler için özel eşik değerleri
         
+        Tüm hesaplar okumanın istasyonuna ait bellek içi kayan istatistiklerden
+        (RollingStatistics) yapılır; okuma başına veritabanı sorgusu yapılmaz.
+        
         Args:
             data (AirQualityData): Kontrol edilecek hava kalitesi verisi
+            update (bool, optional): Kontrolden sonra okumayı istatistiklere ekle. Varsayılan True.
             
         Returns:
             Optional[List[AirQualityAnomaly]]: Tespit edilen anomaliler listesi, anomali yoksa None
         """
-        anomalies = []
+        # Toplu tespit istatistikleri başka bir iş parçacığında güncelleyebilir
+        with self.stats.lock:
+            anomalies = []
         
-        # Son 7 gündeki verileri getir (daha geniş veri seti)
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(days=7)
-        current_hour = end_time.hour
+            station = data.station_key()
+            reading_time = to_naive_utc(data.timestamp)
+            current_hour = reading_time.hour
         
-        # Her parametre için kontrol et
-        for parameter in ["pm25", "pm10", "no2", "so2", "o3"]:
-            value = getattr(data, parameter, None)
+            # Her parametre için kontrol et
+            for parameter in ["pm25", "pm10", "no2", "so2", "o3"]:
+                value = getattr(data, parameter, None)
             
-            if value is None:
-                continue
+                if value is None:
+                    continue
                 
-            # Parametre için son 7 gündeki verileri getir
-            historical_data = await db.get_data_by_parameter(parameter, start_time, end_time)
+                # İstasyonun bu parametre için istatistikleri
+                stats = self.stats.get(station, parameter, reading_time)
             
-            if not historical_data:
-                continue
-                
-            # Minimum veri noktası kontrolü
-            if len(historical_data) < 20:  # Daha sağlıklı analiz için en az 20 veri noktası gerekli
-                continue
+                # Minimum veri noktası kontrolü
+                if stats is None or stats.overall.count < 20:  # Daha sağlıklı analiz için en az 20 veri noktası gerekli
+                    continue
                 
-            # 1. GENEL Z-SCORE ANALİZİ
-            values = np.array([doc.get(parameter, 0) for doc in historical_data if parameter in doc])
-            timestamps = np.array([doc.get("timestamp") for doc in historical_data if parameter in doc])
-            
-            mean = np.mean(values)
-            std = np.std(values)
+                # 1. GENEL Z-SCORE ANALİZİ
+                mean = stats.overall.mean
+                std = stats.overall.std
             
-            if std == 0:  # Standart sapma sıfır ise, tüm değerler aynı
-                continue
+                if std == 0:  # Standart sapma sıfır ise, tüm değerler aynı
+                    continue
                 
-            z_score = (value - mean) / std
+                z_score = (value - mean) / std
             
-            # 2. SEZONSAL ETKİLERİ HESABA KATAN Z-SCORE
-            # Günün aynı saatindeki veriler (örn. sabah 8, öğlen 12, akşam 18 gibi saatlerde kirlilik seviyeleri değişir)
-            hourly_margin = 1  # +/- 1 saat
-            hourly_values = []
+                # 2. SEZONSAL ETKİLERİ HESABA KATAN Z-SCORE
+                # Günün aynı saatindeki veriler (örn. sabah 8, öğlen 12, akşam 18 gibi saatlerde kirlilik seviyeleri değişir)
+                hourly = stats.hourly_window(current_hour, margin=1)  # +/- 1 saat
             
-            for doc, ts in zip(historical_data, timestamps):
-                if parameter in doc and abs(ts.hour - current_hour) <= hourly_margin:
-                    hourly_values.append(doc.get(parameter, 0))
-                    
-            if len(hourly_values) >= 5:  # En az 5 veri noktası varsa saatlik analiz yap
-                hourly_values = np.array(hourly_values)
-                hourly_mean = np.mean(hourly_values)
-                hourly_std = np.std(hourly_values)
+                if hourly.count >= 5 and hourly.std > 0:  # En az 5 veri noktası varsa saatlik analiz yap
+                    hourly_z_score = (value - hourly.mean) / hourly.std
                 
-                if hourly_std > 0:
-                    hourly_z_score = (value - hourly_mean) / hourly_std
-                    
                     # Saatlik Z-score daha önemli
                     combined_z_score = (hourly_z_score * 0.7) + (z_score * 0.3)
                 else:
+                    hourly_z_score = None
                     combined_z_score = z_score
-            else:
-                combined_z_score = z_score
                 
-            # 3. HAREKETLİ ORTALAMA TABANLI ANOMALİ TESPİTİ
-            # Son 24 saatteki veriler için hareketli ortalama hesapla
-            recent_data = [doc.get(parameter, 0) for doc in historical_data 
-                          if parameter in doc and (end_time - doc.get("timestamp")).total_seconds() <= 86400]
+                # 3. HAREKETLİ ORTALAMA TABANLI ANOMALİ TESPİTİ
+                # Son 24 saatteki veriler için hareketli ortalama hesapla
+                recent_values = stats.recent_values(reading_time, timedelta(hours=24))
             
-            if len(recent_data) >= 10:
-                recent_values = np.array(recent_data)
-                window_size = min(5, len(recent_values) // 2)
-                weights = np.ones(window_size) / window_size
-                moving_avg = np.convolve(recent_values, weights, 'valid')
-                
-                if len(moving_avg) > 0:
-                    last_moving_avg = moving_avg[-1]
+                moving_avg_anomaly = False
+                if len(recent_values) >= 10:
+                    window_size = min(5, len(recent_values) // 2)
+                    last_moving_avg = sum(recent_values[-window_size:]) / window_size
                     moving_avg_ratio = value / max(1, last_moving_avg)  # Sıfıra bölmeyi önle
-                    
+                
                     # Hareketli ortalamadan %50'den fazla sapma varsa
                     moving_avg_anomaly = moving_avg_ratio > 1.5
-                else:
-                    moving_avg_anomaly = False
-            else:
-                moving_avg_anomaly = False
                 
-            # 4. SONUÇLARI BİRLEŞTİR VE ANOMALİYİ BELİRLE
-            # Z-score eşiği (artık dinamik olarak hesaplanıyor)
-            z_threshold = 2.5 if len(historical_data) < 50 else 3.0
+                # 4. SONUÇLARI BİRLEŞTİR VE ANOMALİYİ BELİRLE
+                # Z-score eşiği (artık dinamik olarak hesaplanıyor)
+                z_threshold = 2.5 if stats.overall.count < 50 else 3.0
             
-            # Anomali tespiti (kombinasyon)
-            is_anomaly = combined_z_score > z_threshold or moving_avg_anomaly
+                # Anomali tespiti (kombinasyon)
+                is_anomaly = combined_z_score > z_threshold or moving_avg_anomaly
             
-            if is_anomaly:
-                # Şiddet hesapla (kombinasyon Z-score'a göre)
-                severity = self._determine_severity_by_zscore(combined_z_score)
+                if is_anomaly:
+                    # Şiddet hesapla (kombinasyon Z-score'a göre)
+                    severity = self._determine_severity_by_zscore(combined_z_score)
                 
-                # Anomali metodunu belirle
-                if combined_z_score > z_threshold and moving_avg_anomaly:
-                    detection_method = "combined-analysis"
-                elif combined_z_score > z_threshold:
-                    detection_method = "enhanced-z-score"
-                else:
-                    detection_method = "moving-average"
+                    # Anomali metodunu belirle
+                    if combined_z_score > z_threshold and moving_avg_anomaly:
+                        detection_method = "combined-analysis"
+                    elif combined_z_score > z_threshold:
+                        detection_method = "enhanced-z-score"
+                    else:
+                        detection_method = "moving-average"
                 
-                # Anomali modelini oluştur
-                anomaly = AirQualityAnomaly(
-                    data=data,
-                    parameter=parameter,
-                    threshold=mean + z_threshold * std,
-                    actual_value=value,
-                    detection_method=detection_method,
-                    severity=severity,
-                    detected_at=datetime.utcnow()
-                )
+                    # Anomali modelini oluştur
+                    anomaly = AirQualityAnomaly(
+                        data=data,
+                        parameter=parameter,
+                        threshold=mean + z_threshold * std,
+                        actual_value=value,
+                        detection_method=detection_method,
+                        severity=severity,
+                        detected_at=datetime.utcnow()
+                    )
                 
-                anomalies.append(anomaly)
+                    anomalies.append(anomaly)
                 
-                # Detaylı loglama yap
-                log_message = (
-                    f"Gelişmiş anomali tespit edildi: {parameter.upper()} değeri {value} μg/m³, "
-                    f"ortalama {mean:.2f} μg/m³, Genel Z-score: {z_score:.2f}, "
-                )
+                    # Detaylı loglama yap
+                    log_message = (
+                        f"Gelişmiş anomali tespit edildi: {parameter.upper()} değeri {value} μg/m³, "
+                        f"ortalama {mean:.2f} μg/m³, Genel Z-score: {z_score:.2f}, "
+                    )
                 
-                if len(hourly_values) >= 5:
-                    log_message += f"Saatlik Z-score: {hourly_z_score:.2f}, "
+                    if hourly_z_score is not None:
+                        log_message += f"Saatlik Z-score: {hourly_z_score:.2f}, "
                 
-                log_message += (
-                    f"Kombinasyon Z-score: {combined_z_score:.2f}, "
-                    f"Metot: {detection_method}, Şiddet: {severity}, "
-                    f"Konum: {data.latitude}, {data.longitude}"
-                )
+                    log_message += (
+                        f"Kombinasyon Z-score: {combined_z_score:.2f}, "
+                        f"Metot: {detection_method}, Şiddet: {severity}, "
+                        f"Konum: {data.latitude}, {data.longitude}"
+                    )
                 
-                logger.warning(log_message)
+                    logger.warning(log_message)
+        
+            # Okumayı kendi Z-score'unu etkilemeyecek şekilde kontrolden sonra ekle
+            if update:
+                self.stats.add_reading(data)
         
         return anomalies if anomalies else None
     
+    @timed(DETECTION_SECONDS.labels(method="detect_batch"))
+    def detect_batch(self, batch: ColumnarBatch, historical: bool = True, update: bool = False) -> BatchDetectionResult:
+        """
+        Bir okuma batch'i için eşik ve tarihsel anomali kontrolünü vektörel olarak yapar.
+        
+        Eşik kontrolü tüm okumalar x parametreler için tek seferde hesaplanır. Tarihsel kontrol,
+        batch'te geçen her istasyonun istatistiklerini bir kez diziye alır ve Z-score'ları yine
+        vektörel hesaplar; kurallar check_historical_anomaly ile aynıdır. Farkı, bir batch'teki
+        okumaların birbirinin istatistiğine katılmamasıdır: hepsi batch başındaki istatistiklerle,
+        hareketli ortalama ise istasyonun batch'teki en yeni okuma zamanına göre değerlendirilir.
+        
+        Args:
+            batch (ColumnarBatch): Parametre sütunları (eksik değerler NaN); tarihsel kontrol için
+                "station" ve "timestamp" (datetime64) sütunları da gerekir
+            historical (bool, optional): Tarihsel kontrolü yap. Varsayılan True.
+            update (bool, optional): Kontrolden sonra okumaları istatistiklere ekle. Varsayılan False.
+            
+        Returns:
+            BatchDetectionResult: Okuma x parametre sonuç dizileri
+        """
+        parameters, inputs = self._prepare_batch(batch, historical)
+        rows = len(inputs["values"])
+        outputs = allocate_outputs(batch_output_specs(rows, len(parameters)))
+        score_rows(inputs, outputs, 0, rows)
+        return self._finish_batch(batch, parameters, inputs, outputs, update)
+    
+    @timed(DETECTION_SECONDS.labels(method="detect_batch_async"))
+    async def detect_batch_async(self, batch: ColumnarBatch, historical: bool = True,
+                                 update: Union[bool, np.ndarray] = False) -> BatchDetectionResult:
+        """
+        detect_batch'in olay döngüsünü bloklamayan sürümü.
+        
+        Batch'in hazırlanması (istasyon istatistiklerinin diziye alınması) ve istatistik
+        güncellemesi detection_executor.call ile olay döngüsü dışında, istatistik kilidi
+        altında çalışır. Z-score ve eşik hesabı (score_rows) DETECTION_EXECUTOR ile seçilen
+        thread ya da process havuzunda çalışır. inline türünde hepsi olay döngüsündedir.
+        
+        Args:
+            batch (ColumnarBatch): detect_batch ile aynı
+            historical (bool, optional): Tarihsel kontrolü yap. Varsayılan True.
+            update (Union[bool, np.ndarray], optional): Kontrolden sonra okumaları istatistiklere ekle;
+                boolean dizi verilirse sadece işaretli satırlar eklenir. Varsayılan False.
+            
+        Returns:
+            BatchDetectionResult: Okuma x parametre sonuç dizileri
+        """
+        parameters, inputs = await detection_executor.call(self._prepare_batch, batch, historical)
+        rows = len(inputs["values"])
+        outputs = await detection_executor.run(score_rows, inputs, batch_output_specs(rows, len(parameters)), rows)
+        return await detection_executor.call(self._finish_batch, batch, parameters, inputs, outputs, update)
+    
+    def _prepare_batch(self, batch: ColumnarBatch, historical: bool) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Batch'i score_rows girdilerine çevirir; istasyon istatistikleri burada diziye alınır."""
+        fields = batch.dtype.names if isinstance(batch, np.ndarray) else batch.keys()
+        parameters = [parameter for parameter in PARAMETERS if parameter in fields]
+        values = np.column_stack([np.asarray(batch[parameter], dtype=np.float64) for parameter in parameters])
+        inputs = {
+            "values": values,
+            "thresholds": np.array([self.THRESHOLDS[parameter] for parameter in parameters], dtype=np.float64),
+            "severity_edges": np.array([
+                self.SEVERITY_LEVELS["medium"], self.SEVERITY_LEVELS["high"], self.SEVERITY_LEVELS["critical"]
+            ])
+        }
+        
+        has_history = "station" in fields and "timestamp" in fields
+        if historical and has_history and len(values):
+            with self.stats.lock:
+                inputs.update(self._gather_station_stats(
+                    parameters, np.asarray(batch["station"]), np.asarray(batch["timestamp"])
+                ))
+        return parameters, inputs
+    
+    def _finish_batch(self, batch: ColumnarBatch, parameters: List[str], inputs: Dict[str, np.ndarray],
+                      outputs: Dict[str, np.ndarray], update: Union[bool, np.ndarray]) -> BatchDetectionResult:
+        """score_rows çıktılarından sonucu oluşturur ve istenirse istatistikleri günceller."""
+        values = inputs["values"]
+        result = BatchDetectionResult(parameters, inputs["thresholds"], values)
+        for name, array in outputs.items():
+            setattr(result, name, array)
+        
+        fields = batch.dtype.names if isinstance(batch, np.ndarray) else batch.keys()
+        update_rows = np.broadcast_to(np.asarray(update, dtype=bool), (len(values),))
+        if update_rows.any() and "station" in fields and "timestamp" in fields:
+            stations = batch["station"]
+            timestamps = np.asarray(batch["timestamp"]).astype("datetime64[us]").astype(datetime)
+            with self.stats.lock:
+                for row, col in zip(*np.nonzero(~np.isnan(values) & update_rows[:, None])):
+                    self.stats.add(stations[row], parameters[col], float(values[row, col]), timestamps[row])
+        
+        return result
+    
+    def _gather_station_stats(self, parameters: List[str], stations: np.ndarray, timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+        """Batch'te geçen her (istasyon, parametre) için istatistikleri bir kez diziye alır."""
+        timestamps = timestamps.astype("datetime64[us]")
+        hours = (timestamps.astype("datetime64[h]").astype(np.int64) % 24).astype(np.intp)
+        
+        # İstasyonları 0..k-1 kodlarına çevir
+        codes: Dict[Any, int] = {}
+        station_index = np.fromiter(
+            (codes.setdefault(station, len(codes)) for station in stations), dtype=np.intp, count=len(stations)
+        )
+        latest = np.full(len(codes), timestamps.min())
+        np.maximum.at(latest, station_index, timestamps)
+        
+        shape = (len(codes), len(parameters))
+        count = np.zeros(shape)
+        mean = np.zeros(shape)
+        std = np.zeros(shape)
+        hourly_count = np.zeros(shape + (24,))
+        hourly_mean = np.zeros(shape + (24,))
+        hourly_std = np.zeros(shape + (24,))
+        moving_avg = np.full(shape, np.nan)
+        
+        for station, u in codes.items():
+            reference = latest[u].astype(datetime)
+            for j, parameter in enumerate(parameters):
+                stats = self.stats.get(station, parameter, reference)
+                if stats is None or stats.overall.count < 20 or stats.overall.std == 0:
+                    continue
+                count[u, j] = stats.overall.count
+                mean[u, j] = stats.overall.mean
+                std[u, j] = stats.overall.std
+                for hour in range(24):
+                    window = stats.hourly_window(hour, margin=1)
+                    hourly_count[u, j, hour] = window.count
+                    hourly_mean[u, j, hour] = window.mean
+                    hourly_std[u, j, hour] = window.std
+                recent_values = stats.recent_values(reference, timedelta(hours=24))
+                if len(recent_values) >= 10:
+                    window_size = min(5, len(recent_values) // 2)
+                    moving_avg[u, j] = sum(recent_values[-window_size:]) / window_size
+        
+        return {
+            "station_index": station_index,
+            "hours": hours,
+            "count": count,
+            "mean": mean,
+            "std": std,
+            "hourly_count": hourly_count,
+            "hourly_mean": hourly_mean,
+            "hourly_std": hourly_std,
+            "moving_avg": moving_avg
+        }
+    
+    @timed(DETECTION_SECONDS.labels(method="warm_up"))
+    async def warm_up(self, station_filter: Optional[Callable[[Union[int, str]], bool]] = None):
+        """
+        Kayan istatistikleri MongoDB'deki son verilerle doldurur.
+        Uygulama başlangıcında bir kez çağrılır.
+        
+        Args:
+            station_filter (Optional[Callable], optional): Verilirse sadece bu istasyonların istatistikleri yüklenir
+        """
+        await self.stats.warm_up(days=settings.ROLLING_STATS_WARMUP_DAYS, station_filter=station_filter)
+    
     def _determine_severity(self, ratio: float) -> str:
         """
         Eşik değerine göre aşım oranına bakarak anomali şiddetini belirler.
@@ -264,6 +610,7 @@ class AnomalyDetector:
         else:
             return "low"
         
+    @timed(DETECTION_SECONDS.labels(method="analyze_and_predict"))
     async def analyze_and_predict(self, data: AirQualityData) -> Dict:
         """
         Veriyi analiz eder ve gelecekteki değerleri tahmin eder.
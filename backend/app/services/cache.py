@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Önbellek anahtarı: (tür, parametre, zaman penceresi, gruplama)
+CacheKey = Tuple[str, str, str, str]
+
+
+class _CacheEntry:
+    """Önbellekteki tek bir sonuç, oluşturulma zamanı ve geçerlilik süresi."""
+
+    __slots__ = ("value", "created_at", "expires_at")
+
+    def __init__(self, value: Any, created_at: float, expires_at: float):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+
+class _Inflight:
+    """Süren bir hesaplama görevi ve onu bekleyen istek sayısı."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        # Bekleyenlerin hepsi iptal edildiyse görevin hatası kimse tarafından okunmaz
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class AggregationCache:
+    """
+    Aggregation sonuçları için TTL'li, eşzamanlı istekleri birleştiren (single-flight) önbellek.
+
+    Aynı anahtar için süresi dolmamış bir sonuç varsa doğrudan döndürülür. Süresi dolmuşsa
+    sadece ilk istek aggregation'ı ayrı bir görevde başlatır; bu sırada gelen diğer istekler aynı
+    sonucu bekler. Bekleyen bir isteğin iptali (istemcinin ayrılması) diğerlerini etkilemez.
+
+    Worker yeni veri yazdığında invalidate() ilgili parametrenin kayıtlarını eskimiş sayar (ayrı
+    süreçteki worker'lar bunu cache_invalidation exchange'i üzerinden tetikler). Sürekli
+    veri akışında önbelleğin hiç tutmaması için bir kayıt, oluşturulduktan en az min_age saniye
+    sonra eskiyebilir; yani yeni veri en geç min_age saniye içinde yanıtlara yansır.
+
+    Önbellek en fazla max_entries kayıt tutar; dolduğunda en uzun süredir kullanılmayan kayıt
+    çıkarılır, süresi dolan kayıtlar da yeni kayıt eklenirken ve invalidation sırasında silinir.
+
+    Dönen sonuçlar tüm istemciler arasında paylaşılır, çağıranlar değiştirmemelidir.
+    """
+
+    def __init__(self, ttl: float = 5.0, min_age: float = 1.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.min_age = min(min_age, ttl)
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, _Inflight] = {}
+        # Parametre başına invalidation sayacı; hesaplama sürerken gelen invalidation'ı yakalar
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(
+        self,
+        key: CacheKey,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Anahtarın önbellekteki değerini döndürür, yoksa factory ile bir kez hesaplar.
+
+        Args:
+            key (CacheKey): (tür, parametre, zaman penceresi, gruplama) anahtarı
+            factory (Callable[[], Awaitable[Any]]): Değeri hesaplayan coroutine fonksiyonu
+            ttl (Optional[float], optional): Bu kayıt için geçerlilik süresi (saniye)
+
+        Returns:
+            Any: Önbellekteki ya da yeni hesaplanan değer
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self.misses += 1
+            inflight = _Inflight(asyncio.create_task(self._compute(key, factory, ttl)))
+            self._inflight[key] = inflight
+        else:
+            self.coalesced += 1
+
+        # Hesaplama kendi görevinde çalışır; iptal edilen istek sadece kendi beklemesini bırakır.
+        # Görev, onu bekleyen son istek de iptal edilirse iptal edilir.
+        inflight.waiters += 1
+        try:
+            return await asyncio.shield(inflight.task)
+        except asyncio.CancelledError:
+            if not inflight.task.done() and inflight.waiters == 1:
+                inflight.task.cancel()
+            raise
+        finally:
+            inflight.waiters -= 1
+
+    async def _compute(
+        self,
+        key: CacheKey,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float]
+    ) -> Any:
+        """Değeri hesaplayıp önbelleğe yazar; get_or_compute'un başlattığı görevde çalışır."""
+        parameter = key[1]
+        generation = self._generations.get(parameter, 0)
+        try:
+            value = await factory()
+            created_at = time.monotonic()
+            lifetime = ttl if ttl is not None else self.ttl
+            # Hesaplama sürerken yeni veri yazıldıysa sonuç en kısa sürede yenilenir
+            if self._generations.get(parameter, 0) != generation:
+                lifetime = min(lifetime, self.min_age)
+            self._store(key, _CacheEntry(value, created_at, created_at + lifetime))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: CacheKey, entry: _CacheEntry):
+        """Kaydı ekler; süresi dolanları ve sınırı aşan en eski kayıtları çıkarır."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._purge_expired()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+
+    def invalidate(self, parameters: Optional[Iterable[str]] = None):
+        """
+        Verilen parametrelere ait kayıtları eskimiş sayar; parametre verilmezse tüm önbelleği.
+
+        Args:
+            parameters (Optional[Iterable[str]], optional): Yeni veri yazılan parametreler
+        """
+        if parameters is None:
+            parameters = {key[1] for key in self._entries} | {key[1] for key in self._inflight}
+        else:
+            parameters = set(parameters)
+
+        for parameter in parameters:
+            self._generations[parameter] = self._generations.get(parameter, 0) + 1
+        for key, entry in self._entries.items():
+            if key[1] in parameters:
+                entry.expires_at = min(entry.expires_at, entry.created_at + self.min_age)
+        self._purge_expired()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Önbellek isabet istatistiklerini döndürür."""
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced
+        }
+
+
+# Singleton instance
+aggregation_cache = AggregationCache(
+    ttl=settings.AGGREGATION_CACHE_TTL,
+    min_age=settings.AGGREGATION_CACHE_MIN_AGE,
+    max_entries=settings.AGGREGATION_CACHE_MAX_ENTRIES
+)
@@ -0,0 +1,171 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+import orjson
+from bson import ObjectId
+from app.utils.json_encoder import dump_json_bytes
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack kurulu değilse JSON kullanılır
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+# Desteklenen content_type değerleri
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+
+# Desteklenen content_encoding değerleri; "identity" sıkıştırılmamış gövdedir
+ENCODING_IDENTITY = "identity"
+ENCODING_ZSTD = "zstd"
+ENCODING_LZ4 = "lz4"
+
+CODEC_CONTENT_TYPES = {"json": CONTENT_TYPE_JSON, "msgpack": CONTENT_TYPE_MSGPACK}
+
+
+def _msgpack_default(obj: Any):
+    """msgpack'in yerel olarak tanımadığı tipleri dönüştürür; datetime saat dilimsiz ise UTC kabul edilir."""
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} msgpack'e dönüştürülemez")
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == ENCODING_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == ENCODING_LZ4:
+        return lz4_frame.compress(body)
+    return body
+
+
+def _decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == ENCODING_IDENTITY:
+        return body
+    if encoding == ENCODING_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd ile sıkıştırılmış mesaj için zstandard paketi gerekli")
+        try:
+            return zstandard.ZstdDecompressor().decompress(body)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"zstd gövdesi açılamadı: {str(e)}")
+    if encoding == ENCODING_LZ4:
+        if lz4_frame is None:
+            raise ValueError("lz4 ile sıkıştırılmış mesaj için lz4 paketi gerekli")
+        try:
+            return lz4_frame.decompress(body)
+        except RuntimeError as e:
+            raise ValueError(f"lz4 gövdesi açılamadı: {str(e)}")
+    raise ValueError(f"Desteklenmeyen content_encoding: {encoding}")
+
+
+class MessageCodec:
+    """
+    RabbitMQ mesaj gövdelerini kodlayan/çözen katman.
+
+    Kodlama (JSON ya da msgpack) ve sıkıştırma (zstd ya da lz4) mesajın content_type ve
+    content_encoding özelliklerine yazılır; decode() bu özelliklere bakarak çözer. Böylece
+    farklı ayarlarla çalışan yayınlayıcılar aynı kuyruğa yazabilir ve özellik taşımayan eski
+    mesajlar JSON olarak okunur. Sıkıştırma sadece compress_min_bytes'tan büyük gövdelere
+    (pratikte toplu mesajlara) uygulanır; küçük mesajlarda kazançtan çok CPU maliyeti vardır.
+
+    JSON (orjson) CPU'da en hızlı seçenektir; msgpack ve sıkıştırma, broker bant genişliğinin
+    sınırlı olduğu kurulumlarda gövdeyi küçültür (bkz. scripts/bench_codec.py).
+    """
+
+    def __init__(self, codec: str = "json", compression: str = "none", compress_min_bytes: int = 1024):
+        if codec not in CODEC_CONTENT_TYPES:
+            raise ValueError(f"Geçersiz mesaj kodlaması: {codec} (beklenen: {', '.join(CODEC_CONTENT_TYPES)})")
+        if codec == "msgpack" and msgpack is None:
+            logger.warning("msgpack kurulu değil, mesajlar JSON olarak kodlanacak")
+            codec = "json"
+
+        if compression in ("none", ENCODING_IDENTITY, ""):
+            compression = None
+        elif compression == ENCODING_ZSTD and zstandard is None:
+            logger.warning("zstandard kurulu değil, mesajlar sıkıştırılmayacak")
+            compression = None
+        elif compression == ENCODING_LZ4 and lz4_frame is None:
+            logger.warning("lz4 kurulu değil, mesajlar sıkıştırılmayacak")
+            compression = None
+        elif compression not in (ENCODING_ZSTD, ENCODING_LZ4):
+            raise ValueError(f"Geçersiz sıkıştırma: {compression} (beklenen: none, zstd, lz4)")
+
+        self.codec = codec
+        self.content_type = CODEC_CONTENT_TYPES[codec]
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+
+    def encode(self, obj: Any) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Nesneyi mesaj gövdesine kodlar.
+
+        Args:
+            obj: Kodlanacak nesne (datetime ve ObjectId içerebilir)
+
+        Returns:
+            Tuple[bytes, Dict[str, str]]: Gövde ve Message'a verilecek content_type/content_encoding
+        """
+        if self.codec == "msgpack":
+            body = msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+        else:
+            body = dump_json_bytes(obj)
+
+        properties = {"content_type": self.content_type}
+        if self.compression and len(body) >= self.compress_min_bytes:
+            body = _compress(body, self.compression)
+            properties["content_encoding"] = self.compression
+        return body, properties
+
+
+def decode(body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> Any:
+    """
+    Mesaj gövdesini content_type ve content_encoding özelliklerine göre çözer.
+
+    msgpack zaman damgaları UTC saat dilimli datetime olarak döner.
+
+    Args:
+        body (bytes): Mesaj gövdesi
+        content_type (Optional[str], optional): Mesajın content_type özelliği; yoksa JSON
+        content_encoding (Optional[str], optional): Mesajın content_encoding özelliği
+
+    Returns:
+        Çözülmüş nesne
+
+    Raises:
+        ValueError: Gövde çözülemezse ya da kodlama desteklenmiyorsa
+    """
+    body = _decompress(body, content_encoding)
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack mesajı için msgpack paketi gerekli")
+        # msgpack'in çözme hataları ValueError alt sınıflarıdır
+        return msgpack.unpackb(body, raw=False, timestamp=3)
+    return orjson.loads(body)
+
+
+def decode_message(message) -> Any:
+    """
+    aio_pika mesajının gövdesini özelliklerine göre çözer.
+
+    Args:
+        message: aio_pika mesajı
+
+    Returns:
+        Çözülmüş nesne
+    """
+    return decode(message.body, message.content_type, message.content_encoding)
@@ -1,51 +1,122 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import IndexModel, ASCENDING, DESCENDING, GEOSPHERE
+from pymongo import ASCENDING, DESCENDING, DeleteMany, InsertOne
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
 from ..config import settings
-from ..utils.json_encoder import convert_mongo_document
+from ..models.air_quality import station_key_of
+from .indexes import index_manager
+from .metrics import MONGO_INSERT_SECONDS, timed
+from ..utils.database import get_async_client
+
+# $centerSphere yarıçapı radyan cinsinden verildiği için kullanılan Dünya yarıçapı (km)
+EARTH_RADIUS_KM = 6378.1
+
+# Zaman serisi modunda metaField'a yazılan, okuma boyunca değişmeyen alanlar
+META_FIELDS = ("city", "country", "source")
+
+def timeseries_options(granularity: str, retention_days: int) -> Dict[str, Any]:
+    """
+    air_quality_data zaman serisi koleksiyonunun create_collection seçeneklerini döndürür.
+    
+    Args:
+        granularity (str): Kova ayrıntı düzeyi (seconds, minutes, hours)
+        retention_days (int): Saklama süresi (gün), 0 ise süresiz
+    
+    Returns:
+        Dict[str, Any]: create_collection anahtar kelime argümanları
+    """
+    options: Dict[str, Any] = {
+        "timeseries": {
+            "timeField": "timestamp",
+            "metaField": "meta",
+            "granularity": granularity
+        }
+    }
+    if retention_days > 0:
+        options["expireAfterSeconds"] = retention_days * 86400
+    return options
+
+def with_meta(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Okuma dokümanına istasyon, şehir, ülke ve kaynak bilgisini taşıyan meta alanını ekler.
+    
+    Zaman serisi koleksiyonu ölçümleri meta değerine göre kovalara ayırır; aynı alan normal
+    koleksiyonda da yazılır, böylece iki düzende de aynı sorgular ve indeksler kullanılabilir.
+    
+    Args:
+        doc (Dict[str, Any]): to_mongo_document() biçiminde okuma
+    
+    Returns:
+        Dict[str, Any]: Aynı doküman (yerinde güncellenir)
+    """
+    if "meta" not in doc and "latitude" in doc and "longitude" in doc:
+        meta = {"station": station_key_of(doc)}
+        meta.update({field: doc[field] for field in META_FIELDS if doc.get(field) is not None})
+        doc["meta"] = meta
+    return doc
 
 class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        # air_quality_data koleksiyonunun zaman serisi olarak çalışıp çalışmadığı
+        self.timeseries = False
         
     async def init_db(self):
         try:
             # MongoDB bağlantısı kur
             logging.info(f"MongoDB bağlantısı kuruluyor: {settings.MONGODB_URL}")
-            self.client = AsyncIOMotorClient(settings.MONGODB_URL)
+            # Havuz boyutu ve sıkıştırma ayarları paylaşılan istemci fabrikasından gelir
+            self.client = get_async_client()
             self.db = self.client[settings.MONGODB_DB_NAME]
             
             # Air Quality Data Collection
-            air_quality_collection = self.db.air_quality_data
-            await air_quality_collection.create_indexes([
-                IndexModel([("location", GEOSPHERE)]),
-                IndexModel([("timestamp", DESCENDING)]),
-                IndexModel([("parameter", ASCENDING), ("timestamp", DESCENDING)])
-            ])
-            
-            # Anomalies Collection
-            anomalies_collection = self.db.anomalies
-            await anomalies_collection.create_indexes([
-                IndexModel([("data.location", GEOSPHERE)]),
-                IndexModel([("detected_at", DESCENDING)]),
-                IndexModel([("parameter", ASCENDING), ("detected_at", DESCENDING)])
-            ])
+            self.timeseries = await self._ensure_timeseries_collection() if settings.MONGODB_TIMESERIES else False
             
-            # Locations Collection
-            locations_collection = self.db.locations
-            await locations_collection.create_indexes([
-                IndexModel([("location", GEOSPHERE)]),
-                IndexModel([("name", ASCENDING)])
-            ])
+            # Tüm koleksiyonların indeksleri sorgu biçimlerinden türetilir (bkz. app.services.indexes)
+            await index_manager.ensure(self.db, self.timeseries)
+            await index_manager.report(self.db, self.timeseries)
             
             logging.info("MongoDB bağlantısı ve indeksler başarıyla oluşturuldu")
         except Exception as e:
             logging.error(f"MongoDB bağlantısı kurulamadı: {str(e)}")
             raise
 
+    async def _ensure_timeseries_collection(self) -> bool:
+        """
+        air_quality_data koleksiyonunu yoksa zaman serisi koleksiyonu olarak oluşturur.
+        
+        Koleksiyon normal bir koleksiyon olarak zaten varsa dönüştürülmez (scripts/migrate_timeseries.py
+        ile taşınmalıdır) ve normal düzen kullanılmaya devam edilir. Zaman serisi koleksiyonunun
+        saklama süresi ayarlardan farklıysa güncellenir.
+        
+        Returns:
+            bool: Koleksiyon zaman serisi ise True
+        """
+        options = timeseries_options(settings.MONGODB_TIMESERIES_GRANULARITY, settings.MONGODB_RETENTION_DAYS)
+        cursor = await self.db.list_collections(filter={"name": "air_quality_data"})
+        infos = await cursor.to_list(length=None)
+        
+        if not infos:
+            await self.db.create_collection("air_quality_data", **options)
+            logging.info(f"air_quality_data zaman serisi koleksiyonu oluşturuldu: {options}")
+            return True
+        
+        info = infos[0]
+        if info.get("type") != "timeseries":
+            logging.warning(
+                "MONGODB_TIMESERIES açık ancak air_quality_data normal bir koleksiyon; "
+                "scripts/migrate_timeseries.py ile taşınana kadar normal düzen kullanılacak"
+            )
+            return False
+        
+        expire = options.get("expireAfterSeconds", "off")
+        if info.get("options", {}).get("expireAfterSeconds", "off") != expire:
+            await self.db.command({"collMod": "air_quality_data", "expireAfterSeconds": expire})
+            logging.info(f"air_quality_data saklama süresi güncellendi: {expire}")
+        return True
+
+    @timed(MONGO_INSERT_SECONDS.labels(collection="air_quality_data", operation="insert_one"))
     async def insert_air_quality_data(self, data: dict) -> str:
         """
         Hava kalitesi verisini veritabanına ekler.
@@ -56,9 +127,26 @@ class Database:
         Returns:
             str: Eklenen dokümanın ID'si
         """
-        result = await self.db.air_quality_data.insert_one(data)
+        result = await self.db.air_quality_data.insert_one(with_meta(data))
         return str(result.inserted_id)
 
+    @timed(MONGO_INSERT_SECONDS.labels(collection="air_quality_data", operation="insert_many"))
+    async def insert_air_quality_data_many(self, documents: List[dict]) -> int:
+        """
+        Birden fazla hava kalitesi verisini tek bir sırasız (unordered) toplu yazma ile ekler.
+
+        Args:
+            documents (List[dict]): Hava kalitesi verisi dokümanları
+
+        Returns:
+            int: Eklenen doküman sayısı
+        """
+        if not documents:
+            return 0
+        result = await self.db.air_quality_data.insert_many([with_meta(doc) for doc in documents], ordered=False)
+        return len(result.inserted_ids)
+
+    @timed(MONGO_INSERT_SECONDS.labels(collection="anomalies", operation="insert_one"))
     async def insert_anomaly(self, data: dict) -> str:
         """
         Anomali verisini veritabanına ekler.
@@ -72,6 +160,43 @@ class Database:
         result = await self.db.anomalies.insert_one(data)
         return str(result.inserted_id)
 
+    @timed(MONGO_INSERT_SECONDS.labels(collection="anomalies", operation="insert_many"))
+    async def insert_anomalies_many(self, documents: List[dict]) -> int:
+        """
+        Birden fazla anomali kaydını tek bir sırasız (unordered) toplu yazma ile ekler.
+
+        Args:
+            documents (List[dict]): Anomali verisi dokümanları
+
+        Returns:
+            int: Eklenen doküman sayısı
+        """
+        if not documents:
+            return 0
+        result = await self.db.anomalies.insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+
+    @timed(MONGO_INSERT_SECONDS.labels(collection="anomalies", operation="replace_many"))
+    async def replace_reading_anomalies(self, reading_ids: List[Any], documents: List[dict]) -> int:
+        """
+        Okumalara bağlı (reading_id) anomalileri verilen dokümanlarla değiştirir.
+
+        Eski anomaliler silinip yenileri aynı sıralı toplu yazmada eklenir; aynı okumalar için
+        tekrar çağrılması sonucu değiştirmez. Yeniden teslim edilen okumalar için kullanılır.
+
+        Args:
+            reading_ids (List[Any]): Anomalileri değiştirilecek okumaların kimlikleri
+            documents (List[dict]): Bu okumaların yeni anomali dokümanları
+
+        Returns:
+            int: Eklenen doküman sayısı
+        """
+        if not reading_ids:
+            return 0
+        operations = [DeleteMany({"reading_id": {"$in": reading_ids}})] + [InsertOne(doc) for doc in documents]
+        result = await self.db.anomalies.bulk_write(operations, ordered=True)
+        return result.inserted_count
+
     async def get_air_quality_data(self, query: dict, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Belirli kriterlere göre hava kalitesi verilerini getirir.
@@ -84,9 +209,7 @@ class Database:
             List[Dict[str, Any]]: Hava kalitesi verileri listesi
         """
         cursor = self.db.air_quality_data.find(query).sort("timestamp", DESCENDING).limit(limit)
-        results = await cursor.to_list(length=limit)
-        # ObjectId'leri string'e dönüştür
-        return convert_mongo_document(results)
+        return await cursor.to_list(length=limit)
 
     async def get_anomalies(self, query: dict, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -100,9 +223,7 @@ class Database:
             List[Dict[str, Any]]: Anomali verileri listesi
         """
         cursor = self.db.anomalies.find(query).sort("detected_at", DESCENDING).limit(limit)
-        results = await cursor.to_list(length=limit)
-        # ObjectId'leri string'e dönüştür
-        return convert_mongo_document(results)
+        return await cursor.to_list(length=limit)
 
     async def aggregate_pollution_data(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -115,9 +236,7 @@ class Database:
             List[Dict[str, Any]]: Aggregate işlemi sonucu
         """
         cursor = self.db.air_quality_data.aggregate(pipeline)
-        results = await cursor.to_list(length=None)
-        # ObjectId'leri string'e dönüştür
-        return convert_mongo_document(results)
+        return await cursor.to_list(length=None)
         
     async def get_data_by_parameter(self, parameter: str, start_time: datetime, end_time: datetime, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -139,4 +258,89 @@ class Database:
         cursor = self.db.air_quality_data.find(query).sort("timestamp", DESCENDING).limit(limit)
         return await cursor.to_list(length=limit)
 
+    async def get_air_quality_near(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        start_time: datetime,
+        end_time: datetime,
+        limit: int = 100,
+        order_by_distance: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Bir noktanın belirli yarıçapı içindeki hava kalitesi verilerini getirir.
+        
+        Sorgu (location, timestamp) bileşik 2dsphere indeksiyle sınırlandırılır. Varsayılan
+        olarak sonuçlar zamana göre (yeniden eskiye) sıralanır; order_by_distance ile
+        $nearSphere (zaman serisi modunda $geoNear) kullanılarak en yakından uzağa sıralanır.
+        
+        Args:
+            latitude (float): Merkez noktanın enlemi
+            longitude (float): Merkez noktanın boylamı
+            radius_km (float): Arama yarıçapı (km)
+            start_time (datetime): Başlangıç zamanı
+            end_time (datetime): Bitiş zamanı
+            limit (int, optional): Maksimum sonuç sayısı. Varsayılan 100.
+            order_by_distance (bool, optional): Mesafeye göre sırala. Varsayılan False.
+        
+        Returns:
+            List[Dict[str, Any]]: Hava kalitesi verileri listesi
+        """
+        center = [longitude, latitude]
+        time_range = {"$gte": start_time, "$lte": end_time}
+        
+        if order_by_distance and self.timeseries:
+            # Zaman serisi koleksiyonları $nearSphere desteklemez; $geoNear aşaması kullanılır
+            pipeline = [
+                {
+                    "$geoNear": {
+                        "near": {"type": "Point", "coordinates": center},
+                        "key": "location",
+                        "distanceField": "_distance",
+                        "maxDistance": radius_km * 1000,
+                        "spherical": True,
+                        "query": {"timestamp": time_range}
+                    }
+                },
+                {"$limit": limit},
+                {"$project": {"_distance": 0}}
+            ]
+            return await self.db.air_quality_data.aggregate(pipeline).to_list(length=limit)
+        elif order_by_distance:
+            query = {
+                "location": {
+                    "$nearSphere": {
+                        "$geometry": {"type": "Point", "coordinates": center},
+                        "$maxDistance": radius_km * 1000
+                    }
+                },
+                "timestamp": time_range
+            }
+            cursor = self.db.air_quality_data.find(query).limit(limit)
+        else:
+            query = {
+                "location": {"$geoWithin": {"$centerSphere": [center, radius_km / EARTH_RADIUS_KM]}},
+                "timestamp": time_range
+            }
+            cursor = self.db.air_quality_data.find(query).sort("timestamp", DESCENDING).limit(limit)
+        
+        return await cursor.to_list(length=limit)
+
+    def stream_air_quality_data(self, query: dict, projection: Optional[dict] = None, batch_size: int = 5000):
+        """
+        Hava kalitesi verilerini zaman sırasıyla (eskiden yeniye) okuyan bir cursor döndürür.
+        
+        Tüm sonucu belleğe almadan `async for` ile gezmek için kullanılır.
+        
+        Args:
+            query (dict): MongoDB sorgu dokümanı
+            projection (Optional[dict], optional): Döndürülecek alanlar
+            batch_size (int, optional): Cursor batch boyutu. Varsayılan 5000.
+        
+        Returns:
+            AsyncIOMotorCursor: Zaman sıralı cursor
+        """
+        return self.db.air_quality_data.find(query, projection).sort("timestamp", ASCENDING).batch_size(batch_size)
+
 db = Database() 
\ No newline at end of file
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Çıktı dizisi tanımı: (şekil, dtype, başlangıç değeri)
+OutputSpec = Tuple[Tuple[int, ...], Any, Any]
+
+# Satır aralığı çekirdeği: kernel(girdiler, çıktılar, başlangıç, bitiş); çıktıların [başlangıç, bitiş) satırlarını yazar
+Kernel = Callable[[Dict[str, np.ndarray], Dict[str, np.ndarray], int, int], None]
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+# Paylaşımlı bellekteki dizilerin hizalaması (bayt)
+_ALIGNMENT = 64
+
+
+def allocate_outputs(specs: Dict[str, OutputSpec]) -> Dict[str, np.ndarray]:
+    """Çıktı dizilerini başlangıç değerleriyle oluşturur."""
+    return {name: np.full(shape, fill, dtype=dtype) for name, (shape, dtype, fill) in specs.items()}
+
+
+def _row_ranges(rows: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    chunk_rows = max(1, chunk_rows)
+    return [(start, min(start + chunk_rows, rows)) for start in range(0, rows, chunk_rows)]
+
+
+class _SharedBlock:
+    """
+    Bir çağrının girdi ve çıktı dizilerini tek bir paylaşımlı bellek bölgesinde tutar.
+
+    Alt süreçler bölgeye adıyla bağlanır; diziler kopyalanmadan (pickle edilmeden) okunur
+    ve çıktılar doğrudan yerinde yazılır.
+    """
+
+    def __init__(self, inputs: Dict[str, np.ndarray], output_specs: Dict[str, OutputSpec]):
+        entries = [(name, np.shape(array), np.asarray(array).dtype) for name, array in inputs.items()]
+        entries += [(name, shape, np.dtype(dtype)) for name, (shape, dtype, _) in output_specs.items()]
+
+        self.layout: Dict[str, Tuple[int, Tuple[int, ...], str]] = {}
+        offset = 0
+        for name, shape, dtype in entries:
+            if dtype.hasobject:
+                raise TypeError(f"{name}: nesne dizileri paylaşımlı belleğe konamaz")
+            self.layout[name] = (offset, tuple(shape), dtype.str)
+            nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            offset += -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        self.shm = SharedMemory(create=True, size=max(offset, 1))
+        self.input_names = list(inputs)
+        self.output_names = list(output_specs)
+
+        views = _views(self.shm, self.layout)
+        for name, array in inputs.items():
+            views[name][...] = array
+        for name, (_, _, fill) in output_specs.items():
+            views[name].fill(fill)
+
+    def outputs(self) -> Dict[str, np.ndarray]:
+        """Çıktıların bölgeden bağımsız kopyalarını döndürür."""
+        views = _views(self.shm, self.layout)
+        return {name: views[name].copy() for name in self.output_names}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _views(shm: SharedMemory, layout: Dict[str, Tuple[int, Tuple[int, ...], str]]) -> Dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+
+def _run_shared(kernel: Kernel, shm_name: str, layout, input_names: List[str], output_names: List[str],
+                start: int, stop: int):
+    """Alt süreçte çalışır: paylaşımlı bölgeye bağlanır ve çekirdeği satır aralığı için çağırır."""
+    # Bölgenin sahibi ana süreçtir; spawn ile başlayan alt süreçler ana sürecin kaynak
+    # izleyicisini paylaştığı için bölge ana süreç unlink edene kadar yaşar
+    shm = SharedMemory(name=shm_name)
+    try:
+        views = _views(shm, layout)
+        kernel(
+            {name: views[name] for name in input_names},
+            {name: views[name] for name in output_names},
+            start,
+            stop
+        )
+        del views
+    finally:
+        shm.close()
+
+
+class DetectionExecutor:
+    """
+    CPU ağırlıklı, durumsuz numpy çekirdeklerini olay döngüsünün dışında çalıştıran yürütücü.
+
+    Çekirdek satır aralıkları üzerinde çalışır. Büyük bir çağrı chunk_rows'luk aralıklara
+    bölünür ve aralıklar havuza birlikte gönderilir, böylece tek bir batch birden fazla
+    çekirdeğe yayılır. min_rows'tan küçük çağrılar, havuza gönderme maliyeti hesaptan büyük
+    olacağı için olay döngüsünde çalışır.
+
+    Türler:
+      - inline: her şey çağıran iş parçacığında çalışır (eski davranış)
+      - thread: ThreadPoolExecutor; numpy büyük dizilerde GIL'i bıraktığı için paralellik sağlar
+      - process: ProcessPoolExecutor; girdiler ve çıktılar paylaşımlı bellekte tutulur
+
+    Süreçlere taşınamayan, ana süreçteki nesneleri okuyup değiştiren işler (ör. kayan
+    istatistiklerin diziye alınması) call() ile inline dışındaki tüm türlerde tek iş
+    parçacıklı ayrı bir havuzda sırayla çalışır.
+    """
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None,
+                 chunk_rows: int = 20000, min_rows: int = 1000):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Geçersiz yürütücü türü: {kind} (beklenen: {', '.join(EXECUTOR_KINDS)})")
+        self.kind = kind
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_rows = max(1, chunk_rows)
+        self.min_rows = min_rows
+        self._pool: Optional[Executor] = None
+        self._state_pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # fork, olay döngüsü ve açık bağlantılarla birlikte kopyalanacağı için spawn kullanılır
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="detection")
+            logger.info(f"Tespit yürütücüsü başlatıldı: {self.kind}, {self.workers} işçi")
+        return self._pool
+
+    async def run(self, kernel: Kernel, inputs: Dict[str, np.ndarray],
+                  output_specs: Dict[str, OutputSpec], rows: int) -> Dict[str, np.ndarray]:
+        """
+        Çekirdeği tüm satırlar için çalıştırır ve çıktıları döndürür.
+
+        Args:
+            kernel (Kernel): Modül seviyesinde tanımlı (process türünde pickle edilebilir) çekirdek
+            inputs (Dict[str, np.ndarray]): Sayısal girdi dizileri (çekirdek değiştirmemeli)
+            output_specs (Dict[str, OutputSpec]): Çıktı dizilerinin tanımları
+            rows (int): Satır sayısı
+
+        Returns:
+            Dict[str, np.ndarray]: Çıktı dizileri
+        """
+        if self.kind == "inline" or rows < self.min_rows:
+            outputs = allocate_outputs(output_specs)
+            kernel(inputs, outputs, 0, rows)
+            return outputs
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        ranges = _row_ranges(rows, self.chunk_rows)
+
+        if self.kind == "thread":
+            outputs = allocate_outputs(output_specs)
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, kernel, inputs, outputs, start, stop) for start, stop in ranges
+            ))
+            return outputs
+
+        block = _SharedBlock(inputs, output_specs)
+        try:
+            # Bölge kapatılmadan önce tüm aralıkların bitmesi beklenir, hata olsa bile
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool, _run_shared, kernel, block.shm.name, block.layout,
+                    block.input_names, block.output_names, start, stop
+                )
+                for start, stop in ranges
+            ), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            return block.outputs()
+        finally:
+            block.close()
+
+    async def call(self, func: Callable[..., Any], *args) -> Any:
+        """
+        Ana süreçteki durumu kullanan bir fonksiyonu olay döngüsünün dışında çalıştırır.
+
+        Çağrılar tek bir iş parçacığında geliş sırasıyla çalışır; fonksiyonun olay döngüsüyle
+        paylaştığı nesneleri kendisi kilitlemelidir. inline türünde doğrudan çağrılır.
+
+        Args:
+            func (Callable[..., Any]): Çalıştırılacak fonksiyon
+            *args: Fonksiyonun argümanları
+
+        Returns:
+            Any: Fonksiyonun dönüş değeri
+        """
+        if self.kind == "inline":
+            return func(*args)
+        if self._state_pool is None:
+            self._state_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection-state")
+        return await asyncio.get_running_loop().run_in_executor(self._state_pool, func, *args)
+
+    def shutdown(self):
+        """Havuzları kapatır."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._state_pool is not None:
+            self._state_pool.shutdown(wait=True)
+            self._state_pool = None
+
+
+# Singleton instance
+detection_executor = DetectionExecutor(
+    kind=settings.DETECTION_EXECUTOR,
+    workers=settings.DETECTION_WORKERS or None,
+    chunk_rows=settings.DETECTION_CHUNK_ROWS,
+    min_rows=settings.DETECTION_MIN_ROWS
+)
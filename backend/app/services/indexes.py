@@ -0,0 +1,353 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import IndexModel, ASCENDING, DESCENDING, GEOSPHERE
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Kısmi (partial) indeksi olan kirlilik parametreleri
+POLLUTANTS = ["pm25", "pm10", "no2", "so2", "o3"]
+
+# Özet (rollup) koleksiyonları; bkz. app.services.rollups.RESOLUTIONS
+ROLLUP_COLLECTIONS = ["rollup_1m", "rollup_1h", "rollup_1d"]
+
+# Artık hiçbir sorgunun kullanmadığı, varsa kaldırılan indeksler
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    # Okumalarda "parameter" alanı yoktur; her parametrenin kendi kısmi indeksi vardır
+    "air_quality_data": ["location_2dsphere", "parameter_1_timestamp_-1"],
+    # ROLLUP_1M_RETENTION_DAYS=0 iken TTL tanımlanmaz; önceden oluşturulmuş TTL indeksi kaldırılır
+    "rollup_1m": ["bucket_1_ttl"]
+}
+
+
+class IndexSpec:
+    """
+    Bir koleksiyonda bulunması gereken tek bir indeks ve onu gerektiren sorgu biçimi.
+    """
+
+    __slots__ = ("collection", "keys", "name", "options", "reason", "timeseries")
+
+    def __init__(
+        self,
+        collection: str,
+        keys: List[Tuple[str, Any]],
+        name: str,
+        reason: str,
+        timeseries: bool = True,
+        **options
+    ):
+        self.collection = collection
+        self.keys = keys
+        self.name = name
+        # İndeksi gerektiren sorgu (kod içindeki yeri)
+        self.reason = reason
+        # Zaman serisi düzeninde de oluşturulup oluşturulmayacağı
+        self.timeseries = timeseries
+        self.options = options
+
+    def to_index_model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+
+def _pollutant_specs() -> List[IndexSpec]:
+    return [
+        IndexSpec(
+            "air_quality_data",
+            # Anahtar kalıbı düz timestamp indeksinden farklı olmalı; parametre ikinci anahtar olarak eklenir
+            [("timestamp", DESCENDING), (parameter, ASCENDING)],
+            f"timestamp_-1_{parameter}_1_partial",
+            f"{{{parameter}: {{$exists: true}}, timestamp: aralık}}: get_data_by_parameter, "
+            "WebSocket filtreleri, ham harita/yoğunluk aggregation'ları",
+            # Zaman serisi koleksiyonlarında kısmi indeks sadece meta/zaman alanlarıyla tanımlanabilir
+            timeseries=False,
+            partialFilterExpression={parameter: {"$exists": True}}
+        )
+        for parameter in POLLUTANTS
+    ]
+
+
+# Sorgu biçimlerinden türetilen indeks kümesi
+INDEX_SPECS: List[IndexSpec] = [
+    IndexSpec(
+        "air_quality_data",
+        [("timestamp", DESCENDING)],
+        "timestamp_-1",
+        "{timestamp: aralık} sort timestamp: get_air_quality_data, kayan istatistik ısıtması",
+        timeseries=False
+    ),
+    *_pollutant_specs(),
+    IndexSpec(
+        "air_quality_data",
+        [("meta.station", ASCENDING), ("timestamp", DESCENDING)],
+        "meta.station_1_timestamp_-1",
+        "{meta.station, timestamp: aralık}: istasyon geçmişi"
+    ),
+    IndexSpec(
+        "air_quality_data",
+        [("station_id", ASCENDING), ("timestamp", ASCENDING)],
+        "station_id_1_timestamp_1",
+        "{station_id: aralık, timestamp: aralık} sort station_id, timestamp: scripts/rescan_anomalies.py bölümleri",
+        timeseries=False
+    ),
+    IndexSpec(
+        "air_quality_data",
+        [("location", GEOSPHERE), ("timestamp", DESCENDING)],
+        "location_2dsphere_timestamp_-1",
+        "{location: $geoWithin/$nearSphere, timestamp: aralık}: get_air_quality_near",
+        timeseries=False
+    ),
+    IndexSpec(
+        "air_quality_data",
+        [("location", GEOSPHERE)],
+        "location_2dsphere",
+        "$geoNear (zaman serisi düzeni): get_air_quality_near"
+    ),
+    IndexSpec(
+        "anomalies",
+        [("detected_at", DESCENDING)],
+        "detected_at_-1",
+        "{detected_at: aralık} sort detected_at: get_anomalies, /api/anomalies"
+    ),
+    IndexSpec(
+        "anomalies",
+        [("parameter", ASCENDING), ("detected_at", DESCENDING)],
+        "parameter_1_detected_at_-1",
+        "{parameter, detected_at: aralık}: parametreye göre anomaliler"
+    ),
+    IndexSpec(
+        "anomalies",
+        [("reading_id", ASCENDING), ("parameter", ASCENDING), ("detection_method", ASCENDING)],
+        "reading_id_1_parameter_1_detection_method_1",
+        "{reading_id, parameter, detection_method}: scripts/rescan_anomalies.py upsert'leri",
+        partialFilterExpression={"reading_id": {"$exists": True}}
+    ),
+    IndexSpec(
+        "anomalies",
+        [("data.location", GEOSPHERE)],
+        "data.location_2dsphere",
+        "{data.location: $geoWithin}: konuma göre anomaliler"
+    ),
+    IndexSpec(
+        "locations",
+        [("location", GEOSPHERE)],
+        "location_2dsphere",
+        "{location: $nearSphere}: en yakın istasyon"
+    ),
+    IndexSpec(
+        "locations",
+        [("key", ASCENDING)],
+        "key_1",
+        "{key}: aynı konumun iki istasyon olarak kaydedilmesini engeller",
+        unique=True,
+        partialFilterExpression={"key": {"$exists": True}}
+    ),
+    IndexSpec(
+        "locations",
+        [("name", ASCENDING)],
+        "name_1",
+        "{name}: istasyon adı araması"
+    ),
+    *[
+        IndexSpec(
+            collection,
+            [("parameter", ASCENDING), ("bucket", ASCENDING), ("station", ASCENDING)],
+            "parameter_1_bucket_1_station_1",
+            "{parameter, bucket: aralık}: harita/yoğunluk; {station, parameter, bucket}: upsert",
+            unique=True
+        )
+        for collection in ROLLUP_COLLECTIONS
+    ],
+    # rollup_1m sadece kısa pencereleri karşılar; kovaları saklama süresi dolunca silinir
+    *(
+        [IndexSpec(
+            "rollup_1m",
+            [("bucket", ASCENDING)],
+            "bucket_1_ttl",
+            "TTL: rollup_1m kovaları ROLLUP_1M_RETENTION_DAYS sonra silinir",
+            expireAfterSeconds=settings.ROLLUP_1M_RETENTION_DAYS * 86400
+        )]
+        if settings.ROLLUP_1M_RETENTION_DAYS > 0 else []
+    )
+]
+
+
+def query_shapes(now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Uygulamanın sıcak sorgularını explain() ile denetlenebilecek örnek find komutları olarak döndürür.
+
+    Args:
+        now (Optional[datetime], optional): Zaman aralıkları için referans zamanı
+
+    Returns:
+        List[Dict[str, Any]]: {"name", "collection", "filter", "sort"} sözlükleri
+    """
+    now = now or datetime.utcnow()
+    last_hour = {"$gte": now - timedelta(hours=1), "$lte": now}
+    last_day = {"$gte": now - timedelta(days=1), "$lte": now}
+
+    shapes = [
+        {"name": "son_okumalar", "collection": "air_quality_data",
+         "filter": {"timestamp": last_hour}, "sort": {"timestamp": -1}},
+        {"name": "istasyon_gecmisi", "collection": "air_quality_data",
+         "filter": {"meta.station": "41.008,28.978", "timestamp": last_day}, "sort": {"timestamp": -1}},
+        {"name": "yakindaki_okumalar", "collection": "air_quality_data",
+         "filter": {
+             "location": {"$geoWithin": {"$centerSphere": [[28.9784, 41.0082], 25 / 6378.1]}},
+             "timestamp": last_day
+         },
+         "sort": {"timestamp": -1}},
+        {"name": "yeniden_tarama_bolumu", "collection": "air_quality_data",
+         "filter": {"station_id": {"$gte": 0, "$lte": 100}, "timestamp": last_day},
+         "sort": {"station_id": 1, "timestamp": 1}},
+        {"name": "son_anomaliler", "collection": "anomalies",
+         "filter": {"detected_at": last_day}, "sort": {"detected_at": -1}},
+        {"name": "parametre_anomalileri", "collection": "anomalies",
+         "filter": {"parameter": "pm25", "detected_at": last_day}, "sort": {"detected_at": -1}},
+        {"name": "ozet_harita", "collection": "rollup_1h",
+         "filter": {"parameter": "pm25", "bucket": {"$gte": now - timedelta(days=7)}}, "sort": None}
+    ]
+    shapes += [
+        {"name": f"{parameter}_araligi", "collection": "air_quality_data",
+         "filter": {parameter: {"$exists": True}, "timestamp": last_day}, "sort": {"timestamp": -1}}
+        for parameter in POLLUTANTS
+    ]
+    return shapes
+
+
+def _plan_stages(plan: Dict[str, Any], stages: List[str], indexes: List[str]):
+    """Sorgu planı ağacındaki aşama ve indeks adlarını toplar."""
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if "indexName" in plan:
+        indexes.append(plan["indexName"])
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            _plan_stages(plan[key], stages, indexes)
+    for child in plan.get("inputStages", []):
+        _plan_stages(child, stages, indexes)
+
+
+class IndexManager:
+    """
+    INDEX_SPECS'te tanımlanan indeksleri oluşturur, eskimiş olanları kaldırır ve sıcak
+    sorguların planlarını explain() ile denetler.
+    """
+
+    def specs_for(self, timeseries: bool) -> List[IndexSpec]:
+        """
+        Koleksiyon düzenine göre oluşturulacak indeksleri döndürür.
+
+        Args:
+            timeseries (bool): air_quality_data zaman serisi koleksiyonu mu
+
+        Returns:
+            List[IndexSpec]: Uygulanacak indeks tanımları
+        """
+        specs = []
+        for spec in INDEX_SPECS:
+            if spec.collection == "air_quality_data":
+                if timeseries and not spec.timeseries:
+                    continue
+                if not timeseries and spec.name == "location_2dsphere":
+                    continue
+            specs.append(spec)
+        return specs
+
+    async def ensure(self, database, timeseries: bool = False):
+        """
+        Tanımlı indeksleri oluşturur ve OBSOLETE_INDEXES'teki indeksleri (bu düzende
+        tanımlı değillerse) kaldırır. Tanımda olmayan diğer indekslere dokunulmaz.
+
+        Args:
+            database: Motor veritabanı nesnesi
+            timeseries (bool, optional): air_quality_data zaman serisi koleksiyonu mu
+        """
+        by_collection: Dict[str, List[IndexSpec]] = {}
+        for spec in self.specs_for(timeseries):
+            by_collection.setdefault(spec.collection, []).append(spec)
+
+        for collection, names in OBSOLETE_INDEXES.items():
+            existing = await database[collection].index_information()
+            wanted = {spec.name for spec in by_collection.get(collection, [])}
+            for name in names:
+                if name in existing and name not in wanted:
+                    await database[collection].drop_index(name)
+                    logger.info(f"Eski indeks kaldırıldı: {collection}.{name}")
+
+        for collection, specs in by_collection.items():
+            await self._sync_ttl(database, collection, specs)
+            await database[collection].create_indexes([spec.to_index_model() for spec in specs])
+        logger.info(f"{sum(len(specs) for specs in by_collection.values())} indeks doğrulandı")
+
+    async def _sync_ttl(self, database, collection: str, specs: List[IndexSpec]):
+        """Saklama süresi değişen TTL indekslerini collMod ile günceller (yeniden oluşturmak çakışır)."""
+        existing = await database[collection].index_information()
+        for spec in specs:
+            ttl = spec.options.get("expireAfterSeconds")
+            current = existing.get(spec.name, {}).get("expireAfterSeconds")
+            if ttl is not None and current is not None and current != ttl:
+                await database.command({
+                    "collMod": collection,
+                    "index": {"name": spec.name, "expireAfterSeconds": ttl}
+                })
+                logger.info(f"TTL güncellendi: {collection}.{spec.name} {current} -> {ttl} sn")
+
+    async def explain(self, database, shape: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tek bir sorgu biçiminin kazanan planını özetler.
+
+        Args:
+            database: Motor veritabanı nesnesi
+            shape (Dict[str, Any]): query_shapes() elemanı
+
+        Returns:
+            Dict[str, Any]: {"name", "collection", "stages", "indexes", "collscan"}
+        """
+        command = {"find": shape["collection"], "filter": shape["filter"], "limit": 100}
+        if shape.get("sort"):
+            command["sort"] = shape["sort"]
+        result = await database.command({"explain": command, "verbosity": "queryPlanner"})
+
+        stages: List[str] = []
+        indexes: List[str] = []
+        _plan_stages(result.get("queryPlanner", {}).get("winningPlan", {}), stages, indexes)
+        return {
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "stages": stages,
+            "indexes": indexes,
+            "collscan": "COLLSCAN" in stages
+        }
+
+    async def report(self, database, timeseries: bool = False) -> List[Dict[str, Any]]:
+        """
+        Tüm sıcak sorguları explain() ile denetler ve COLLSCAN'e düşenleri uyarı olarak loglar.
+
+        Zaman serisi koleksiyonları kovalar üzerinde her zaman COLLSCAN yaptığı için
+        air_quality_data sorguları bu düzende denetlenmez.
+
+        Args:
+            database: Motor veritabanı nesnesi
+            timeseries (bool, optional): air_quality_data zaman serisi koleksiyonu mu
+
+        Returns:
+            List[Dict[str, Any]]: Sorgu başına plan özeti
+        """
+        results = []
+        for shape in query_shapes():
+            if timeseries and shape["collection"] == "air_quality_data":
+                continue
+            try:
+                summary = await self.explain(database, shape)
+            except Exception as e:
+                logger.error(f"Sorgu planı alınamadı ({shape['name']}): {str(e)}")
+                continue
+            if summary["collscan"]:
+                logger.warning(f"Sorgu COLLSCAN kullanıyor: {summary['name']} ({summary['collection']})")
+            results.append(summary)
+        return results
+
+
+# Singleton instance
+index_manager = IndexManager()
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Callable, List
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+from app.config import settings
+from app.services.rabbitmq import rabbitmq
+from app.services.sharding import RAW_QUEUE, shard_queue
+
+logger = logging.getLogger(__name__)
+
+# Varsayılan Prometheus kovaları (5 ms - 10 sn) detector çağrıları için fazla kaba
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+API_PUBLISH_SECONDS = Histogram(
+    "air_quality_api_publish_seconds",
+    "API'de okumaların RabbitMQ'ya yayınlanma süresi",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS
+)
+WORKER_CONSUME_TO_ACK_SECONDS = Histogram(
+    "air_quality_worker_consume_to_ack_seconds",
+    "Worker'da mesajın alınmasından onaylanmasına (ack/nack) kadar geçen süre",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS
+)
+MONGO_INSERT_SECONDS = Histogram(
+    "air_quality_mongo_insert_seconds",
+    "MongoDB yazma süresi",
+    ["collection", "operation"],
+    buckets=LATENCY_BUCKETS
+)
+DETECTION_SECONDS = Histogram(
+    "air_quality_anomaly_detection_seconds",
+    "AnomalyDetector metotlarının süresi",
+    ["method"],
+    buckets=LATENCY_BUCKETS
+)
+WEBSOCKET_BROADCAST_SECONDS = Histogram(
+    "air_quality_websocket_broadcast_seconds",
+    "Mesajın serileştirilip kanaldaki bağlantıların kuyruklarına eklenme süresi",
+    ["channel"],
+    buckets=LATENCY_BUCKETS
+)
+WEBSOCKET_SEND_SECONDS = Histogram(
+    "air_quality_websocket_send_seconds",
+    "Tek bir bağlantıya tek mesajın gönderim süresi",
+    ["channel"],
+    buckets=LATENCY_BUCKETS
+)
+ANOMALIES_TOTAL = Counter(
+    "air_quality_anomalies",
+    "Tespit edilen anomaliler",
+    ["parameter", "severity"]
+)
+QUEUE_DEPTH = Gauge(
+    "air_quality_queue_depth",
+    "RabbitMQ kuyruğunda bekleyen mesaj sayısı (scrape anında okunur)",
+    ["queue"]
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "air_quality_event_loop_lag_seconds",
+    "Olay döngüsünün planlanan uyanmadan ne kadar geç uyandığı",
+    buckets=LATENCY_BUCKETS
+)
+
+
+def timed(histogram) -> Callable:
+    """
+    Fonksiyonun (sync ya da async) süresini histograma kaydeden dekoratör.
+
+    Etiketli histogramlarda etiketler dekorasyon anında bağlanmalıdır
+    (ör. timed(DETECTION_SECONDS.labels(method="detect_batch"))); çağrı başına
+    etiket çözümlemesi yapılmaz.
+
+    Args:
+        histogram: Histogram ya da etiketleri bağlanmış alt histogram
+
+    Returns:
+        Callable: Dekoratör
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def monitored_queues() -> List[str]:
+    """Derinliği raporlanan kuyrukların adlarını döndürür."""
+    queues = [RAW_QUEUE]
+    if settings.WORKER_SHARDS > 1:
+        queues += [shard_queue(shard) for shard in range(settings.WORKER_SHARDS)]
+    return queues + ["processed_data", "anomaly_notifications"]
+
+
+async def refresh_queue_depths():
+    """Kuyruk derinliği göstergelerini broker'dan günceller."""
+    for queue, depth in (await rabbitmq.queue_depths(monitored_queues())).items():
+        QUEUE_DEPTH.labels(queue=queue).set(depth)
+
+
+async def render() -> bytes:
+    """
+    /metrics yanıtını üretir; kuyruk derinlikleri her scrape'te yeniden okunur.
+
+    Returns:
+        bytes: Prometheus metin formatında metrikler
+    """
+    try:
+        await refresh_queue_depths()
+    except Exception as e:
+        logger.warning(f"Kuyruk derinlikleri okunamadı: {str(e)}")
+    return generate_latest()
+
+
+async def monitor_loop_lag(interval: float):
+    """
+    Olay döngüsü gecikmesini interval saniyede bir ölçer.
+
+    Args:
+        interval (float): Ölçüm aralığı (saniye)
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+def start_loop_lag_monitor() -> asyncio.Task:
+    """Olay döngüsü gecikmesi ölçümünü arka planda başlatır."""
+    return asyncio.create_task(monitor_loop_lag(settings.METRICS_LOOP_LAG_INTERVAL))
+
+
+def start_worker_metrics_server(index: int):
+    """
+    Ayrı worker süreçlerinin metriklerini kendi HTTP sunucularında yayınlar.
+
+    Her süreç METRICS_WORKER_PORT + index portunu kullanır; 0 ise sunucu açılmaz.
+
+    Args:
+        index (int): Worker sürecinin sırası
+    """
+    if settings.METRICS_WORKER_PORT:
+        start_http_server(settings.METRICS_WORKER_PORT + index)
+        logger.info(f"Worker metrikleri yayınlanıyor: :{settings.METRICS_WORKER_PORT + index}/metrics")
+
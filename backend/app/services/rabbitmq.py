@@ -1,26 +1,147 @@
 import aio_pika
-import json
 import logging
 import asyncio
-from typing import Callable, Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Set
 from app.config import settings
 from datetime import datetime
-from bson import ObjectId
-from aio_pika import connect_robust, Message, ExchangeType
+from aio_pika import connect_robust, Message, ExchangeType, DeliveryMode
+from aio_pika.exceptions import AMQPError, ChannelInvalidStateError, DeliveryError, PublishError
+from app.services.codec import MessageCodec, decode_message
+from app.services.sharding import shard_queue, shard_routing_key
 
 logger = logging.getLogger(__name__)
 
-# Tarih/zaman ve ObjectId nesneleri için özel JSON encoder
-class CustomJSONEncoder(json.JSONEncoder):
+# Yayınlama modları
+PUBLISH_MODES = ("safety", "throughput")
+
+# Worker'ların yeni veri yazılan parametreleri duyurduğu fanout exchange; her API süreci kendi
+# geçici kuyruğunu bağlar ve harita/yoğunluk önbelleğini eskitir
+CACHE_INVALIDATION_EXCHANGE = "cache_invalidation"
+
+# Tekrar denenen yayınlama hataları: nack, yönlendirilemeyen mesaj (return), zaman aşımı, kanal/bağlantı kaybı
+RETRYABLE_PUBLISH_ERRORS = (DeliveryError, PublishError, asyncio.TimeoutError, ChannelInvalidStateError, AMQPError)
+
+
+class ConfirmPublisher:
     """
-    datetime ve ObjectId nesnelerini uygun formatlara dönüştüren özel JSON encoder
+    Publisher confirm penceresi sınırlı, boru hattı (pipelined) şeklinde yayın yapan yayınlayıcı.
+
+    Her yayın bir pencere yuvası alır ve onay gelene kadar tutar; böylece en fazla
+    window mesaj onay beklerken kanal üzerinde birlikte ilerler. Eşzamanlı çağrılar
+    (ör. bir batch'in bildirimleri) birbirinin onayını beklemeden aynı pencereyi paylaşır.
+    Nack, return ve zaman aşımında mesaj üstel bekleme ile tekrar gönderilir; onayı
+    kaybolan bir mesajın tekrarı tüketicide çift kayıt oluşturabilir.
+
+    Modlar:
+      - safety: mesajlar kalıcıdır (persistent) ve publish() onay gelene kadar döner
+      - throughput: mesajlar geçicidir ve publish() pencerede yer bulunca döner;
+        onaylar ve tekrarlar arka planda izlenir, kalıcı hatalar loglanır
     """
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        return super().default(obj)
+
+    def __init__(self, mode: str = "safety", window: int = 256, retries: int = 3, timeout: float = 10.0):
+        if mode not in PUBLISH_MODES:
+            raise ValueError(f"Geçersiz yayınlama modu: {mode} (beklenen: {', '.join(PUBLISH_MODES)})")
+        self.mode = mode
+        self.window = max(1, window)
+        self.retries = max(0, retries)
+        self.timeout = timeout
+        self.exchange = None
+        # Python 3.9'da Semaphore oluşturulduğu andaki olay döngüsüne bağlanır; singleton import
+        # anında (asyncio.run'dan önce) oluşturulduğu için yuva ilk yayında oluşturulur
+        self._slots_semaphore: Optional[asyncio.Semaphore] = None
+        # Arka planda onayı beklenen yayınlar (throughput modu)
+        self._inflight: Set[asyncio.Task] = set()
+        self.stats = {"published": 0, "confirmed": 0, "retried": 0, "failed": 0}
+
+    @property
+    def _slots(self) -> asyncio.Semaphore:
+        if self._slots_semaphore is None:
+            self._slots_semaphore = asyncio.Semaphore(self.window)
+        return self._slots_semaphore
+
+    @property
+    def delivery_mode(self) -> DeliveryMode:
+        return DeliveryMode.PERSISTENT if self.mode == "safety" else DeliveryMode.NOT_PERSISTENT
+
+    def message(self, body: bytes, **properties) -> Message:
+        """
+        Moda uygun teslim biçimiyle mesaj oluşturur.
+
+        Args:
+            body (bytes): Mesaj gövdesi
+            **properties: Message için ek özellikler
+
+        Returns:
+            Message: Yayınlanacak mesaj
+        """
+        return Message(body, delivery_mode=self.delivery_mode, **properties)
+
+    async def publish(self, routing_key: str, message: Message):
+        """
+        Mesajı pencere sınırı içinde yayınlar.
+
+        Args:
+            routing_key (str): Yönlendirme anahtarı
+            message (Message): Yayınlanacak mesaj
+
+        Raises:
+            Exception: safety modunda tüm denemeler başarısız olursa son hata
+        """
+        if not self.exchange:
+            raise Exception("RabbitMQ bağlantısı kurulmadan mesaj yayınlanamaz")
+
+        await self._slots.acquire()
+        self.stats["published"] += 1
+        if self.mode == "safety":
+            try:
+                await self._send(routing_key, message)
+            finally:
+                self._slots.release()
+            return
+
+        task = asyncio.create_task(self._send(routing_key, message))
+        self._inflight.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Mesaj yayınlanamadı: {str(task.exception())}")
+
+    async def _send(self, routing_key: str, message: Message):
+        """Mesajı onaylanana kadar, en fazla retries kez tekrar ederek gönderir."""
+        for attempt in range(self.retries + 1):
+            try:
+                await self.exchange.publish(message, routing_key=routing_key, timeout=self.timeout)
+                self.stats["confirmed"] += 1
+                return
+            except RETRYABLE_PUBLISH_ERRORS as e:
+                if attempt == self.retries:
+                    self.stats["failed"] += 1
+                    raise
+                self.stats["retried"] += 1
+                delay = min(0.1 * 2 ** attempt, 5.0)
+                logger.warning(
+                    f"Mesaj onaylanmadı ({routing_key}, {type(e).__name__}), "
+                    f"{delay:.1f} sn sonra tekrar denenecek ({attempt + 1}/{self.retries})"
+                )
+                await asyncio.sleep(delay)
+
+    async def flush(self):
+        """Arka planda onayı beklenen tüm yayınların bitmesini bekler."""
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Yayınlama sayaçlarını ve pencere doluluğunu döndürür."""
+        return dict(
+            self.stats,
+            mode=self.mode,
+            window=self.window,
+            in_flight=self.window - self._slots_semaphore._value if self._slots_semaphore else 0
+        )
+
 
 class RabbitMQ:
     """
@@ -31,9 +152,25 @@ class RabbitMQ:
         self.connection = None
         self.channel = None
         self.exchange = None
+        self.invalidation_exchange = None
         self.queues = {}
+        # consume() ile açılan, QoS uygulanmış tüketici kanalları
+        self.consumer_channels = []
+        # Kuyruk derinliği sorguları için ayrı kanal; pasif declare hatası ana kanalı kapatmasın
+        self.monitor_channel = None
         self.max_retries = 5
         self.retry_delay = 5  # saniye
+        self.publisher = ConfirmPublisher(
+            mode=settings.RABBITMQ_PUBLISH_MODE,
+            window=settings.RABBITMQ_CONFIRM_WINDOW,
+            retries=settings.RABBITMQ_PUBLISH_RETRIES,
+            timeout=settings.RABBITMQ_PUBLISH_TIMEOUT
+        )
+        self.codec = MessageCodec(
+            codec=settings.MESSAGE_CODEC,
+            compression=settings.MESSAGE_COMPRESSION,
+            compress_min_bytes=settings.MESSAGE_COMPRESS_MIN_BYTES
+        )
     
     async def connect(self):
         """
@@ -46,13 +183,14 @@ class RabbitMQ:
             # Bağlantı kur
             self.connection = await connect_robust(connection_url)
             
-            # Kanal oluştur
-            self.channel = await self.connection.channel()
+            # Kanal oluştur; yönlendirilemeyen mesajlar sessizce kaybolmak yerine hata olarak döner
+            self.channel = await self.connection.channel(publisher_confirms=True, on_return_raises=True)
             
             # Exchange oluştur (topic tipinde)
             self.exchange = await self.channel.declare_exchange(
                 "air_quality_exchange", ExchangeType.TOPIC, durable=True
             )
+            self.publisher.exchange = self.exchange
             
             logger.info(f"RabbitMQ bağlantısı kuruldu: {settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}")
             
@@ -75,6 +213,7 @@ class RabbitMQ:
             self.exchange = await self.channel.declare_exchange(
                 "air_quality_exchange", ExchangeType.TOPIC, durable=True
             )
+            self.publisher.exchange = self.exchange
             
             # Ham veri kuyruğu
             raw_data_queue = await self.channel.declare_queue(
@@ -84,6 +223,14 @@ class RabbitMQ:
             self.queues["raw_data"] = raw_data_queue
             logger.info("RabbitMQ raw_data kuyruğu oluşturuldu")
             
+            # Parçalı düzende istasyonların jump hash ile dağıtıldığı raw_data.{i} kuyrukları
+            if settings.WORKER_SHARDS > 1:
+                for shard in range(settings.WORKER_SHARDS):
+                    shard_data_queue = await self.channel.declare_queue(shard_queue(shard), durable=True)
+                    await shard_data_queue.bind(self.exchange, shard_routing_key(shard))
+                    self.queues[shard_queue(shard)] = shard_data_queue
+                logger.info(f"RabbitMQ {settings.WORKER_SHARDS} raw_data parça kuyruğu oluşturuldu")
+            
             # İşlenmiş veri kuyruğu
             processed_data_queue = await self.channel.declare_queue(
                 "processed_data", durable=True
@@ -100,6 +247,11 @@ class RabbitMQ:
             self.queues["anomaly_notifications"] = anomaly_queue
             logger.info("RabbitMQ anomaly_notifications kuyruğu oluşturuldu")
             
+            # Önbellek eskitme sinyalleri (worker -> API süreçleri)
+            self.invalidation_exchange = await self.channel.declare_exchange(
+                CACHE_INVALIDATION_EXCHANGE, ExchangeType.FANOUT, durable=True
+            )
+            
             logger.info("RabbitMQ exchange ve kuyrukları başarıyla oluşturuldu")
         except Exception as e:
             logger.error(f"RabbitMQ kuyrukları oluşturulurken hata: {str(e)}")
@@ -110,32 +262,107 @@ class RabbitMQ:
         """Geriye dönük uyumluluk için"""
         await self.setup_exchanges_and_queues()
     
-    async def publish(self, routing_key: str, data: Dict[str, Any]):
+    async def publish(self, routing_key: str, data: Dict[str, Any], headers: Optional[Dict[str, Any]] = None):
         """
         Exchange'e mesaj yayınlar.
         
         Args:
             routing_key (str): Yönlendirme anahtarı
             data (Dict[str, Any]): Yayınlanacak veri
+            headers (Optional[Dict[str, Any]], optional): Mesaja eklenecek ek başlıklar (ör. iz bağlamı)
         """
         if not self.exchange:
             raise Exception("RabbitMQ bağlantısı kurulmadan mesaj yayınlanamaz")
         
-        # Veriyi JSON formatına dönüştür
-        message_body = json.dumps(data, cls=CustomJSONEncoder).encode()
+        # Veriyi ayarlı kodlamaya dönüştür; content_type/content_encoding tüketicinin çözmesi için eklenir
+        message_body, properties = self.codec.encode(data)
         
         # Mesaj oluştur
-        message = Message(
+        message = self.publisher.message(
             message_body,
-            content_type="application/json",
+            **properties,
             timestamp=datetime.utcnow().timestamp(),
-            headers={"source": "api"}
+            headers=dict(headers, source="api") if headers else {"source": "api"}
         )
         
-        # Mesajı yayınla
-        await self.exchange.publish(message, routing_key=routing_key)
+        # Mesajı onay penceresi üzerinden yayınla
+        await self.publisher.publish(routing_key, message)
         logger.debug(f"Mesaj yayınlandı: {routing_key}")
-    
+
+    async def publish_batch(self, routing_key: str, items: List[Dict[str, Any]], chunk_size: int = 500,
+                            headers: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Birden fazla kaydı, her biri JSON dizisi taşıyan az sayıda mesaj olarak yayınlar.
+
+        Args:
+            routing_key (str): Yönlendirme anahtarı
+            items (List[Dict[str, Any]]): Yayınlanacak kayıtlar
+            chunk_size (int, optional): Tek mesajdaki en fazla kayıt sayısı. Varsayılan 500.
+            headers (Optional[Dict[str, Any]], optional): Her mesaja eklenecek ek başlıklar
+
+        Returns:
+            int: Yayınlanan mesaj sayısı
+        """
+        if not self.exchange:
+            raise Exception("RabbitMQ bağlantısı kurulmadan mesaj yayınlanamaz")
+
+        chunk_size = max(1, chunk_size)
+        messages = []
+
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            body, properties = self.codec.encode(chunk)
+            messages.append(self.publisher.message(
+                body,
+                **properties,
+                timestamp=datetime.utcnow().timestamp(),
+                headers=dict(headers or {}, source="api", batch_size=len(chunk))
+            ))
+
+        # Parçaları sırayla beklemek yerine aynı onay penceresinde birlikte gönder
+        await asyncio.gather(*(self.publisher.publish(routing_key, message) for message in messages))
+        published = len(messages)
+
+        logger.debug(f"{len(items)} kayıt {published} mesaj halinde yayınlandı: {routing_key}")
+        return published
+
+    async def publish_cache_invalidation(self, parameters: List[str]):
+        """
+        Yeni veri yazılan parametreleri önbellek tutan tüm API süreçlerine duyurur.
+
+        Sinyal kalıcı değildir ve dinleyen süreç yoksa kaybolur; kaçırılan bir sinyalin
+        etkisi AGGREGATION_CACHE_TTL ile sınırlıdır.
+
+        Args:
+            parameters (List[str]): Kirlilik parametreleri
+        """
+        if not self.invalidation_exchange:
+            raise Exception("RabbitMQ bağlantısı kurulmadan önbellek sinyali yayınlanamaz")
+        
+        body, properties = self.codec.encode({"parameters": parameters})
+        await self.invalidation_exchange.publish(
+            Message(body, delivery_mode=DeliveryMode.NOT_PERSISTENT, **properties),
+            routing_key="",
+            mandatory=False
+        )
+
+    async def consume_cache_invalidations(self, callback):
+        """
+        Önbellek eskitme sinyallerini bu sürece özel, bağlantı kapanınca silinen bir kuyrukla dinler.
+
+        Args:
+            callback: Mesaj alındığında çağrılacak fonksiyon (mesajlar otomatik onaylanır)
+        """
+        if not self.connection or not self.invalidation_exchange:
+            raise Exception("RabbitMQ bağlantısı kurulmadan önbellek sinyalleri dinlenemez")
+        
+        channel = await self.connection.channel()
+        queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(CACHE_INVALIDATION_EXCHANGE)
+        await queue.consume(callback, no_ack=True)
+        self.consumer_channels.append(channel)
+        logger.info("Önbellek eskitme sinyalleri dinleniyor")
+
     async def get_message(self, queue_name: str) -> Optional[Dict[str, Any]]:
         """
         Belirtilen kuyruktan bir mesaj alır.
@@ -158,9 +385,8 @@ class RabbitMQ:
                     # Mesajı işaretleme (acknowledgment)
                     await message.ack()
                     
-                    # Mesaj içeriğini JSON olarak çözümle
-                    message_body = message.body.decode()
-                    data = json.loads(message_body)
+                    # Mesaj içeriğini content_type/content_encoding'e göre çözümle
+                    data = decode_message(message)
                     return data
                 except Exception as e:
                     logger.error(f"Mesaj işlenirken hata: {str(e)}")
@@ -170,31 +396,85 @@ class RabbitMQ:
             
         return None
     
-    async def consume(self, queue_name: str, callback):
+    async def consume(self, queue_name: str, callback, prefetch_count: Optional[int] = None, channels: int = 1):
         """
         Belirtilen kuyruktan mesajları tüketmek için bir tüketici başlatır.
         
+        prefetch_count verilirse tüketici(ler) ayrı kanal(lar) üzerinde açılır ve her
+        kanala QoS uygulanır; böylece broker onaylanmamış en fazla prefetch_count
+        mesajı kanal başına teslim eder.
+        
         Args:
             queue_name (str): Mesajların tüketileceği kuyruk adı
             callback: Mesaj alındığında çağrılacak fonksiyon
+            prefetch_count (Optional[int], optional): Kanal başına onaylanmamış mesaj sınırı
+            channels (int, optional): Açılacak tüketici kanalı sayısı. Varsayılan 1.
         """
         if not self.channel or queue_name not in self.queues:
             raise Exception(f"RabbitMQ {queue_name} kuyruğu bulunamadı")
         
-        # Tüketme işlemi başlat
-        await self.queues[queue_name].consume(callback)
-        logger.info(f"RabbitMQ {queue_name} kuyruğundan tüketim başladı")
+        if prefetch_count is None:
+            # Tüketme işlemi başlat
+            await self.queues[queue_name].consume(callback)
+            logger.info(f"RabbitMQ {queue_name} kuyruğundan tüketim başladı")
+            return
+        
+        for _ in range(max(1, channels)):
+            channel = await self.connection.channel()
+            await channel.set_qos(prefetch_count=prefetch_count)
+            queue = await channel.get_queue(queue_name, ensure=True)
+            await queue.consume(callback)
+            self.consumer_channels.append(channel)
+        
+        logger.info(
+            f"RabbitMQ {queue_name} kuyruğundan tüketim başladı "
+            f"(kanal: {max(1, channels)}, prefetch: {prefetch_count})"
+        )
+    
+    async def queue_depths(self, queue_names: List[str]) -> Dict[str, int]:
+        """
+        Kuyruklardaki bekleyen mesaj sayılarını pasif declare ile okur.
+        
+        Pasif declare kuyruğu oluşturmaz; kuyruk yoksa broker kanalı kapatır. Bu yüzden
+        sorgular ayrı bir kanalda yapılır ve kapanan kanal bir sonraki çağrıda yeniden açılır.
+        
+        Args:
+            queue_names (List[str]): Kuyruk adları
+        
+        Returns:
+            Dict[str, int]: Kuyruk adı -> bekleyen mesaj sayısı (bulunamayan kuyruklar hariç)
+        """
+        if not self.connection:
+            return {}
+        
+        depths = {}
+        for name in queue_names:
+            try:
+                if self.monitor_channel is None or self.monitor_channel.is_closed:
+                    self.monitor_channel = await self.connection.channel()
+                queue = await self.monitor_channel.declare_queue(name, passive=True)
+                depths[name] = queue.declaration_result.message_count
+            except (AMQPError, ChannelInvalidStateError) as e:
+                logger.debug(f"{name} kuyruğunun derinliği okunamadı: {str(e)}")
+                self.monitor_channel = None
+        return depths
     
     async def close(self):
         """
         RabbitMQ bağlantısını kapatır
         """
         if self.connection:
+            # Arka planda onayı beklenen mesajları bırakmadan kapat
+            await self.publisher.flush()
             await self.connection.close()
             self.connection = None
             self.channel = None
             self.exchange = None
+            self.invalidation_exchange = None
+            self.publisher.exchange = None
             self.queues = {}
+            self.consumer_channels = []
+            self.monitor_channel = None
             logger.info("RabbitMQ bağlantısı kapatıldı")
 
 # Singleton instance
@@ -0,0 +1,293 @@
+import logging
+import math
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from app.models.air_quality import AirQualityData, station_key_of
+from app.services.database import db
+
+logger = logging.getLogger(__name__)
+
+# İstatistik tutulan kirlilik parametreleri
+PARAMETERS = ["pm25", "pm10", "no2", "so2", "o3"]
+
+
+def to_naive_utc(timestamp: datetime) -> datetime:
+    """Zaman damgasını MongoDB'nin döndürdüğü gibi saat dilimsiz UTC'ye çevirir."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+class RunningStats:
+    """
+    Welford algoritması ile artımlı ortalama ve varyans hesaplayan sayaç.
+    """
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float):
+        """Yeni bir değeri ekler."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Popülasyon varyansı (np.var ile aynı)."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """Popülasyon standart sapması (np.std ile aynı)."""
+        return math.sqrt(self.variance)
+
+    @classmethod
+    def merge(cls, parts: Iterable["RunningStats"]) -> "RunningStats":
+        """
+        Birden fazla sayacı Chan'ın paralel varyans formülü ile birleştirir.
+
+        Args:
+            parts (Iterable[RunningStats]): Birleştirilecek sayaçlar
+
+        Returns:
+            RunningStats: Birleşik sayaç
+        """
+        result = cls()
+        for part in parts:
+            if not part.count:
+                continue
+            total = result.count + part.count
+            delta = part.mean - result.mean
+            result.m2 += part.m2 + delta * delta * result.count * part.count / total
+            result.mean += delta * part.count / total
+            result.count = total
+        return result
+
+
+class DailyStats:
+    """Tek bir günün (UTC) genel ve saatlik sayaçları."""
+
+    __slots__ = ("overall", "hourly")
+
+    def __init__(self):
+        self.overall = RunningStats()
+        self.hourly: List[RunningStats] = [RunningStats() for _ in range(24)]
+
+    def add(self, value: float, hour: int):
+        self.overall.add(value)
+        self.hourly[hour].add(value)
+
+
+class ParameterStats:
+    """
+    Bir istasyonun tek bir parametresi için genel, saatlik ve son değer istatistikleri.
+
+    Ölçümler günlük kovalarda tutulur; en yeni ölçümden window_days günden eski kovalar
+    silinir ve genel/saatlik sayaçlar kalan kovalardan yeniden birleştirilir. Böylece taban
+    çizgisi, yeniden başlatmadaki ısıtma gibi son window_days günü yansıtır.
+    """
+
+    __slots__ = ("window_days", "days", "latest_day", "overall", "hourly", "recent")
+
+    def __init__(self, recent_size: int, window_days: int = 7):
+        self.window_days = window_days
+        # Gün numarası (date.toordinal) -> o günün sayaçları
+        self.days: Dict[int, DailyStats] = {}
+        self.latest_day: Optional[int] = None
+        # Kovalardaki tüm ölçümlerin birleşik sayaçları
+        self.overall = RunningStats()
+        # Günün her saati için ayrı sayaç (0-23)
+        self.hourly: List[RunningStats] = [RunningStats() for _ in range(24)]
+        # Hareketli ortalama için son (zaman, değer) çiftleri, eskiden yeniye
+        self.recent: Deque[Tuple[datetime, float]] = deque(maxlen=recent_size)
+
+    def add(self, value: float, timestamp: datetime):
+        """Yeni bir ölçümü tüm sayaçlara ekler; pencereden eski ölçümler yok sayılır."""
+        day = timestamp.toordinal()
+        if self.latest_day is not None and day < self.latest_day - self.window_days:
+            return
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = DailyStats()
+        bucket.add(value, timestamp.hour)
+        self.overall.add(value)
+        self.hourly[timestamp.hour].add(value)
+        self.recent.append((timestamp, value))
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+            self.expire(timestamp)
+
+    def expire(self, now: datetime) -> bool:
+        """
+        now'dan window_days günden eski kovaları siler.
+
+        Args:
+            now (datetime): Referans zamanı (saat dilimsiz UTC)
+
+        Returns:
+            bool: Kova silindiyse True
+        """
+        cutoff = now.toordinal() - self.window_days
+        stale = [day for day in self.days if day < cutoff]
+        if not stale:
+            return False
+        for day in stale:
+            del self.days[day]
+        self.overall = RunningStats.merge(bucket.overall for bucket in self.days.values())
+        self.hourly = [
+            RunningStats.merge(bucket.hourly[hour] for bucket in self.days.values()) for hour in range(24)
+        ]
+        return True
+
+    def hourly_window(self, hour: int, margin: int = 1) -> RunningStats:
+        """
+        Verilen saatin +/- margin saat çevresindeki ölçümlerin birleşik istatistiğini döndürür.
+
+        Args:
+            hour (int): Günün saati (0-23)
+            margin (int, optional): Saat toleransı. Varsayılan 1.
+
+        Returns:
+            RunningStats: Birleşik saatlik istatistik
+        """
+        return RunningStats.merge(self.hourly[(hour + offset) % 24] for offset in range(-margin, margin + 1))
+
+    def recent_values(self, now: datetime, max_age: timedelta) -> List[float]:
+        """
+        now'dan en fazla max_age önceki son değerleri eskiden yeniye döndürür.
+
+        Args:
+            now (datetime): Referans zamanı
+            max_age (timedelta): En fazla yaş
+
+        Returns:
+            List[float]: Son değerler
+        """
+        oldest = now - max_age
+        return [value for ts, value in self.recent if oldest <= ts <= now]
+
+
+class RollingStatistics:
+    """
+    İstasyon ve parametre bazında bellek içi kayan istatistik motoru.
+
+    Tarihsel anomali tespiti her okumada veritabanına gitmek yerine bu motoru kullanır.
+    Motor uygulama başlangıcında MongoDB'deki son verilerle ısıtılır (warm_up), sonrasında
+    worker'ın işlediği her okuma ile artımlı olarak güncellenir. İstatistikler son
+    window_days günle sınırlıdır (bkz. ParameterStats).
+
+    Toplu tespit istatistikleri olay döngüsü dışındaki bir iş parçacığında okuyup günceller;
+    motora olay döngüsünden de erişen kod lock'u tutmalıdır.
+    """
+
+    def __init__(self, recent_size: int = 48, window_days: int = 7):
+        self.recent_size = recent_size
+        self.window_days = window_days
+        self.lock = threading.RLock()
+        self._stats: Dict[Tuple[Union[int, str], str], ParameterStats] = {}
+
+    def get(self, station: Union[int, str], parameter: str,
+            now: Optional[datetime] = None) -> Optional[ParameterStats]:
+        """
+        İstasyon/parametre çiftinin istatistiklerini döndürür.
+
+        Args:
+            station (Union[int, str]): İstasyon kimliği veya anahtarı
+            parameter (str): Kirlilik parametresi
+            now (Optional[datetime], optional): Verilirse bu zamana göre pencereden çıkan
+                günler önce silinir (ör. uzun süre veri göndermemiş istasyonlar için)
+
+        Returns:
+            Optional[ParameterStats]: İstatistikler, hiç veri yoksa None
+        """
+        stats = self._stats.get((station, parameter))
+        if stats is not None and now is not None:
+            stats.expire(to_naive_utc(now))
+        return stats
+
+    def add(self, station: Union[int, str], parameter: str, value: float, timestamp: datetime):
+        """
+        Tek bir ölçümü ekler.
+
+        Args:
+            station (Union[int, str]): İstasyon kimliği veya anahtarı
+            parameter (str): Kirlilik parametresi
+            value (float): Ölçülen değer
+            timestamp (datetime): Ölçüm zamanı
+        """
+        key = (station, parameter)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ParameterStats(self.recent_size, self.window_days)
+        stats.add(value, to_naive_utc(timestamp))
+
+    def add_reading(self, data: AirQualityData):
+        """
+        Bir okumadaki tüm parametreleri ekler.
+
+        Args:
+            data (AirQualityData): Hava kalitesi verisi
+        """
+        station = data.station_key()
+        for parameter in PARAMETERS:
+            value = getattr(data, parameter, None)
+            if value is not None:
+                self.add(station, parameter, value, data.timestamp)
+
+    def add_document(self, doc: dict):
+        """
+        MongoDB'den okunan ham bir dokümanı ekler.
+
+        Args:
+            doc (dict): Hava kalitesi dokümanı
+        """
+        timestamp = doc.get("timestamp")
+        if timestamp is None or "latitude" not in doc or "longitude" not in doc:
+            return
+        station = station_key_of(doc)
+        for parameter in PARAMETERS:
+            value = doc.get(parameter)
+            if value is not None:
+                self.add(station, parameter, value, timestamp)
+
+    async def warm_up(self, days: int = 7, batch_size: int = 5000,
+                      station_filter: Optional[Callable[[Union[int, str]], bool]] = None) -> int:
+        """
+        `days` gün önceki günün başından (UTC) bu yana gelen verileri zaman sırasıyla okuyarak
+        istatistikleri doldurur; böylece ısıtılan pencere ParameterStats.expire ile aynıdır.
+
+        Args:
+            days (int, optional): Geriye dönük gün sayısı. Varsayılan 7.
+            batch_size (int, optional): Cursor batch boyutu. Varsayılan 5000.
+            station_filter (Optional[Callable], optional): Verilirse sadece True döndüğü istasyonlar
+                (ör. worker sürecinin parçasındakiler) eklenir
+
+        Returns:
+            int: İşlenen doküman sayısı
+        """
+        with self.lock:
+            self._stats.clear()
+        # Pencere ParameterStats.expire ile aynı: bugünden `days` gün önceki günün başından itibaren
+        start_time = datetime.combine(date.fromordinal(datetime.utcnow().toordinal() - days), datetime.min.time())
+        projection = {"_id": 0, "latitude": 1, "longitude": 1, "station_id": 1, "timestamp": 1}
+        projection.update({parameter: 1 for parameter in PARAMETERS})
+
+        count = 0
+        cursor = db.stream_air_quality_data({"timestamp": {"$gte": start_time}}, projection, batch_size)
+        async for doc in cursor:
+            if station_filter is not None and not station_filter(station_key_of(doc)):
+                continue
+            with self.lock:
+                self.add_document(doc)
+            count += 1
+
+        logger.info(f"Kayan istatistikler ısıtıldı: {count} doküman, {len(self._stats)} istasyon/parametre")
+        return count
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.models.air_quality import station_key_of
+from app.services.database import db
+from app.services.rolling_stats import PARAMETERS, to_naive_utc
+
+logger = logging.getLogger(__name__)
+
+# Çözünürlük adı, kova uzunluğu (saniye) ve koleksiyon adı; inceden kabaya sıralı
+RESOLUTIONS: List[Tuple[str, int, str]] = [
+    ("1m", 60, "rollup_1m"),
+    ("1h", 3600, "rollup_1h"),
+    ("1d", 86400, "rollup_1d")
+]
+
+# TTL indeksiyle silinen özet koleksiyonlarının saklama süresi (saniye); bkz. app.services.indexes
+RETENTION_SECONDS: Dict[str, int] = {
+    "rollup_1m": settings.ROLLUP_1M_RETENTION_DAYS * 86400
+}
+
+# Bir sorgu penceresinin en az kaç kovaya bölünmesi gerektiği; kova sınırlarındaki
+# yuvarlama hatası pencerenin en fazla 1/24'ü kadar olur
+MIN_BUCKETS_PER_WINDOW = 24
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """
+    Zaman damgasını ait olduğu kovanın başlangıcına yuvarlar.
+
+    Args:
+        timestamp (datetime): Ölçüm zamanı
+        seconds (int): Kova uzunluğu (saniye)
+
+    Returns:
+        datetime: Kovanın başlangıç zamanı (saat dilimsiz UTC)
+    """
+    timestamp = to_naive_utc(timestamp)
+    epoch = int((timestamp - datetime(1970, 1, 1)).total_seconds())
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % seconds)
+
+
+def choose_resolution(start_time: datetime, end_time: datetime) -> Tuple[str, int, str]:
+    """
+    Pencereyi en az MIN_BUCKETS_PER_WINDOW kovayla karşılayan en kaba çözünürlüğü seçer.
+
+    Pencere başlangıcı bir koleksiyonun saklama süresinden eskiyse (silinmiş kovalar) daha kaba
+    bir koleksiyon kullanılır.
+
+    Args:
+        start_time (datetime): Pencere başlangıcı
+        end_time (datetime): Pencere bitişi
+
+    Returns:
+        Tuple[str, int, str]: (çözünürlük adı, kova uzunluğu, koleksiyon adı)
+    """
+    span = (end_time - start_time).total_seconds()
+    age = (datetime.utcnow() - to_naive_utc(start_time)).total_seconds()
+    retained = [
+        resolution for resolution in RESOLUTIONS
+        if not RETENTION_SECONDS.get(resolution[2]) or age <= RETENTION_SECONDS[resolution[2]]
+    ]
+    chosen = retained[0]
+    for resolution in retained:
+        if resolution[1] * MIN_BUCKETS_PER_WINDOW <= span:
+            chosen = resolution
+    return chosen
+
+
+class _Accumulator:
+    """Bir (istasyon, parametre, kova) için bellek içinde biriktirilen özet."""
+
+    __slots__ = ("count", "total", "total_sq", "minimum", "maximum", "last_at", "last", "doc")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.last_at: Optional[datetime] = None
+        self.last = 0.0
+        # Kovayı ilk oluşturan okuma; konum ve şehir bilgisi buradan alınır
+        self.doc = doc
+
+    def add(self, value: float, timestamp: datetime):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if self.last_at is None or timestamp >= self.last_at:
+            self.last_at = timestamp
+            self.last = value
+
+
+def build_rollup_updates(documents: Iterable[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+    """
+    Ham okumaları çözünürlük başına upsert işlemlerine dönüştürür.
+
+    Aynı (istasyon, parametre, kova) için gelen okumalar önce bellekte birleştirilir, böylece
+    her kova için batch başına tek bir $inc/$min/$max güncellemesi gönderilir.
+
+    Args:
+        documents (Iterable[Dict[str, Any]]): to_mongo_document() biçiminde okumalar
+
+    Returns:
+        Dict[str, List[UpdateOne]]: Koleksiyon adı -> upsert işlemleri
+    """
+    accumulators: Dict[Tuple[str, Any, str, datetime], _Accumulator] = {}
+
+    for doc in documents:
+        timestamp = doc.get("timestamp")
+        if timestamp is None or "latitude" not in doc or "longitude" not in doc:
+            continue
+        timestamp = to_naive_utc(timestamp)
+        station = station_key_of(doc)
+
+        for parameter in PARAMETERS:
+            value = doc.get(parameter)
+            if value is None:
+                continue
+            for _, seconds, collection in RESOLUTIONS:
+                key = (collection, station, parameter, bucket_start(timestamp, seconds))
+                accumulator = accumulators.get(key)
+                if accumulator is None:
+                    accumulator = accumulators[key] = _Accumulator(doc)
+                accumulator.add(value, timestamp)
+
+    updates: Dict[str, List[UpdateOne]] = {collection: [] for _, _, collection in RESOLUTIONS}
+    for (collection, station, parameter, bucket), acc in accumulators.items():
+        doc = acc.doc
+        updates[collection].append(UpdateOne(
+            {"station": station, "parameter": parameter, "bucket": bucket},
+            {
+                "$inc": {"count": acc.count, "sum": acc.total, "sum_sq": acc.total_sq},
+                "$min": {"min": acc.minimum},
+                "$max": {
+                    "max": acc.maximum,
+                    # Gömülü dokümanlar önce "at" alanıyla karşılaştırılır; en yeni okuma kalır
+                    "last": {"at": acc.last_at, "value": acc.last}
+                },
+                "$setOnInsert": {
+                    "latitude": doc["latitude"],
+                    "longitude": doc["longitude"],
+                    "location": doc.get("location") or {
+                        "type": "Point",
+                        "coordinates": [doc["longitude"], doc["latitude"]]
+                    },
+                    "city": doc.get("city"),
+                    "country": doc.get("country")
+                }
+            },
+            upsert=True
+        ))
+    return {collection: ops for collection, ops in updates.items() if ops}
+
+
+class Rollups:
+    """
+    İstasyon ve parametre bazında 1 dakikalık, saatlik ve günlük özet koleksiyonları.
+
+    Worker her batch'te bu koleksiyonları artımlı olarak günceller. Harita ve yoğunluk
+    sorguları ham okumalar yerine pencereye uygun en kaba özet koleksiyonunu okur.
+    """
+
+    async def apply(self, documents: List[Dict[str, Any]]) -> int:
+        """
+        Okumaları tüm çözünürlüklerdeki özet koleksiyonlarına işler.
+
+        Güncellemeler $inc ile yapıldığından aynı okuma iki kez verilirse iki kez sayılır;
+        yalnızca ham koleksiyona ilk kez yazılmış okumalar verilmelidir.
+
+        Bir koleksiyonun yazması başarısız olursa hata yukarı iletilir, böylece worker batch'i
+        onaylamaz. Yeniden teslimde bu okumalar kopya sayılıp özetlere tekrar eklenmediğinden,
+        hata logundaki aralık için özetler scripts/backfill_rollups.py ile yeniden oluşturulmalıdır.
+
+        Args:
+            documents (List[Dict[str, Any]]): to_mongo_document() biçiminde, yeni kaydedilmiş okumalar
+
+        Returns:
+            int: Gönderilen upsert işlemi sayısı
+
+        Raises:
+            PyMongoError: Özet koleksiyonlarından birine yazılamazsa
+        """
+        updates = build_rollup_updates(documents)
+        results = await asyncio.gather(
+            *(db.db[collection].bulk_write(ops, ordered=False) for collection, ops in updates.items()),
+            return_exceptions=True
+        )
+        errors = [(collection, result) for collection, result in zip(updates, results) if isinstance(result, Exception)]
+        if errors:
+            timestamps = [to_naive_utc(doc["timestamp"]) for doc in documents if doc.get("timestamp") is not None]
+            for collection, error in errors:
+                if isinstance(error, BulkWriteError):
+                    logger.error(
+                        f"{collection} güncellemesinde {len(error.details.get('writeErrors', []))} işlem başarısız"
+                    )
+                else:
+                    logger.error(f"{collection} güncellenirken hata: {str(error)}")
+            logger.error(
+                f"Özetler eksik kalabilir ({', '.join(collection for collection, _ in errors)}), "
+                f"okuma aralığı: {min(timestamps)} - {max(timestamps)}"
+            )
+            raise errors[0][1]
+        return sum(len(ops) for ops in updates.values())
+
+    async def map_data(self, parameter: str, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """
+        Harita için istasyon bazında özetleri döndürür (ham aggregation ile aynı alanlar).
+
+        Args:
+            parameter (str): Kirlilik parametresi
+            start_time (datetime): Pencere başlangıcı
+            end_time (datetime): Pencere bitişi
+
+        Returns:
+            List[Dict[str, Any]]: İstasyon bazında harita verisi
+        """
+        pipeline = self._match(parameter, start_time, end_time) + [
+            {
+                "$group": {
+                    "_id": "$station",
+                    "sum": {"$sum": "$sum"},
+                    "max_value": {"$max": "$max"},
+                    "latest": {"$max": "$last.at"},
+                    "count": {"$sum": "$count"},
+                    "location": {"$first": "$location"},
+                    "latitude": {"$first": "$latitude"},
+                    "longitude": {"$first": "$longitude"},
+                    "city": {"$first": "$city"},
+                    "country": {"$first": "$country"}
+                }
+            },
+            {
+                "$project": {
+                    "_id": "$location",
+                    "avg_value": {"$divide": ["$sum", "$count"]},
+                    "max_value": 1,
+                    "latest": 1,
+                    "count": 1,
+                    "latitude": 1,
+                    "longitude": 1,
+                    "city": 1,
+                    "country": 1
+                }
+            }
+        ]
+        return await self._aggregate(start_time, end_time, pipeline)
+
+    async def density(self, parameter: str, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """
+        Şehir bazında kirlilik yoğunluğunu döndürür (ham aggregation ile aynı alanlar).
+
+        Args:
+            parameter (str): Kirlilik parametresi
+            start_time (datetime): Pencere başlangıcı
+            end_time (datetime): Pencere bitişi
+
+        Returns:
+            List[Dict[str, Any]]: Ortalamaya göre azalan şehir bazında sonuçlar
+        """
+        pipeline = self._match(parameter, start_time, end_time) + [
+            {
+                "$group": {
+                    "_id": {
+                        "city": "$city",
+                        "country": "$country"
+                    },
+                    "sum": {"$sum": "$sum"},
+                    "max_value": {"$max": "$max"},
+                    "count": {"$sum": "$count"},
+                    "location": {"$first": "$location"}
+                }
+            },
+            {
+                "$project": {
+                    "avg_value": {"$divide": ["$sum", "$count"]},
+                    "max_value": 1,
+                    "count": 1,
+                    "location": 1
+                }
+            },
+            {
+                "$sort": {"avg_value": -1}
+            }
+        ]
+        return await self._aggregate(start_time, end_time, pipeline)
+
+    def _match(self, parameter: str, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """Pencereyle kesişen kovaları seçen $match aşaması."""
+        _, seconds, _ = choose_resolution(start_time, end_time)
+        return [{
+            "$match": {
+                "parameter": parameter,
+                "bucket": {"$gte": bucket_start(start_time, seconds), "$lte": to_naive_utc(end_time)},
+                "count": {"$gt": 0}
+            }
+        }]
+
+    async def _aggregate(self, start_time: datetime, end_time: datetime, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pipeline'ı pencereye uygun özet koleksiyonunda çalıştırır."""
+        resolution, _, collection = choose_resolution(start_time, end_time)
+        logger.debug(f"Özet koleksiyonundan okunuyor: {collection} ({resolution})")
+        cursor = db.db[collection].aggregate(pipeline)
+        return await cursor.to_list(length=None)
+
+
+# Singleton instance
+rollups = Rollups()
@@ -0,0 +1,114 @@
+import zlib
+from typing import Any, Dict, List, Union
+from app.config import settings
+from app.models.air_quality import station_key_of
+
+# Parçalanmamış (tek kuyruklu) düzende ve istasyon bilgisi olmayan yayıncılar için kuyruk
+RAW_QUEUE = "raw_data"
+RAW_ROUTING_KEY = "data.raw"
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach): anahtarı [0, buckets) aralığında bir parçaya eşler.
+
+    Parça sayısı N'den N+1'e çıktığında anahtarların sadece ~1/(N+1)'i yer değiştirir;
+    böylece istasyon durumu (kayan istatistikler) çoğunlukla aynı süreçte kalır.
+
+    Args:
+        key (int): 64 bitlik anahtar
+        buckets (int): Parça sayısı
+
+    Returns:
+        int: Parça numarası
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(station: Union[int, str], shards: int) -> int:
+    """
+    İstasyon anahtarının parçasını döndürür.
+
+    Args:
+        station (Union[int, str]): İstasyon kimliği ya da koordinat anahtarı
+        shards (int): Parça sayısı
+
+    Returns:
+        int: Parça numarası
+    """
+    if shards <= 1:
+        return 0
+    key = station if isinstance(station, int) else zlib.crc32(str(station).encode())
+    return jump_hash(key, shards)
+
+
+def shard_queue(shard: int) -> str:
+    """Parçanın kuyruk adı."""
+    return f"{RAW_QUEUE}.{shard}"
+
+
+def shard_routing_key(shard: int) -> str:
+    """Parçanın kuyruğuna bağlı routing key."""
+    return f"{RAW_ROUTING_KEY}.{shard}"
+
+
+def raw_routing_key(doc: Dict[str, Any], shards: int = None) -> str:
+    """
+    Ham okumanın yayınlanacağı routing key'i döndürür.
+
+    Args:
+        doc (Dict[str, Any]): Okuma (station_id ya da enlem/boylam içermeli)
+        shards (int, optional): Parça sayısı; verilmezse WORKER_SHARDS
+
+    Returns:
+        str: Parçalı düzende "data.raw.{parça}", aksi halde "data.raw"
+    """
+    shards = settings.WORKER_SHARDS if shards is None else shards
+    if shards <= 1:
+        return RAW_ROUTING_KEY
+    return shard_routing_key(shard_of(station_key_of(doc), shards))
+
+
+def group_by_routing_key(docs: List[Dict[str, Any]], shards: int = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Okumaları yayınlanacakları routing key'e göre gruplar; grup içi sıra korunur.
+
+    Args:
+        docs (List[Dict[str, Any]]): Okumalar
+        shards (int, optional): Parça sayısı; verilmezse WORKER_SHARDS
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Routing key -> okumalar
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        groups.setdefault(raw_routing_key(doc, shards), []).append(doc)
+    return groups
+
+
+def queues_for_shards(shards: List[int]) -> List[str]:
+    """
+    Parçaların tüketilecek kuyruklarını döndürür.
+
+    Parça sayısı 1 iken tek kuyruk raw_data'dır. Parçalı düzende istasyon bilgisi olmadan
+    "data.raw" ile yayınlanan mesajlar raw_data'da kalır; bu kuyruğu 0. parçanın sahibi tüketir.
+
+    Args:
+        shards (List[int]): Parça numaraları
+
+    Returns:
+        List[str]: Kuyruk adları
+    """
+    if settings.WORKER_SHARDS <= 1:
+        return [RAW_QUEUE] if 0 in shards else []
+    queues = [shard_queue(shard) for shard in shards]
+    if 0 in shards:
+        queues.append(RAW_QUEUE)
+    return queues
+
@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.models.air_quality import make_station_key
+from app.services.database import db, EARTH_RADIUS_KM
+
+logger = logging.getLogger(__name__)
+
+# Bellek içi ızgara hücresinin boyutu (derece, enlemde ~1.1 km); eşleme yarıçapı bundan küçük olmalıdır
+GRID_CELL_DEGREES = 0.01
+
+# Boylam ekseninde hücre sayısı (-180..180)
+LONGITUDE_CELLS = round(360 / GRID_CELL_DEGREES)
+
+# Bir derece enlemin uzunluğu (metre)
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_KM * 1000 / 180
+
+STATION_PROJECTION = {"_id": 1, "latitude": 1, "longitude": 1, "city": 1, "country": 1}
+
+
+def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """İki nokta arasındaki büyük çember mesafesi (metre)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * 1000 * math.asin(math.sqrt(a))
+
+
+class Station:
+    """locations koleksiyonundaki tek bir istasyon."""
+
+    __slots__ = ("station_id", "latitude", "longitude", "city", "country")
+
+    def __init__(self, station_id: int, latitude: float, longitude: float,
+                 city: Optional[str] = None, country: Optional[str] = None):
+        self.station_id = station_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.city = city
+        self.country = country
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Station":
+        return cls(doc["_id"], doc["latitude"], doc["longitude"], doc.get("city"), doc.get("country"))
+
+
+class StationRegistry:
+    """
+    Koordinatları tamsayı istasyon kimliklerine çeviren, locations koleksiyonunun önündeki bellek içi kayıt.
+
+    Bir okuma, snap_radius_m metre içindeki en yakın kayıtlı istasyona eşlenir; yakında istasyon
+    yoksa yeni bir istasyon oluşturulur. Eşleme çoğunlukla bellekteki ızgara üzerinden yapılır,
+    veritabanına yalnızca bilinmeyen bir konum geldiğinde gidilir. Birden fazla süreç aynı anda
+    aynı konumu kaydederse locations.key üzerindeki tekil indeks tek bir istasyon oluşmasını sağlar.
+    Yakın ama farklı anahtarlı iki konum aynı anda kaydedilirse, yeni istasyon yazıldıktan sonra
+    yarıçap içinde daha eski (küçük kimlikli) bir istasyon aranır; varsa yeni kayıt silinip o kullanılır.
+    """
+
+    def __init__(self, snap_radius_m: float = 100.0):
+        # Izgarada enlemde sadece komşu hücrelere bakıldığı için yarıçap hücre boyutuyla sınırlıdır
+        self.snap_radius_m = min(snap_radius_m, 500.0)
+        self._stations: Dict[int, Station] = {}
+        self._grid: Dict[Tuple[int, int], List[Station]] = {}
+        # Aynı konum için eşzamanlı oluşturma isteklerini tek bir işleme indirir
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / GRID_CELL_DEGREES), self._wrap(math.floor(longitude / GRID_CELL_DEGREES)))
+
+    @staticmethod
+    def _wrap(cell_lon: int) -> int:
+        """Boylam hücresini 180. meridyenin iki yanı aynı ızgarada buluşacak şekilde sarar."""
+        return (cell_lon + LONGITUDE_CELLS // 2) % LONGITUDE_CELLS - LONGITUDE_CELLS // 2
+
+    def _lon_ring(self, latitude: float) -> int:
+        """
+        Eşleme yarıçapını kapsamak için boylamda her iki yana bakılacak hücre sayısı.
+
+        Bir derece boylamın uzunluğu enlemin kosinüsüyle kısaldığından yüksek enlemlerde
+        yarıçap komşu hücrenin ötesine taşar.
+        """
+        cos_lat = math.cos(math.radians(min(abs(latitude) + GRID_CELL_DEGREES, 90.0)))
+        if cos_lat * LONGITUDE_CELLS * GRID_CELL_DEGREES * METERS_PER_DEGREE <= 2 * self.snap_radius_m:
+            return LONGITUDE_CELLS // 2
+        return max(1, math.ceil(self.snap_radius_m / (METERS_PER_DEGREE * cos_lat * GRID_CELL_DEGREES)))
+
+    def _remember(self, station: Station):
+        if station.station_id in self._stations:
+            return
+        self._stations[station.station_id] = station
+        self._grid.setdefault(self._cell(station.latitude, station.longitude), []).append(station)
+
+    async def load(self) -> int:
+        """
+        Kayıtlı tüm istasyonları belleğe yükler.
+
+        Returns:
+            int: Yüklenen istasyon sayısı
+        """
+        self._stations.clear()
+        self._grid.clear()
+        async for doc in db.db.locations.find({"key": {"$exists": True}}, STATION_PROJECTION):
+            self._remember(Station.from_document(doc))
+        logger.info(f"İstasyon kaydı yüklendi: {len(self._stations)} istasyon")
+        return len(self._stations)
+
+    def load_sync(self, database) -> int:
+        """
+        Kayıtlı tüm istasyonları senkron (pymongo) bir veritabanından belleğe yükler.
+
+        Betikler ve cron işleri içindir; uygulama load() kullanır.
+
+        Args:
+            database (pymongo.database.Database): Senkron veritabanı nesnesi
+
+        Returns:
+            int: Yüklenen istasyon sayısı
+        """
+        self._stations.clear()
+        self._grid.clear()
+        for doc in database.locations.find({"key": {"$exists": True}}, STATION_PROJECTION):
+            self._remember(Station.from_document(doc))
+        logger.info(f"İstasyon kaydı yüklendi: {len(self._stations)} istasyon")
+        return len(self._stations)
+
+    def get(self, station_id: int) -> Optional[Station]:
+        """
+        Kimliği verilen istasyonu döndürür.
+
+        Args:
+            station_id (int): İstasyon kimliği
+
+        Returns:
+            Optional[Station]: İstasyon, bilinmiyorsa None
+        """
+        return self._stations.get(station_id)
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[Station]:
+        """
+        Bellekteki istasyonlar arasında eşleme yarıçapı içindeki en yakını bulur.
+
+        Args:
+            latitude (float): Enlem
+            longitude (float): Boylam
+
+        Returns:
+            Optional[Station]: En yakın istasyon, yarıçap içinde yoksa None
+        """
+        cell_lat, cell_lon = self._cell(latitude, longitude)
+        ring = self._lon_ring(latitude)
+        cells_lon = {self._wrap(cell_lon + d_lon) for d_lon in range(-ring, ring + 1)}
+        best, best_distance = None, self.snap_radius_m
+        for d_lat in (-1, 0, 1):
+            for c_lon in cells_lon:
+                for station in self._grid.get((cell_lat + d_lat, c_lon), ()):
+                    distance = _haversine_m(latitude, longitude, station.latitude, station.longitude)
+                    if distance <= best_distance:
+                        best, best_distance = station, distance
+        return best
+
+    async def resolve(self, latitude: float, longitude: float,
+                      city: Optional[str] = None, country: Optional[str] = None) -> int:
+        """
+        Koordinatın ait olduğu istasyonun kimliğini döndürür, gerekirse istasyonu oluşturur.
+
+        Args:
+            latitude (float): Enlem
+            longitude (float): Boylam
+            city (Optional[str], optional): Yeni istasyon için şehir
+            country (Optional[str], optional): Yeni istasyon için ülke
+
+        Returns:
+            int: İstasyon kimliği
+        """
+        station = self.nearest(latitude, longitude)
+        if station is not None:
+            return station.station_id
+
+        key = make_station_key(latitude, longitude)
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            station = await self._lookup_or_create(key, latitude, longitude, city, country)
+            self._remember(station)
+            future.set_result(station.station_id)
+            return station.station_id
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def resolve_many(self, points: Sequence[Tuple[float, float, Optional[str], Optional[str]]],
+                           concurrency: int = 16) -> List[int]:
+        """
+        Birden fazla koordinatı istasyon kimliklerine çevirir.
+
+        Bellekte eşleşmeyen konumlar istasyon anahtarına göre tekilleştirilir ve en fazla
+        concurrency tanesi aynı anda çözülür; ardından tüm noktalar (artık çoğunlukla
+        bellekten) sırasıyla eşlenir.
+
+        Args:
+            points (Sequence[Tuple[float, float, Optional[str], Optional[str]]]): (enlem, boylam, şehir, ülke)
+            concurrency (int, optional): Aynı anda çözülecek en fazla bilinmeyen konum. Varsayılan 16.
+
+        Returns:
+            List[int]: Noktalarla aynı sırada istasyon kimlikleri
+        """
+        unknown: Dict[str, Tuple[float, float, Optional[str], Optional[str]]] = {}
+        for point in points:
+            if self.nearest(point[0], point[1]) is None:
+                unknown.setdefault(make_station_key(point[0], point[1]), point)
+
+        if unknown:
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            async def resolve_one(point):
+                async with semaphore:
+                    await self.resolve(*point)
+
+            await asyncio.gather(*(resolve_one(point) for point in unknown.values()))
+
+        return [await self.resolve(*point) for point in points]
+
+    def resolve_sync(self, database, latitude: float, longitude: float,
+                     city: Optional[str] = None, country: Optional[str] = None) -> int:
+        """
+        resolve() ile aynı eşlemeyi senkron (pymongo) bir veritabanı üzerinden yapar.
+
+        Args:
+            database (pymongo.database.Database): Senkron veritabanı nesnesi
+            latitude (float): Enlem
+            longitude (float): Boylam
+            city (Optional[str], optional): Yeni istasyon için şehir
+            country (Optional[str], optional): Yeni istasyon için ülke
+
+        Returns:
+            int: İstasyon kimliği
+        """
+        station = self.nearest(latitude, longitude)
+        if station is not None:
+            return station.station_id
+
+        key = make_station_key(latitude, longitude)
+        doc = database.locations.find_one(self._nearby_query(latitude, longitude))
+        if doc is not None:
+            station = Station.from_document(doc)
+        else:
+            counter = database.counters.find_one_and_update(
+                {"_id": "station_id"},
+                {"$inc": {"seq": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            station = Station(counter["seq"], latitude, longitude, city, country)
+            try:
+                database.locations.insert_one(self._station_document(station, key))
+            except DuplicateKeyError:
+                # Aynı hücre başka bir süreç tarafından az önce kaydedildi
+                station = Station.from_document(database.locations.find_one({"key": key}))
+            else:
+                earlier = database.locations.find_one(self._nearby_query(latitude, longitude, station.station_id))
+                if earlier is not None:
+                    database.locations.delete_one({"_id": station.station_id})
+                    station = self._yield_to(station, earlier)
+                else:
+                    logger.info(f"Yeni istasyon kaydedildi: {station.station_id} ({key}, {city})")
+        self._remember(station)
+        return station.station_id
+
+    def _nearby_query(self, latitude: float, longitude: float, before: Optional[int] = None) -> dict:
+        """
+        Eşleme yarıçapı içindeki kayıtlı istasyonları bulan sorgu.
+
+        before verilirse sadece bu kimlikten önce oluşturulmuş istasyonlar aranır.
+        """
+        query = {
+            "key": {"$exists": True},
+            "location": {
+                "$nearSphere": {
+                    "$geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                    "$maxDistance": self.snap_radius_m
+                }
+            }
+        }
+        if before is not None:
+            query["_id"] = {"$lt": before}
+        return query
+
+    @staticmethod
+    def _station_document(station: Station, key: str) -> dict:
+        return {
+            "_id": station.station_id,
+            "key": key,
+            "latitude": station.latitude,
+            "longitude": station.longitude,
+            "location": {"type": "Point", "coordinates": [station.longitude, station.latitude]},
+            "city": station.city,
+            "country": station.country,
+            "created_at": datetime.utcnow()
+        }
+
+    async def _lookup_or_create(self, key: str, latitude: float, longitude: float,
+                                city: Optional[str], country: Optional[str]) -> Station:
+        """Başka bir sürecin kaydettiği yakın istasyonu arar, yoksa yeni istasyon oluşturur."""
+        doc = await db.db.locations.find_one(self._nearby_query(latitude, longitude))
+        if doc is not None:
+            return Station.from_document(doc)
+
+        counter = await db.db.counters.find_one_and_update(
+            {"_id": "station_id"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        station = Station(counter["seq"], latitude, longitude, city, country)
+        try:
+            await db.db.locations.insert_one(self._station_document(station, key))
+        except DuplicateKeyError:
+            # Aynı hücre başka bir süreç tarafından az önce kaydedildi
+            return Station.from_document(await db.db.locations.find_one({"key": key}))
+
+        # Yakındaki başka bir hücre aynı anda kaydedildiyse en eski istasyon kalır
+        earlier = await db.db.locations.find_one(self._nearby_query(latitude, longitude, station.station_id))
+        if earlier is not None:
+            await db.db.locations.delete_one({"_id": station.station_id})
+            return self._yield_to(station, earlier)
+
+        logger.info(f"Yeni istasyon kaydedildi: {station.station_id} ({key}, {city})")
+        return station
+
+    @staticmethod
+    def _yield_to(station: Station, earlier: dict) -> Station:
+        """Aynı anda oluşturulan yeni istasyonun yerine yarıçap içindeki eski istasyonu döndürür."""
+        logger.info(
+            f"İstasyon {station.station_id}, aynı anda kaydedilen yakın istasyon {earlier['_id']} lehine silindi"
+        )
+        return Station.from_document(earlier)
+
+
+# Singleton instance
+station_registry = StationRegistry(snap_radius_m=settings.STATION_SNAP_RADIUS_M)
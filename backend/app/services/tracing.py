@@ -0,0 +1,209 @@
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Mesaj başlıklarındaki iz alanları
+TRACE_ID_HEADER = "trace_id"
+TRACE_HOPS_HEADER = "trace_hops"
+
+# Aşamaların açıklamaları; her aşama bir önceki noktadan bu noktaya kadar geçen süredir
+STAGES = {
+    "api": "API'nin okumayı yayınlaması (başlangıç noktası)",
+    "raw_queue": "raw_data kuyruğunda bekleme (yayın -> worker'a teslim)",
+    "buffer": "Worker şerit tamponunda bekleme (teslim -> mikro-batch başlangıcı)",
+    "mongo": "Okumaların MongoDB'ye yazılması",
+    "rollups": "Özet koleksiyonlarının güncellenmesi",
+    "detection": "Anomali tespiti",
+    "anomaly_store": "Anomalilerin MongoDB'ye yazılması",
+    "notify": "Bildirimlerin ve işlenmiş verinin yayınlanması",
+    "ack": "Mesajın onaylanması",
+    "anomaly_queue": "anomaly_notifications kuyruğu (bildirim yayını -> API'de işlenme)",
+    "fanout": "Bildirimin WebSocket bağlantılarının kuyruklarına eklenmesi",
+}
+
+
+class TraceContext:
+    """
+    Bir mesajın iz kimliği ve geçtiği noktaların zaman damgaları.
+
+    Zaman damgaları duvar saatidir (epoch saniye), çünkü noktalar farklı süreçlerde olabilir;
+    farklı sunuculardaki süreçler arasında saat kayması aşama sürelerine yansır.
+    """
+
+    __slots__ = ("trace_id", "hops")
+
+    def __init__(self, trace_id: str, hops: Optional[List[Tuple[str, float]]] = None):
+        self.trace_id = trace_id
+        self.hops: List[Tuple[str, float]] = hops if hops is not None else []
+
+    def mark(self, hop: str, at: Optional[float] = None):
+        """
+        Bir noktayı zaman damgasıyla ekler.
+
+        Args:
+            hop (str): Nokta adı (STAGES'teki anahtarlar)
+            at (Optional[float], optional): Zaman damgası; verilmezse şimdiki zaman
+        """
+        self.hops.append((hop, at if at is not None else time.time()))
+
+    def copy(self) -> "TraceContext":
+        """Aynı iz kimliğiyle bağımsız bir kopya döndürür (dallanan bildirimler için)."""
+        return TraceContext(self.trace_id, list(self.hops))
+
+    def headers(self) -> Dict[str, str]:
+        """
+        Mesaj başlıklarına eklenecek iz alanlarını döndürür.
+
+        Returns:
+            Dict[str, str]: trace_id ve "ad=zaman;..." biçiminde trace_hops
+        """
+        return {
+            TRACE_ID_HEADER: self.trace_id,
+            TRACE_HOPS_HEADER: ";".join(f"{hop}={at:.6f}" for hop, at in self.hops),
+        }
+
+    @classmethod
+    def from_headers(cls, headers: Optional[Mapping[str, Any]]) -> Optional["TraceContext"]:
+        """
+        Mesaj başlıklarından iz bağlamını okur.
+
+        Args:
+            headers (Optional[Mapping[str, Any]]): AMQP mesaj başlıkları
+
+        Returns:
+            Optional[TraceContext]: İz bağlamı, mesaj izlenmiyorsa None
+        """
+        if not headers or TRACE_ID_HEADER not in headers:
+            return None
+        trace_id = headers[TRACE_ID_HEADER]
+        raw_hops = headers.get(TRACE_HOPS_HEADER) or ""
+        if isinstance(trace_id, bytes):
+            trace_id = trace_id.decode()
+        if isinstance(raw_hops, bytes):
+            raw_hops = raw_hops.decode()
+
+        hops = []
+        for part in raw_hops.split(";"):
+            hop, _, at = part.partition("=")
+            try:
+                hops.append((hop, float(at)))
+            except ValueError:
+                continue
+        return cls(str(trace_id), hops)
+
+    def stages(self) -> Dict[str, float]:
+        """
+        Her noktanın bir önceki noktadan itibaren süresini döndürür (milisaniye).
+
+        Aynı nokta birden fazla kez geçtiyse (ör. mesajın okumaları birden çok batch'e
+        dağıldıysa) süreler toplanır.
+        """
+        stages: Dict[str, float] = {}
+        for (_, previous), (hop, at) in zip(self.hops, self.hops[1:]):
+            stages[hop] = stages.get(hop, 0.0) + (at - previous) * 1000
+        return stages
+
+
+class Tracer:
+    """
+    İz başlatır ve tamamlanan izleri sınırlı bir halka tamponda tutar.
+
+    API, sample_rate olasılığıyla yayınlanan mesajlara yeni bir iz ekler. İz mesaj başlıklarında
+    taşınır: worker okumaları ve anomalileri, API'deki anomali dinleyicisi WebSocket yayınını
+    işaretler. Okuma izleri worker'da onay anında, anomali izleri API'de WebSocket yayınından
+    sonra kaydedilir; ayrı worker süreçlerindeki okuma izleri o süreçlerin tamponunda kalır,
+    anomali izleri ise tüm noktalarıyla API'ye ulaşır.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, buffer_size: int = 1000):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=max(1, buffer_size))
+
+    def start(self, hop: str = "api") -> Optional[TraceContext]:
+        """
+        Örnekleme oranına göre yeni bir iz başlatır.
+
+        Args:
+            hop (str, optional): Başlangıç noktası. Varsayılan "api".
+
+        Returns:
+            Optional[TraceContext]: Yeni iz, örneklenmediyse None
+        """
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        trace = TraceContext(os.urandom(8).hex())
+        trace.mark(hop)
+        return trace
+
+    def start_headers(self, hop: str = "api") -> Optional[Dict[str, str]]:
+        """start() ile başlatılan izin mesaj başlıklarını döndürür, örneklenmediyse None."""
+        trace = self.start(hop)
+        return trace.headers() if trace is not None else None
+
+    def record(self, trace: TraceContext, kind: str, **attributes):
+        """
+        Tamamlanan bir izi halka tampona ekler.
+
+        Args:
+            trace (TraceContext): Tamamlanan iz
+            kind (str): İz türü ("reading" ya da "anomaly")
+            **attributes: Ek bilgiler (parametre, okuma sayısı vb.)
+        """
+        if len(trace.hops) < 2:
+            return
+        self._records.append({
+            "trace_id": trace.trace_id,
+            "kind": kind,
+            "hops": list(trace.hops),
+            "attributes": attributes,
+        })
+
+    def slowest(self, limit: int = 20, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Tampondaki en yavaş izleri aşama dökümüyle döndürür.
+
+        Args:
+            limit (int, optional): En fazla iz sayısı. Varsayılan 20.
+            kind (Optional[str], optional): Sadece bu türdeki izler
+
+        Returns:
+            List[Dict[str, Any]]: Toplam süreye göre azalan sırada izler
+        """
+        records = [record for record in self._records if kind is None or record["kind"] == kind]
+        records.sort(key=lambda record: record["hops"][-1][1] - record["hops"][0][1], reverse=True)
+
+        result = []
+        for record in records[:max(0, limit)]:
+            stages = TraceContext(record["trace_id"], record["hops"]).stages()
+            result.append({
+                "trace_id": record["trace_id"],
+                "kind": record["kind"],
+                "started_at": datetime.utcfromtimestamp(record["hops"][0][1]).isoformat(),
+                "total_ms": round((record["hops"][-1][1] - record["hops"][0][1]) * 1000, 3),
+                "slowest_stage": max(stages, key=stages.get),
+                "stages_ms": {stage: round(duration, 3) for stage, duration in stages.items()},
+                **record["attributes"],
+            })
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Örnekleme oranını ve tampon doluluğunu döndürür."""
+        return {
+            "sample_rate": self.sample_rate,
+            "buffered": len(self._records),
+            "buffer_size": self._records.maxlen,
+        }
+
+
+# Singleton instance
+tracer = Tracer(
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    buffer_size=settings.TRACING_BUFFER_SIZE
+)
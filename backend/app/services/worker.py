@@ -1,53 +1,137 @@
 import logging
-import json
 import asyncio
+import time
+import zlib
+from collections import Counter
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+import numpy as np
+from pymongo.errors import BulkWriteError
+from app.config import settings
 from app.services.database import db
-from app.services.rabbitmq import rabbitmq, CustomJSONEncoder
-from app.services.anomaly_detection import anomaly_detector
-from app.models.air_quality import AirQualityData, AirQualityAnomaly
+from app.services.rabbitmq import rabbitmq
+from app.services.codec import decode_message
+from app.services.anomaly_detection import anomaly_detector, readings_to_columns
+from app.services.cache import aggregation_cache
+from app.services.rollups import rollups
+from app.services.stations import station_registry
+from app.services.sharding import queues_for_shards
+from app.services.metrics import ANOMALIES_TOTAL, WORKER_CONSUME_TO_ACK_SECONDS
+from app.services.tracing import TraceContext, tracer
+from app.services.rolling_stats import PARAMETERS
+from app.models.air_quality import AirQualityData, AirQualityAnomaly, station_key_of
 
 logger = logging.getLogger(__name__)
 
+# Mesaj başına gözlemde etiket çözümlemesi yapılmasın
+_ACK_SECONDS = WORKER_CONSUME_TO_ACK_SECONDS.labels(outcome="ack")
+_NACK_SECONDS = WORKER_CONSUME_TO_ACK_SECONDS.labels(outcome="nack")
+
+# MongoDB tekil anahtar ihlali hata kodu
+DUPLICATE_KEY_ERROR = 11000
+
+def _branch_headers(trace: Optional[TraceContext], hops: List[Tuple[str, float]]) -> Optional[Dict[str, str]]:
+    """Bildirimin taşıyacağı iz başlıkları: okumanın izi ve batch'in o ana kadarki noktaları."""
+    if trace is None:
+        return None
+    branch = trace.copy()
+    branch.hops.extend(hops)
+    return branch.headers()
+
+class _PendingMessage:
+    """
+    Bir AMQP mesajını ve henüz veritabanına yazılmamış okuma sayısını izler.
+    Mesaj, taşıdığı tüm okumalar (hangi şeritte olurlarsa olsunlar) yazıldıktan
+    sonra onaylanır (ack).
+    """
+
+    __slots__ = ("message", "remaining", "failed", "received_at", "trace")
+
+    def __init__(self, message, remaining: int):
+        self.message = message
+        self.remaining = remaining
+        self.failed = False
+        self.received_at = time.perf_counter()
+        # API'nin eklediği iz bağlamı (örneklenmeyen mesajlarda None)
+        self.trace = TraceContext.from_headers(message.headers)
+        if self.trace is not None:
+            self.trace.mark("raw_queue")
+
+
+class _Lane:
+    """
+    Worker içindeki tek bir işleme şeridi: kendi yazma tamponu ve flush görevi vardır.
+    Aynı istasyonun okumaları hep aynı şeride düşer, böylece istasyon içi sıra korunur.
+    """
+
+    __slots__ = ("index", "buffer", "ready", "task")
+
+    def __init__(self, index: int):
+        self.index = index
+        # Yazılmayı bekleyen (okuma, mesaj) çiftleri
+        self.buffer: List[Tuple[Dict[str, Any], _PendingMessage]] = []
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
 class Worker:
     """
     Backend işleri yürüten worker servisi.
-    Mesaj kuyruğundan verileri alır, işler ve veritabanına kaydeder.
+    Mesaj kuyruğundan verileri alır, mikro-batch'ler halinde işler ve veritabanına kaydeder.
+    
+    Okumalar istasyon anahtarına göre WORKER_CONCURRENCY adet şeride dağıtılır. Şeritler
+    birbirinden bağımsız ve eşzamanlı çalışır; bir şerit içinde okumalar geliş sırasıyla işlenir.
     """
     
     def __init__(self):
         self.running = False
         self.task = None
+        self.batch_size = max(1, settings.WORKER_BATCH_SIZE)
+        self.max_latency = settings.WORKER_BATCH_MAX_LATENCY
+        self.concurrency = max(1, settings.WORKER_CONCURRENCY)
+        self.queues: List[str] = []
+        self._lanes: List[_Lane] = []
     
-    async def start(self):
+    async def start(self, queues: Optional[List[str]] = None):
         """
         Worker servisini başlatır.
+        
+        Args:
+            queues (Optional[List[str]], optional): Tüketilecek kuyruklar; verilmezse tüm raw_data parçaları
         """
         if self.running:
             logger.warning("Worker servisi zaten çalışıyor")
             return
         
         self.running = True
+        self.queues = queues if queues is not None else queues_for_shards(list(range(max(1, settings.WORKER_SHARDS))))
+        self._lanes = [_Lane(index) for index in range(self.concurrency)]
+        for lane in self._lanes:
+            lane.task = asyncio.create_task(self._flush_loop(lane))
         self.task = asyncio.create_task(self._run())
-        logger.info("Worker servisi başlatıldı")
+        logger.info(f"Worker servisi başlatıldı ({self.concurrency} şerit, kuyruklar: {', '.join(self.queues)})")
     
     async def stop(self):
         """
-        Worker servisini durdurur.
+        Worker servisini durdurur. Tamponda bekleyen okumalar önce yazılır.
         """
         if not self.running:
             logger.warning("Worker servisi zaten durdurulmuş")
             return
         
         self.running = False
-        if self.task:
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
-            self.task = None
+        for task in [self.task] + [lane.task for lane in self._lanes]:
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.task = None
+
+        for lane in self._lanes:
+            while lane.buffer:
+                await self._flush(lane)
         logger.info("Worker servisi durduruldu")
     
     async def _run(self):
@@ -56,71 +140,336 @@ class Worker:
         """
         logger.info("Worker döngüsü başladı")
         
-        # Mesaj işleme callback fonksiyonu
-        async def process_message(message):
-            async with message.process():
-                await self._process_data(json.loads(message.body))
-        
-        # RabbitMQ tüketici başlat
-        await rabbitmq.consume("raw_data", process_message)
+        # Her kuyruk için RabbitMQ tüketici başlat
+        for queue_name in self.queues:
+            await rabbitmq.consume(
+                queue_name,
+                self._on_message,
+                prefetch_count=settings.WORKER_PREFETCH_COUNT,
+                channels=settings.WORKER_CHANNELS
+            )
         
         # Servis durdurulana kadar bekle
         while self.running:
             await asyncio.sleep(1)
-    
-    async def _process_data(self, data: Dict[str, Any]):
+
+    async def _resolve_station(self, item: Any):
         """
-        Ham veriyi işler, anomali kontrolü yapar ve veritabanına kaydeder.
-        
+        İstasyonu çözülmemiş (API dışından gelen) okumayı istasyon kaydına eşler.
+
+        Şerit istasyon kimliğinden seçildiği için eşleme şerit seçiminden önce yapılır; aksi halde
+        aynı istasyonun farklı koordinatlı okumaları farklı şeritlere düşüp sırası bozulabilir.
+        Geçersiz okumalara dokunulmaz, _process_batch içinde atlanırlar.
+
         Args:
-            data (Dict[str, Any]): İşlenecek ham veri
+            item (Any): Ham okuma
         """
+        if not isinstance(item, dict) or item.get("station_id") is not None:
+            return
         try:
-            # Veriyi modele dönüştür
-            air_quality_data = AirQualityData(**data)
-            
-            # Veriyi veritabanına kaydet
-            mongo_doc = air_quality_data.to_mongo_document()
-            await db.insert_air_quality_data(mongo_doc)
-            
-            # Anomali kontrolü yap
-            threshold_anomalies = await anomaly_detector.check_threshold_anomaly(air_quality_data)
-            historical_anomalies = await anomaly_detector.check_historical_anomaly(air_quality_data)
-            
-            # Tüm anomalileri birleştir
-            all_anomalies = []
-            if threshold_anomalies:
-                all_anomalies.extend(threshold_anomalies)
-            if historical_anomalies:
-                all_anomalies.extend(historical_anomalies)
-            
-            # Anomalileri veritabanına kaydet ve bildirim yap
-            if all_anomalies:
-                for anomaly in all_anomalies:
-                    # Anomaliyi veritabanına kaydet
-                    anomaly_doc = anomaly.to_mongo_document()
-                    await db.insert_anomaly(anomaly_doc)
-                    
-                    # Anomali bildirimi gönder
-                    await self._send_anomaly_notification(anomaly)
-            
-            # İşlenmiş veriyi diğer servislere ilet
-            await self._send_processed_data(air_quality_data, all_anomalies)
-            
-            logger.info(
-                f"Veri işlendi: {air_quality_data.latitude}, {air_quality_data.longitude}, "
-                f"anomali sayısı: {len(all_anomalies) if all_anomalies else 0}"
+            latitude, longitude = float(item["latitude"]), float(item["longitude"])
+        except (KeyError, TypeError, ValueError):
+            return
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return
+        item["station_id"] = await station_registry.resolve(latitude, longitude, item.get("city"), item.get("country"))
+
+    def _lane_for(self, item: Dict[str, Any]) -> _Lane:
+        """
+        Okumanın istasyonuna göre şeridini seçer.
+
+        Args:
+            item (Dict[str, Any]): Ham okuma
+
+        Returns:
+            _Lane: Okumanın işleneceği şerit
+        """
+        try:
+            station = station_key_of(item)
+        except (KeyError, TypeError, ValueError):
+            # Geçersiz okumalar _process_batch içinde atlanır, şeridi önemsiz
+            return self._lanes[0]
+        return self._lanes[zlib.crc32(str(station).encode()) % len(self._lanes)]
+
+    async def _on_message(self, message):
+        """
+        Gelen mesajı çözümler, okumaları istasyonlarına eşler ve istasyonun şeridinin yazma
+        tamponuna ekler. Mesaj burada onaylanmaz; onay, okumalar yazıldıktan sonra _flush içinde yapılır.
+
+        Args:
+            message: aio_pika mesajı
+        """
+        try:
+            payload = decode_message(message)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"Mesaj çözümlenemedi, reddediliyor: {str(e)}")
+            await message.reject(requeue=False)
+            return
+
+        # Toplu giriş (/api/data/batch) mesajları bir okuma dizisi taşır
+        items = payload if isinstance(payload, list) else [payload]
+        if not items:
+            await message.ack()
+            return
+
+        try:
+            for item in items:
+                await self._resolve_station(item)
+        except Exception as e:
+            logger.error(f"İstasyon eşlenemedi, mesaj yeniden kuyruğa alınacak: {str(e)}")
+            await message.nack(requeue=True)
+            return
+
+        pending = _PendingMessage(message, len(items))
+        for item in items:
+            lane = self._lane_for(item)
+            lane.buffer.append((item, pending))
+            if len(lane.buffer) >= self.batch_size:
+                lane.ready.set()
+
+    async def _flush_loop(self, lane: _Lane):
+        """
+        Şeridin tamponu dolduğunda ya da en fazla max_latency saniyede bir tamponu yazar.
+
+        Args:
+            lane (_Lane): Yönetilen şerit
+        """
+        while self.running:
+            try:
+                await asyncio.wait_for(lane.ready.wait(), timeout=self.max_latency)
+            except asyncio.TimeoutError:
+                pass
+            lane.ready.clear()
+
+            if lane.buffer:
+                try:
+                    await self._flush(lane)
+                except Exception as e:
+                    logger.error(f"Mikro-batch yazılırken hata (şerit {lane.index}): {str(e)}")
+
+    async def _flush(self, lane: _Lane):
+        """
+        Şeridin tamponundan en fazla batch_size okuma alır, işler ve tamamlanan mesajları onaylar.
+
+        Args:
+            lane (_Lane): Yazılacak şerit
+        """
+        batch = lane.buffer[:self.batch_size]
+        del lane.buffer[:self.batch_size]
+        if len(lane.buffer) >= self.batch_size:
+            lane.ready.set()
+
+        hops: List[Tuple[str, float]] = []
+        try:
+            hops = await self._process_batch(
+                [item for item, _ in batch], [pending.trace for _, pending in batch],
+                redelivered=any(pending.message.redelivered for _, pending in batch)
             )
-            
         except Exception as e:
-            logger.error(f"Veri işlenirken hata: {str(e)}")
+            logger.error(f"Batch işlenemedi, mesajlar yeniden kuyruğa alınacak: {str(e)}")
+            for _, pending in batch:
+                pending.failed = True
+
+        for _, pending in batch:
+            pending.remaining -= 1
+            if pending.remaining == 0:
+                if pending.failed:
+                    await pending.message.nack(requeue=True)
+                    _NACK_SECONDS.observe(time.perf_counter() - pending.received_at)
+                else:
+                    await pending.message.ack()
+                    _ACK_SECONDS.observe(time.perf_counter() - pending.received_at)
+                    if pending.trace is not None:
+                        # Okumaları birden fazla batch'e dağılan mesajda, onayı tetikleyen batch'in noktaları kaydedilir
+                        pending.trace.hops.extend(hops)
+                        pending.trace.mark("ack")
+                        tracer.record(pending.trace, "reading", batch_readings=len(batch))
+
+    async def _insert_readings(self, documents: List[Dict[str, Any]],
+                               redelivered: bool = False) -> Tuple[List[bool], int]:
+        """
+        Okumaları tek bir toplu yazma ile kaydeder ve hangilerinin bu yazmada kaydedildiğini döndürür.
+
+        Girişte atanan kalıcı _id sayesinde yeniden teslim edilen bir okuma tekil anahtar hatasına
+        düşer ve kopya sayılır. Zaman serisi koleksiyonunda _id tekil olmadığından, yeniden teslim
+        edilmiş mesaj içeren batch'lerde okumalar yazılmadan önce veritabanında aranır.
+
+        Args:
+            documents (List[Dict[str, Any]]): to_mongo_document() biçiminde okumalar
+            redelivered (bool, optional): Batch'te yeniden teslim edilmiş mesaj var mı
+
+        Returns:
+            Tuple[List[bool], int]: Her okuma için bu yazmada kaydedildi mi, ve tekil anahtar
+                dışındaki bir hatayla yazılamayan okuma sayısı
+        """
+        inserted = [True] * len(documents)
+        ids = [doc["_id"] for doc in documents if "_id" in doc]
+        if redelivered and db.timeseries and ids:
+            timestamps = [doc["timestamp"] for doc in documents]
+            cursor = db.db.air_quality_data.find(
+                {"_id": {"$in": ids}, "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)}},
+                {"_id": 1}
+            )
+            existing = {doc["_id"] async for doc in cursor}
+            inserted = [doc.get("_id") not in existing for doc in documents]
+
+        positions = [index for index, keep in enumerate(inserted) if keep]
+        failed = 0
+        try:
+            await db.insert_air_quality_data_many([documents[index] for index in positions])
+        except BulkWriteError as e:
+            # Sırasız yazmada diğer dokümanlar yazılmıştır
+            errors = e.details.get("writeErrors", [])
+            for error in errors:
+                inserted[positions[error["index"]]] = False
+            failed = sum(1 for error in errors if error.get("code") != DUPLICATE_KEY_ERROR)
+            if failed:
+                logger.error(f"Toplu yazmada {failed} doküman yazılamadı")
+
+        duplicates = inserted.count(False) - failed
+        if duplicates:
+            logger.info(f"{duplicates} okuma daha önce kaydedilmiş, anomali kontrolü yeniden yapılacak")
+        return inserted, failed
+
+    async def _process_batch(self, items: List[Dict[str, Any]],
+                             traces: Optional[List[Optional[TraceContext]]] = None,
+                             redelivered: bool = False) -> List[Tuple[str, float]]:
+        """
+        Bir grup ham veriyi işler: tek bir toplu yazma ile kaydeder, anomali
+        kontrolü yapar ve anomalileri yine tek bir toplu yazma ile kaydeder.
+
+        Veritabanı yazımı başarısız olursa hata yukarı iletilir, böylece mesajlar
+        onaylanmadan kuyruğa geri döner (en az bir kez işleme). Ham yazma ile onay arasında
+        worker durursa yeniden teslim edilen okumalar kopya olarak tanınır: özetlere tekrar
+        girmezler (kaydedildikleri yazmada eklenmişlerdir), ama anomali kontrolü, anomali
+        kaydı ve bildirimler onlar için yeniden yapılır. Anomali kaydı okuma kimliğiyle
+        değiştirildiği için tekrarlanabilir; bildirimler ise bu durumda ikinci kez gönderilebilir.
+        Kopya okumalar kayan istatistiklere tekrar eklenmez.
+
+        Args:
+            items (List[Dict[str, Any]]): İşlenecek ham veriler
+            traces (Optional[List[Optional[TraceContext]]], optional): Okumaların mesajlarının iz bağlamları
+            redelivered (bool, optional): Batch'te yeniden teslim edilmiş mesaj var mı
+
+        Returns:
+            List[Tuple[str, float]]: Batch'in iz noktaları (aşama, zaman damgası)
+        """
+        hops: List[Tuple[str, float]] = [("buffer", time.time())]
+        readings: List[AirQualityData] = []
+        reading_traces: List[Optional[TraceContext]] = []
+        for item, trace in zip(items, traces or [None] * len(items)):
+            try:
+                readings.append(AirQualityData(**item))
+                reading_traces.append(trace)
+            except Exception as e:
+                # Geçersiz okuma yeniden denenince de geçersiz olacağı için atlanır
+                logger.error(f"Geçersiz veri atlandı: {str(e)}")
+
+        if not readings:
+            return hops
+        
+        # Okumaları veritabanına kaydet
+        documents = [r.to_mongo_document() for r in readings]
+        inserted, failed = await self._insert_readings(documents, redelivered)
+        hops.append(("mongo", time.time()))
+
+        # Dakikalık/saatlik/günlük özet koleksiyonlarını güncelle; $inc işlemleri tekrarlanamaz,
+        # bu yüzden yalnızca bu yazmada gerçekten kaydedilen okumalar özetlere eklenir. Yazma
+        # başarısız olursa hata iletilir ve batch onaylanmaz (bkz. Rollups.apply)
+        await rollups.apply([d for d, keep in zip(documents, inserted) if keep])
+        hops.append(("rollups", time.time()))
+
+        # Yeni veri yazılan parametrelerin harita/yoğunluk önbelleğini eskit; batch aşağıda
+        # reddedilse de bu yazmada kaydedilen okumalar artık sorgulara yansır
+        await self._invalidate_cache([
+            parameter for parameter in PARAMETERS
+            if any(getattr(reading, parameter) is not None
+                   for reading, keep in zip(readings, inserted) if keep)
+        ])
+
+        # Yazılamayan okumalar kaybolmasın: batch yeniden kuyruğa alınır, bu yazmada
+        # kaydedilenler yeniden teslimde kopya olarak tanınır
+        if failed:
+            raise RuntimeError(f"{failed} okuma veritabanına yazılamadı")
+
+        # Anomali kontrolünü tüm batch için vektörel olarak yap; hesap DETECTION_EXECUTOR havuzunda
+        # çalışır, modeller sadece anomaliler için üretilir. Sadece yeni kaydedilen okumalar
+        # istatistiklere eklenir.
+        try:
+            detection = await anomaly_detector.detect_batch_async(
+                readings_to_columns(readings), update=np.array(inserted, dtype=bool)
+            )
+            anomalies_by_reading: List[List[AirQualityAnomaly]] = detection.to_anomalies(readings)
+        except Exception as e:
+            logger.error(f"Anomali kontrolü yapılırken hata: {str(e)}")
+            anomalies_by_reading = [[] for _ in readings]
+        hops.append(("detection", time.time()))
+
+        # Anomalileri tek seferde veritabanına kaydet; reading_id yeniden taramaların aynı kaydı güncellemesini sağlar
+        all_anomalies = [anomaly for anomalies in anomalies_by_reading for anomaly in anomalies]
+        # Sayaçlar batch başına (parametre, şiddet) çifti için bir kez artırılır
+        for (parameter, severity), count in Counter((a.parameter, a.severity) for a in all_anomalies).items():
+            ANOMALIES_TOTAL.labels(parameter=parameter, severity=severity).inc(count)
+        new_docs: List[Dict[str, Any]] = []
+        replayed_docs: List[Dict[str, Any]] = []
+        for document, anomalies, keep in zip(documents, anomalies_by_reading, inserted):
+            target = new_docs if keep else replayed_docs
+            target.extend(dict(anomaly.to_mongo_document(), reading_id=document.get("_id")) for anomaly in anomalies)
+        if new_docs:
+            try:
+                await db.insert_anomalies_many(new_docs)
+            except BulkWriteError as e:
+                logger.error(f"Anomali toplu yazmasında {len(e.details.get('writeErrors', []))} doküman yazılamadı")
+        if not all(inserted):
+            # Kopya okumaların önceki teslimde yazılmış olabilecek anomalileri değiştirilir
+            await db.replace_reading_anomalies(
+                [d["_id"] for d, keep in zip(documents, inserted) if not keep and "_id" in d], replayed_docs
+            )
+        hops.append(("anomaly_store", time.time()))
+
+        # Bildirimleri gönder ve işlenmiş veriyi diğer servislere ilet; yayınlar aynı onay penceresini paylaşır
+        await asyncio.gather(
+            *(
+                self._send_anomaly_notification(anomaly, _branch_headers(trace, hops))
+                for anomalies, trace in zip(anomalies_by_reading, reading_traces)
+                for anomaly in anomalies
+            ),
+            *(
+                self._send_processed_data(reading, anomalies)
+                for reading, anomalies in zip(readings, anomalies_by_reading)
+            )
+        )
+        hops.append(("notify", time.time()))
+
+        logger.info(f"Batch işlendi: {len(readings)} okuma, {len(all_anomalies)} anomali")
+        return hops
     
-    async def _send_anomaly_notification(self, anomaly: AirQualityAnomaly):
+    async def _invalidate_cache(self, parameters: List[str]):
+        """
+        Parametrelerin harita/yoğunluk önbelleğini eskitir.
+
+        Bu süreçteki önbellek doğrudan, API süreçlerindeki önbellek (WORKER_MODE=standalone)
+        cache_invalidation exchange'i üzerinden eskitilir. Sinyal gönderilemezse API
+        önbelleği en geç AGGREGATION_CACHE_TTL sonra yenilenir.
+
+        Args:
+            parameters (List[str]): Yeni veri yazılan parametreler
+        """
+        if not parameters:
+            return
+        aggregation_cache.invalidate(parameters)
+        try:
+            await rabbitmq.publish_cache_invalidation(parameters)
+        except Exception as e:
+            logger.warning(f"Önbellek eskitme sinyali gönderilemedi: {str(e)}")
+
+    async def _send_anomaly_notification(self, anomaly: AirQualityAnomaly, headers: Optional[Dict[str, str]] = None):
         """
         Anomali bildirimi gönderir.
         
         Args:
             anomaly (AirQualityAnomaly): Anomali verisi
+            headers (Optional[Dict[str, str]], optional): Okumanın iz bağlamı başlıkları
         """
         try:
             # Anomali verisini bildirim formatına dönüştür
@@ -136,7 +485,7 @@ class Worker:
             routing_key = f"anomaly.{parameter}.{severity}"
             
             # RabbitMQ'ya bildirim gönder
-            await rabbitmq.publish(routing_key, notification)
+            await rabbitmq.publish(routing_key, notification, headers=headers)
             
             logger.info(
                 f"Anomali bildirimi gönderildi: {parameter}, "
@@ -158,7 +507,7 @@ class Worker:
             # İşlenmiş veri mesajını oluştur
             processed_data = {
                 "type": "processed_data",
-                "data": data.to_mongo_document(),
+                "data": data.to_message(),
                 "has_anomalies": bool(anomalies),
                 "anomaly_count": len(anomalies) if anomalies else 0,
                 "timestamp": datetime.utcnow().isoformat()
@@ -180,4 +529,13 @@ class Worker:
             logger.error(f"İşlenmiş veri gönderilirken hata: {str(e)}")
 
 # Singleton instance
-worker = Worker() 
\ No newline at end of file
+worker = Worker() 
+
+async def start_workers(queues: Optional[List[str]] = None):
+    """
+    Worker servisini başlatır.
+    
+    Args:
+        queues (Optional[List[str]], optional): Tüketilecek kuyruklar; verilmezse tüm raw_data parçaları
+    """
+    await worker.start(queues)
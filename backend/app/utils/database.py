@@ -1,108 +1,275 @@
+import asyncio
+import logging
+import os
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from pymongo.collection import Collection
-from app.config import (
-    MONGO_URI, 
-    MONGO_DB_NAME, 
-    MONGO_COLLECTION_DATA, 
-    MONGO_COLLECTION_ANOMALIES
-)
+from pymongo.errors import BulkWriteError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Uygulamanın koleksiyonları (app.services.database ile aynı adlar)
+COLLECTION_AIR_QUALITY = "air_quality_data"
+COLLECTION_ANOMALIES = "anomalies"
+
+# Süreç içi önbelleğe alınan istemciler. pymongo istemcileri fork sonrası paylaşılamaz,
+# Motor istemcileri de ilk kullanıldıkları olay döngüsüne bağlanır; anahtarlar bunu yansıtır.
+_sync_clients: Dict[Tuple[int, str], MongoClient] = {}
+_async_clients: Dict[Tuple[int, Optional[int], str], AsyncIOMotorClient] = {}
+_clients_lock = threading.Lock()
+
+
+def client_options() -> Dict[str, Any]:
+    """
+    Senkron ve asenkron istemcilerin ortak bağlantı havuzu ve sıkıştırma ayarlarını döndürür.
+
+    MONGODB_COMPRESSORS'taki kütüphanesi kurulu olmayan sıkıştırıcıları pymongo uyarıyla atlar;
+    sunucu ile istemcinin ortak desteklediği ilk sıkıştırıcı kullanılır.
+
+    Returns:
+        Dict[str, Any]: MongoClient/AsyncIOMotorClient anahtar kelime argümanları
+    """
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return options
+
+
+def get_sync_client(url: Optional[str] = None) -> MongoClient:
+    """
+    Süreç genelinde paylaşılan senkron MongoDB istemcisini döndürür.
+
+    Aynı süreçte aynı adres için her çağrı aynı istemciyi (ve bağlantı havuzunu) döndürür;
+    fork edilen süreçler kendi istemcilerini oluşturur.
+
+    Args:
+        url (Optional[str], optional): Bağlantı adresi. Varsayılan settings.MONGODB_URL.
+
+    Returns:
+        MongoClient: MongoDB senkron bağlantı istemcisi
+    """
+    key = (os.getpid(), url or settings.MONGODB_URL)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                client = MongoClient(key[1], **client_options())
+                _sync_clients[key] = client
+    return client
+
+
+def get_async_client(url: Optional[str] = None) -> AsyncIOMotorClient:
+    """
+    Süreç ve olay döngüsü genelinde paylaşılan asenkron MongoDB istemcisini döndürür.
+
+    Args:
+        url (Optional[str], optional): Bağlantı adresi. Varsayılan settings.MONGODB_URL.
+
+    Returns:
+        AsyncIOMotorClient: MongoDB asenkron bağlantı istemcisi
+    """
+    try:
+        loop_id: Optional[int] = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = None
+    key = (os.getpid(), loop_id, url or settings.MONGODB_URL)
+    client = _async_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = AsyncIOMotorClient(key[2], **client_options())
+                _async_clients[key] = client
+    return client
+
+
+def close_clients():
+    """Bu süreçte oluşturulan tüm istemcileri kapatır ve önbellekten çıkarır."""
+    pid = os.getpid()
+    with _clients_lock:
+        for cache in (_sync_clients, _async_clients):
+            for key in [key for key in cache if key[0] == pid]:
+                cache.pop(key).close()
+
 
 # Asenkron MongoDB bağlantısı
 async def get_mongo_client():
     """
-    MongoDB istemcisi oluşturur.
-    
+    Paylaşılan MongoDB asenkron istemcisini döndürür.
+
     Returns:
         AsyncIOMotorClient: MongoDB asenkron bağlantı istemcisi
     """
-    client = AsyncIOMotorClient(MONGO_URI)
-    return client
+    return get_async_client()
 
 async def get_database():
     """
     MongoDB veritabanı bağlantısı döndürür.
-    
+
     Returns:
         Database: MongoDB veritabanı
     """
     client = await get_mongo_client()
-    return client[MONGO_DB_NAME]
+    return client[settings.MONGODB_DB_NAME]
 
 async def get_air_quality_collection():
     """
     Hava kalitesi verileri koleksiyonunu döndürür.
-    
+
     Returns:
         Collection: MongoDB koleksiyonu
     """
     db = await get_database()
-    return db[MONGO_COLLECTION_DATA]
+    return db[COLLECTION_AIR_QUALITY]
 
 async def get_anomalies_collection():
     """
     Anomali verileri koleksiyonunu döndürür.
-    
+
     Returns:
         Collection: MongoDB koleksiyonu
     """
     db = await get_database()
-    return db[MONGO_COLLECTION_ANOMALIES]
+    return db[COLLECTION_ANOMALIES]
 
-# Senkron MongoDB bağlantısı (worker için)
+# Senkron MongoDB bağlantısı (betikler ve worker süreçleri için)
 def get_sync_mongo_client():
     """
-    Senkron MongoDB istemcisi oluşturur.
-    
+    Paylaşılan MongoDB senkron istemcisini döndürür.
+
     Returns:
         MongoClient: MongoDB senkron bağlantı istemcisi
     """
-    return MongoClient(MONGO_URI)
+    return get_sync_client()
 
-def get_sync_database():
+def get_sync_database(url: Optional[str] = None, db_name: Optional[str] = None):
     """
     Senkron MongoDB veritabanı bağlantısı döndürür.
-    
+
+    Args:
+        url (Optional[str], optional): Bağlantı adresi. Varsayılan settings.MONGODB_URL.
+        db_name (Optional[str], optional): Veritabanı adı. Varsayılan settings.MONGODB_DB_NAME.
+
     Returns:
         Database: MongoDB veritabanı
     """
-    client = get_sync_mongo_client()
-    return client[MONGO_DB_NAME]
+    return get_sync_client(url)[db_name or settings.MONGODB_DB_NAME]
 
 def get_sync_air_quality_collection():
     """
     Senkron hava kalitesi verileri koleksiyonunu döndürür.
-    
+
     Returns:
         Collection: MongoDB koleksiyonu
     """
-    db = get_sync_database()
-    return db[MONGO_COLLECTION_DATA]
+    return get_sync_database()[COLLECTION_AIR_QUALITY]
 
 def get_sync_anomalies_collection():
     """
     Senkron anomali verileri koleksiyonunu döndürür.
-    
+
     Returns:
         Collection: MongoDB koleksiyonu
     """
-    db = get_sync_database()
-    return db[MONGO_COLLECTION_ANOMALIES]
-
-async def create_indexes():
-    """
-    MongoDB koleksiyonları için gerekli indeksleri oluşturur.
-    """
-    air_quality_collection = await get_air_quality_collection()
-    anomalies_collection = await get_anomalies_collection()
-    
-    # Zaman serisi sorguları için indeks
-    await air_quality_collection.create_index("timestamp")
-    
-    # Coğrafi sorgular için 2dsphere indeksi
-    await air_quality_collection.create_index([("location", "2dsphere")])
-    
-    # Anomali koleksiyonu için indeksler
-    await anomalies_collection.create_index("detected_at")
-    await anomalies_collection.create_index("parameter")
-    await anomalies_collection.create_index([("data.location", "2dsphere")]) 
\ No newline at end of file
+    return get_sync_database()[COLLECTION_ANOMALIES]
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Bir diziyi ya da imleci en fazla size elemanlık listelere böler.
+
+    Args:
+        items (Iterable[Any]): Bölünecek elemanlar
+        size (int): Parça boyutu
+
+    Yields:
+        List[Any]: Sıradaki parça
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, max(1, size)))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _log_write_errors(collection: str, error: BulkWriteError) -> int:
+    errors = error.details.get("writeErrors", [])
+    duplicates = sum(1 for e in errors if e.get("code") == 11000)
+    logger.error(
+        f"{collection} toplu yazmasında {len(errors)} doküman yazılamadı ({duplicates} kopya anahtar)"
+    )
+    return error.details.get("nInserted", 0)
+
+
+def bulk_insert(collection: Collection, documents: Iterable[Dict[str, Any]],
+                chunk_size: Optional[int] = None) -> int:
+    """
+    Dokümanları chunk_size'lık sırasız insert_many çağrılarıyla yazar.
+
+    Sırasız yazmada hatalı dokümanlar diğerlerinin yazılmasını engellemez; yazılamayanlar
+    loglanır ve tekrar denenmez (tekrar denemek kopya üretir).
+
+    Args:
+        collection (Collection): Hedef koleksiyon
+        documents (Iterable[Dict[str, Any]]): Yazılacak dokümanlar (liste ya da imleç)
+        chunk_size (Optional[int], optional): Çağrı başına doküman sayısı. Varsayılan MONGODB_BULK_CHUNK_SIZE.
+
+    Returns:
+        int: Yazılan doküman sayısı
+    """
+    inserted = 0
+    for chunk in chunked(documents, chunk_size or settings.MONGODB_BULK_CHUNK_SIZE):
+        try:
+            inserted += len(collection.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted += _log_write_errors(collection.name, e)
+    return inserted
+
+
+def bulk_write(collection: Collection, operations: Iterable[Any], chunk_size: Optional[int] = None,
+               ordered: bool = False) -> Dict[str, int]:
+    """
+    Yazma işlemlerini chunk_size'lık bulk_write çağrılarıyla uygular.
+
+    bulk_insert() gibi, uygulanamayan işlemler loglanır ve uygulananlar sayaçlara eklenir.
+    Sırasız yazmada sonraki parçalarla devam edilir; sıralı yazmada ilk hatada durulur.
+
+    Args:
+        collection (Collection): Hedef koleksiyon
+        operations (Iterable[Any]): UpdateOne, ReplaceOne, InsertOne vb. işlemler
+        chunk_size (Optional[int], optional): Çağrı başına işlem sayısı. Varsayılan MONGODB_BULK_CHUNK_SIZE.
+        ordered (bool, optional): Sıralı yazma; ilk hatada durur. Varsayılan False.
+
+    Returns:
+        Dict[str, int]: inserted, matched, modified, upserted ve deleted sayıları
+    """
+    counts = {"inserted": 0, "matched": 0, "modified": 0, "upserted": 0, "deleted": 0}
+    for chunk in chunked(operations, chunk_size or settings.MONGODB_BULK_CHUNK_SIZE):
+        try:
+            result = collection.bulk_write(chunk, ordered=ordered)
+        except BulkWriteError as e:
+            # Hatadan önce (sırasızsa hatalı olanlar dışında) uygulanan işlemlerin sayaçları
+            counts["inserted"] += _log_write_errors(collection.name, e)
+            counts["matched"] += e.details.get("nMatched", 0)
+            counts["modified"] += e.details.get("nModified", 0)
+            counts["upserted"] += e.details.get("nUpserted", 0)
+            counts["deleted"] += e.details.get("nRemoved", 0)
+            if ordered:
+                break
+            continue
+        counts["inserted"] += result.inserted_count
+        counts["matched"] += result.matched_count
+        counts["modified"] += result.modified_count
+        counts["upserted"] += result.upserted_count
+        counts["deleted"] += result.deleted_count
+    return counts
+
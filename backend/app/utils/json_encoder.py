@@ -1,64 +1,58 @@
-import json
-from datetime import datetime
+from typing import Any
+import orjson
 from bson import ObjectId
+from fastapi.responses import JSONResponse
 
-class JSONEncoder(json.JSONEncoder):
+# orjson seçenekleri: numpy dizileri ve string olmayan sözlük anahtarları da desteklenir
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def orjson_default(obj: Any):
     """
-    MongoDB'den gelen ObjectId ve datetime gibi özel tipleri JSON'a dönüştürebilen encoder.
+    orjson'un yerel olarak tanımadığı tipleri dönüştürür.
+    datetime orjson tarafından doğrudan ISO 8601 formatında yazılır.
+
+    Args:
+        obj: Dönüştürülecek nesne
+
+    Returns:
+        JSON'a yazılabilir karşılık
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} JSON'a dönüştürülemez")
+
+def dump_json_bytes(obj: Any) -> bytes:
+    """
+    Nesneyi tek geçişte UTF-8 JSON byte dizisine dönüştürür.
+
+    Args:
+        obj: JSON'a dönüştürülecek nesne (ObjectId ve datetime içerebilir)
+
+    Returns:
+        bytes: JSON byte dizisi
     """
-    def default(self, obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+    return orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS)
 
-def dump_json(obj):
+def dump_json(obj: Any) -> str:
     """
     Nesneyi JSON formatına dönüştürür.
-    
+
     Args:
         obj: JSON'a dönüştürülecek nesne
-        
+
     Returns:
         str: JSON string
     """
-    return json.dumps(obj, cls=JSONEncoder)
+    return dump_json_bytes(obj).decode()
 
-def convert_mongo_document(doc):
+class MongoJSONResponse(JSONResponse):
     """
-    MongoDB belgesini JSON serileştirilebilir bir dict'e dönüştürür.
-    
-    Args:
-        doc (dict): MongoDB belgesi
-        
-    Returns:
-        dict: JSON serileştirilebilir dict
+    MongoDB dokümanlarını (ObjectId, datetime) doğrudan orjson ile yazan yanıt sınıfı.
+
+    Route'lar sonuçlarını bu sınıfla döndürdüğünde FastAPI'nin jsonable_encoder
+    adımı atlanır ve gövde tek bir serileştirme ile üretilir.
     """
-    if doc is None:
-        return None
-        
-    if isinstance(doc, list):
-        return [convert_mongo_document(item) for item in doc]
-        
-    if not isinstance(doc, dict):
-        if isinstance(doc, ObjectId):
-            return str(doc)
-        if isinstance(doc, datetime):
-            return doc.isoformat()
-        return doc
-    
-    result = {}
-    for key, value in doc.items():
-        if isinstance(value, ObjectId):
-            result[key] = str(value)
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat()
-        elif isinstance(value, dict):
-            result[key] = convert_mongo_document(value)
-        elif isinstance(value, list):
-            result[key] = [convert_mongo_document(item) for item in value]
-        else:
-            result[key] = value
-    
-    return result 
\ No newline at end of file
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dump_json_bytes(content)
@@ -1,83 +1,357 @@
-import json
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 import pika
-from app.config import (
-    RABBITMQ_HOST, 
-    RABBITMQ_PORT, 
-    RABBITMQ_USER, 
-    RABBITMQ_PASS, 
-    RABBITMQ_VHOST,
-    QUEUE_RAW_DATA,
-    QUEUE_PROCESSED_DATA,
-    QUEUE_ANOMALIES
-)
+from pika.exceptions import AMQPChannelError, AMQPConnectionError, NackError, UnroutableError
+from app.config import settings
+from app.models.air_quality import AirQualityInput
+from app.services.codec import MessageCodec
+from app.services.sharding import group_by_routing_key, shard_queue, shard_routing_key
+from app.services.stations import station_registry
+from app.utils.database import get_sync_database
+
+logger = logging.getLogger(__name__)
+
+# Uygulamanın kuyrukları (app.services.rabbitmq ile aynı adlar ve ayarlar)
+QUEUE_RAW_DATA = "raw_data"
+QUEUE_PROCESSED_DATA = "processed_data"
+QUEUE_ANOMALIES = "anomaly_notifications"
+
+# Ham okumaların istasyon parçalarına yönlendirildiği topic exchange
+EXCHANGE = "air_quality_exchange"
+
+# Bağlantı yenilenerek tekrar denenen hatalar; UnroutableError tekrar denenmez
+RETRYABLE_ERRORS = (AMQPConnectionError, AMQPChannelError, NackError)
+
+
+def _connection_parameters() -> pika.ConnectionParameters:
+    credentials = pika.PlainCredentials(settings.RABBITMQ_USER, settings.RABBITMQ_PASS)
+    return pika.ConnectionParameters(
+        host=settings.RABBITMQ_HOST,
+        port=settings.RABBITMQ_PORT,
+        virtual_host=settings.RABBITMQ_VHOST,
+        credentials=credentials,
+        heartbeat=60,
+        # Broker bellek/disk alarmında yayın sonsuza kadar bloklanmasın
+        blocked_connection_timeout=settings.RABBITMQ_PUBLISH_TIMEOUT
+    )
+
 
 def get_rabbitmq_connection():
     """
     RabbitMQ bağlantısı oluşturur.
-    
+
     Returns:
         pika.BlockingConnection: RabbitMQ bağlantısı
     """
-    credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
-    parameters = pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        port=RABBITMQ_PORT,
-        virtual_host=RABBITMQ_VHOST,
-        credentials=credentials
-    )
-    return pika.BlockingConnection(parameters)
+    return pika.BlockingConnection(_connection_parameters())
+
 
 def get_channel(connection=None):
     """
     RabbitMQ kanalı oluşturur.
-    
+
     Args:
-        connection (pika.BlockingConnection, optional): Mevcut bağlantı. 
+        connection (pika.BlockingConnection, optional): Mevcut bağlantı.
             Eğer None ise yeni bağlantı oluşturulur.
-    
+
     Returns:
         pika.channel.Channel: RabbitMQ kanalı
     """
     if connection is None:
         connection = get_rabbitmq_connection()
-    
+
     channel = connection.channel()
-    
-    # Kuyrukları tanımla
+
+    # Exchange, kuyruklar ve binding'ler (RabbitMQService.setup_exchanges_and_queues ile aynı)
+    channel.exchange_declare(exchange=EXCHANGE, exchange_type="topic", durable=True)
     channel.queue_declare(queue=QUEUE_RAW_DATA, durable=True)
+    channel.queue_bind(queue=QUEUE_RAW_DATA, exchange=EXCHANGE, routing_key="data.raw")
+    if settings.WORKER_SHARDS > 1:
+        for shard in range(settings.WORKER_SHARDS):
+            channel.queue_declare(queue=shard_queue(shard), durable=True)
+            channel.queue_bind(queue=shard_queue(shard), exchange=EXCHANGE, routing_key=shard_routing_key(shard))
     channel.queue_declare(queue=QUEUE_PROCESSED_DATA, durable=True)
+    channel.queue_bind(queue=QUEUE_PROCESSED_DATA, exchange=EXCHANGE, routing_key="data.processed")
     channel.queue_declare(queue=QUEUE_ANOMALIES, durable=True)
-    
+    channel.queue_bind(queue=QUEUE_ANOMALIES, exchange=EXCHANGE, routing_key="anomaly.#")
+
     return channel
 
+
+class _PooledChannel:
+    """Havuzdaki uzun ömürlü bir bağlantı ve onun publisher confirm açık kanalı."""
+
+    __slots__ = ("connection", "channel")
+
+    def __init__(self):
+        self.connection = get_rabbitmq_connection()
+        self.channel = get_channel(self.connection)
+        # Her basic_publish broker onayını (ya da nack/return hatasını) bekler
+        self.channel.confirm_delivery()
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection.is_open and self.channel.is_open
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+
+
+class SyncPublisher:
+    """
+    Betikler ve cron işleri için thread-safe, bağlantı havuzlu senkron yayıncı.
+
+    pika bağlantıları thread-safe olmadığından her bağlantı aynı anda tek bir thread'e
+    ödünç verilir; havuz en fazla pool_size bağlantı açar, fazlası boşalanı bekler. Bağlantılar
+    yayınlar arasında açık kalır ve kuyruklar bağlantı başına bir kez tanımlanır.
+
+    Kanallar publisher confirm modundadır: publish() mesaj onaylanınca döner. Toplu yayında
+    kayıtlar, worker'ın çözdüğü JSON dizisi mesajları halinde (chunk_size kayıt) gönderilir;
+    böylece onay gidiş-dönüşü kayıt başına değil mesaj başına ödenir. Bağlantı kopması, kanal
+    hatası ya da nack durumunda bağlantı yenilenir ve mesaj en fazla retries kez tekrar
+    gönderilir (en az bir kez teslim). Yönlendirilemeyen (kuyruğu olmayan) mesajlar hata verir.
+    """
+
+    def __init__(self, pool_size: int = 4, retries: int = 3, codec: Optional[MessageCodec] = None):
+        self.pool_size = max(1, pool_size)
+        self.retries = max(0, retries)
+        self.codec = codec or MessageCodec(
+            codec=settings.MESSAGE_CODEC,
+            compression=settings.MESSAGE_COMPRESSION,
+            compress_min_bytes=settings.MESSAGE_COMPRESS_MIN_BYTES
+        )
+        self._reset()
+
+    def _reset(self):
+        self._idle: "queue.LifoQueue[_PooledChannel]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._all: List[_PooledChannel] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _channel(self) -> Iterator[_PooledChannel]:
+        """Havuzdan açık bir bağlantı ödünç verir; hata olursa bağlantı atılır."""
+        if self._pid != os.getpid():
+            # fork sonrası ebeveynin soketleri paylaşılmaz
+            self._reset()
+
+        self._slots.acquire()
+        pooled = None
+        try:
+            while pooled is None:
+                try:
+                    candidate = self._idle.get_nowait()
+                except queue.Empty:
+                    pooled = _PooledChannel()
+                    with self._lock:
+                        self._all.append(pooled)
+                    break
+                # Boşta beklerken gelen heartbeat'leri işle, kopmuş bağlantıyı ele
+                try:
+                    candidate.connection.process_data_events(time_limit=0)
+                except RETRYABLE_ERRORS:
+                    pass
+                if candidate.is_open:
+                    pooled = candidate
+                else:
+                    self._discard(candidate)
+
+            try:
+                yield pooled
+            except BaseException:
+                self._discard(pooled)
+                pooled = None
+                raise
+        finally:
+            if pooled is not None:
+                self._idle.put(pooled)
+            self._slots.release()
+
+    def _discard(self, pooled: _PooledChannel):
+        pooled.close()
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+
+    def _send(self, exchange: str, routing_key: str, body: bytes, properties: pika.BasicProperties):
+        """Tek bir mesajı onaylanana kadar, gerekirse bağlantıyı yenileyerek gönderir."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self._channel() as pooled:
+                    pooled.channel.basic_publish(
+                        exchange=exchange, routing_key=routing_key, body=body,
+                        properties=properties, mandatory=True
+                    )
+                return
+            except UnroutableError:
+                raise
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.retries:
+                    raise
+                delay = min(0.1 * 2 ** attempt, 5.0)
+                logger.warning(
+                    f"Mesaj gönderilemedi ({routing_key}, {type(e).__name__}), "
+                    f"{delay:.1f} sn sonra yeni bağlantıyla tekrar denenecek ({attempt + 1}/{self.retries})"
+                )
+                time.sleep(delay)
+
+    def _properties(self, properties: Dict[str, Any], headers: Optional[Dict[str, Any]]) -> pika.BasicProperties:
+        return pika.BasicProperties(
+            delivery_mode=2,  # Kalıcı mesaj
+            content_type=properties.get("content_type"),
+            content_encoding=properties.get("content_encoding"),
+            timestamp=int(time.time()),
+            headers=dict(headers or {}, source="sync")
+        )
+
+    def publish(self, routing_key: str, message: Any, exchange: str = "", headers: Optional[Dict[str, Any]] = None):
+        """
+        Tek bir mesajı yayınlar ve broker onayını bekler.
+
+        Args:
+            routing_key (str): Yönlendirme anahtarı (varsayılan exchange'te kuyruk adı)
+            message (Any): Gönderilecek veri (ayarlı kodlamayla serileştirilir)
+            exchange (str, optional): Exchange adı. Varsayılan "" (doğrudan kuyruğa).
+            headers (Optional[Dict[str, Any]], optional): Ek mesaj başlıkları
+
+        Raises:
+            UnroutableError: Mesaj hiçbir kuyruğa yönlendirilemezse
+            AMQPError: Tüm denemeler başarısız olursa son hata
+        """
+        body, properties = self.codec.encode(message)
+        self._send(exchange, routing_key, body, self._properties(properties, headers))
+
+    def publish_batch(self, routing_key: str, items: List[Dict[str, Any]], chunk_size: Optional[int] = None,
+                      exchange: str = "") -> int:
+        """
+        Kayıtları, her biri chunk_size kayıtlık dizi taşıyan onaylı mesajlar halinde yayınlar.
+
+        Args:
+            routing_key (str): Yönlendirme anahtarı (varsayılan exchange'te kuyruk adı)
+            items (List[Dict[str, Any]]): Yayınlanacak kayıtlar
+            chunk_size (Optional[int], optional): Mesaj başına kayıt sayısı. Varsayılan BATCH_PUBLISH_SIZE.
+            exchange (str, optional): Exchange adı. Varsayılan "" (doğrudan kuyruğa).
+
+        Returns:
+            int: Yayınlanan mesaj sayısı
+        """
+        chunk_size = max(1, chunk_size or settings.BATCH_PUBLISH_SIZE)
+        published = 0
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            body, properties = self.codec.encode(chunk)
+            self._send(exchange, routing_key, body, self._properties(properties, {"batch_size": len(chunk)}))
+            published += 1
+        return published
+
+    def close(self):
+        """Havuzdaki tüm bağlantıları kapatır."""
+        with self._lock:
+            pooled_channels, self._all = self._all, []
+        for pooled in pooled_channels:
+            pooled.close()
+        self._idle = queue.LifoQueue()
+
+
 def publish_message(queue_name, message, channel=None):
     """
     Belirtilen kuyruğa mesaj gönderir.
-    
+
+    Kanal verilmezse havuzlu sync_publisher kullanılır; bağlantı her çağrıda yeniden açılmaz
+    ve mesaj broker onaylayınca dönülür.
+
     Args:
         queue_name (str): Mesajın gönderileceği kuyruk adı
-        message (dict): Gönderilecek mesaj (JSON'a dönüştürülecek)
-        channel (pika.channel.Channel, optional): Mevcut kanal. 
-            Eğer None ise yeni kanal oluşturulur.
+        message (dict): Gönderilecek mesaj (ayarlı kodlamayla serileştirilir)
+        channel (pika.channel.Channel, optional): Mevcut kanal.
+            Verilirse mesaj doğrudan bu kanaldan gönderilir.
     """
-    connection = None
-    should_close_channel = False
-    
-    try:
-        if channel is None:
-            connection = get_rabbitmq_connection()
-            channel = get_channel(connection)
-            should_close_channel = True
-        
-        channel.basic_publish(
-            exchange='',
-            routing_key=queue_name,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # Kalıcı mesaj
-                content_type='application/json'
-            )
+    if channel is None:
+        sync_publisher.publish(queue_name, message)
+        return
+
+    body, properties = sync_publisher.codec.encode(message)
+    channel.basic_publish(
+        exchange='',
+        routing_key=queue_name,
+        body=body,
+        properties=pika.BasicProperties(
+            delivery_mode=2,  # Kalıcı mesaj
+            content_type=properties.get("content_type"),
+            content_encoding=properties.get("content_encoding")
         )
-    finally:
-        if should_close_channel and connection:
-            connection.close() 
\ No newline at end of file
+    )
+
+
+def publish_messages(queue_name, messages, chunk_size=None) -> int:
+    """
+    Çok sayıda kaydı havuzlu yayıncıyla, dizi mesajları halinde kuyruğa gönderir.
+
+    Args:
+        queue_name (str): Mesajların gönderileceği kuyruk adı
+        messages (List[dict]): Gönderilecek kayıtlar
+        chunk_size (int, optional): Mesaj başına kayıt sayısı. Varsayılan BATCH_PUBLISH_SIZE.
+
+    Returns:
+        int: Yayınlanan mesaj sayısı
+    """
+    return sync_publisher.publish_batch(queue_name, messages, chunk_size)
+
+
+def publish_readings(readings, chunk_size=None, database=None) -> int:
+    """
+    Ham okumaları API ile aynı yoldan, istasyonlarının parça kuyruklarına yayınlar.
+
+    Her okuma doğrulanır, istasyon kaydına eşlenir (station_id) ve air_quality_exchange
+    üzerinden istasyonunun routing key'iyle gönderilir. Okumaları doğrudan raw_data kuyruğuna
+    yazmak parçalı düzende istasyon-worker eşlemesini atlar; betikler bu fonksiyonu kullanmalıdır.
+
+    Args:
+        readings (List[dict]): Okumalar (AirQualityInput alanları)
+        chunk_size (int, optional): Mesaj başına kayıt sayısı. Varsayılan BATCH_PUBLISH_SIZE.
+        database (pymongo.database.Database, optional): İstasyon kaydının veritabanı.
+            Varsayılan get_sync_database().
+
+    Returns:
+        int: Yayınlanan mesaj sayısı
+
+    Raises:
+        ValidationError: Okumalardan biri geçersizse (hiçbir şey yayınlanmaz)
+    """
+    if database is None:
+        database = get_sync_database()
+    if len(station_registry) == 0:
+        station_registry.load_sync(database)
+
+    docs = []
+    for reading in readings:
+        # Okuma ve istasyon kimlikleri her zaman burada atanır; girdideki değerler yok sayılır
+        data = AirQualityInput.parse_obj(reading.dict() if isinstance(reading, AirQualityInput) else reading)
+        station_id = station_registry.resolve_sync(
+            database, data.latitude, data.longitude, data.city, data.country
+        )
+        docs.append(data.to_reading(station_id).to_message())
+
+    published = 0
+    for routing_key, group in group_by_routing_key(docs).items():
+        published += sync_publisher.publish_batch(routing_key, group, chunk_size, exchange=EXCHANGE)
+    return published
+
+
+# Singleton instance
+sync_publisher = SyncPublisher(
+    pool_size=settings.RABBITMQ_SYNC_POOL_SIZE,
+    retries=settings.RABBITMQ_PUBLISH_RETRIES
+)
+atexit.register(sync_publisher.close)
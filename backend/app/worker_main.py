@@ -0,0 +1,157 @@
+"""
+Worker'ın API'den bağımsız giriş noktası (WORKER_MODE=standalone).
+
+raw_data WORKER_SHARDS parçaya bölünür: API her okumayı istasyonunun jump consistent hash
+ile seçilen raw_data.{i} kuyruğuna yayınlar. Bu komut parçaları N sürece dağıtır; her süreç
+sadece kendi parçalarının kuyruklarını tüketir ve sadece o istasyonların kayan
+istatistiklerini tutar. Birden fazla sunucuda her sunucuya --shards ile farklı parçalar verilir.
+
+Ana süreç alt süreçleri izler: biri beklenmedik şekilde çıkarsa (ör. başlangıçta broker ya da
+MongoDB hazır değilse) diğerlerini durdurur ve sıfırdan farklı kodla çıkar; böylece parçalar
+tüketilmeden kalmaz ve konteynerin yeniden başlatma politikası devreye girer.
+
+Worker'lar yeni veri yazdıkları parametreleri cache_invalidation fanout exchange'ine yayınlar;
+API süreçleri bunu dinleyip harita/yoğunluk önbelleğini eskitir. Sinyal kaçırılırsa önbellek
+en geç AGGREGATION_CACHE_TTL sonra yenilenir.
+
+Kullanım:
+    python -m app.worker_main --processes 4
+    python -m app.worker_main --shards 0,1,2,3 --processes 2
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+import sys
+from multiprocessing.connection import wait
+from typing import List
+from app.config import settings
+from app.services.rabbitmq import rabbitmq
+from app.services.database import db
+from app.services.stations import station_registry
+from app.services.anomaly_detection import anomaly_detector
+from app.services.executor import detection_executor
+from app.services import metrics
+from app.services.sharding import shard_of, queues_for_shards
+from app.services.worker import worker, start_workers
+
+logger = logging.getLogger(__name__)
+
+
+async def run(shards: List[int], index: int = 0):
+    """
+    Tek bir worker sürecini verilen parçalar için çalıştırır ve SIGTERM/SIGINT ile durdurur.
+
+    Args:
+        shards (List[int]): Sürecin tükettiği parça numaraları
+        index (int, optional): Sürecin sırası (metrik portu için). Varsayılan 0.
+    """
+    metrics.start_worker_metrics_server(index)
+    metrics.start_loop_lag_monitor()
+
+    await rabbitmq.connect()
+    await rabbitmq.setup_exchanges_and_queues()
+    await db.init_db()
+    await station_registry.load()
+
+    # Sadece bu sürecin parçalarındaki istasyonların istatistikleri tutulur
+    total = max(1, settings.WORKER_SHARDS)
+    owned = set(shards)
+    await anomaly_detector.warm_up(station_filter=lambda station: shard_of(station, total) in owned)
+
+    await start_workers(queues_for_shards(shards))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    logger.info("Worker süreci durduruluyor")
+    await worker.stop()
+    await rabbitmq.close()
+    detection_executor.shutdown()
+
+
+def run_process(shards: List[int], index: int = 0):
+    """Alt süreç giriş noktası."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker[{','.join(map(str, shards))}] - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(run(shards, index))
+
+
+def parse_shards(value: str) -> List[int]:
+    shards = sorted({int(part) for part in value.split(",") if part.strip()})
+    if any(shard < 0 or shard >= max(1, settings.WORKER_SHARDS) for shard in shards):
+        raise argparse.ArgumentTypeError(f"Parça numaraları 0 ile {settings.WORKER_SHARDS - 1} arasında olmalı")
+    return shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hava kalitesi worker süreçleri")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES, help="Süreç sayısı")
+    parser.add_argument("--shards", type=parse_shards, default=None,
+                        help="Bu sunucunun tükettiği parçalar (virgülle ayrılmış); verilmezse tümü")
+    args = parser.parse_args()
+
+    shards = args.shards if args.shards is not None else list(range(max(1, settings.WORKER_SHARDS)))
+    processes = max(1, min(args.processes, len(shards)))
+    groups = [shards[index::processes] for index in range(processes)]
+
+    if processes == 1:
+        run_process(groups[0])
+        return
+
+    context = multiprocessing.get_context("spawn")
+    children = [context.Process(target=run_process, args=(group, index), name=f"worker-{index}")
+                for index, group in enumerate(groups)]
+    for child in children:
+        child.start()
+
+    sys.exit(supervise(children))
+
+
+def supervise(children: List[multiprocessing.Process]) -> int:
+    """
+    Alt süreçleri izler; sinyali onlara iletir, biri beklenmedik şekilde çıkarsa diğerlerini durdurur.
+
+    Args:
+        children (List[multiprocessing.Process]): Başlatılmış alt süreçler
+
+    Returns:
+        int: Ana sürecin çıkış kodu (düzenli kapanışta 0)
+    """
+    stopping = False
+
+    def stop_all():
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        stop_all()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    exit_code = 0
+    running = {child.sentinel: child for child in children}
+    while running:
+        for sentinel in wait(list(running)):
+            child = running.pop(sentinel)
+            child.join()
+            if stopping or exit_code:
+                continue
+            logger.error(f"{child.name} beklenmedik şekilde çıktı (kod {child.exitcode}), tüm worker'lar durduruluyor")
+            exit_code = child.exitcode if child.exitcode and child.exitcode > 0 else 1
+            stop_all()
+    return exit_code
+
+
+if __name__ == "__main__":
+    main()
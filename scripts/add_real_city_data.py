@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import argparse
 import json
 import os
 import sys
@@ -7,6 +8,8 @@ from datetime import datetime, timedelta
 import logging
 import random
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -159,15 +162,65 @@ def add_data_to_mongodb():
     
     return len(air_quality_data), len(anomaly_data)
 
+def to_reading(aq_data):
+    """Üretilen veriyi API'nin kabul ettiği okuma formatına çevirir."""
+    # CITIES koordinatları [enlem, boylam] sırasındadır
+    latitude, longitude = aq_data["location"]["coordinates"]
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timestamp": aq_data["timestamp"],
+        "pm25": aq_data["pm25"],
+        "pm10": aq_data["pm10"],
+        "no2": aq_data["no2"],
+        "so2": aq_data["so2"],
+        "o3": aq_data["o3"],
+        "city": aq_data["city"],
+        "country": "Türkiye",
+        "source": "add_real_city_data"
+    }
+
+def publish_data_to_queue():
+    """
+    Verileri RabbitMQ üzerinden worker'a gönderir.
+
+    Okumalar istasyon kaydına eşlenip istasyonlarının parça kuyruklarına yayınlanır; kayıt,
+    özetler ve anomali tespiti API'den gelen verilerle aynı şekilde worker'da yapılır.
+    """
+    from app.utils.messaging import publish_readings
+    from app.utils.database import get_sync_database
+
+    readings = []
+    for city in CITIES:
+        for hour in range(24, -1, -1):
+            aq_data = generate_random_air_quality_data(city)
+            aq_data["timestamp"] = datetime.utcnow() - timedelta(hours=hour)
+            readings.append(to_reading(aq_data))
+
+    message_count = publish_readings(readings, database=get_sync_database(MONGODB_URL, MONGODB_DB_NAME))
+    logger.info(f"{len(readings)} hava kalitesi verisi {message_count} mesajla kuyruğa eklendi.")
+    return len(readings)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Şehirler için örnek hava kalitesi verisi ekler")
+    parser.add_argument(
+        "--via-queue", action="store_true",
+        help="Verileri MongoDB'ye yazmak yerine RabbitMQ üzerinden worker'a gönder (anomaliler worker'da tespit edilir)"
+    )
+    args = parser.parse_args()
+
     print("Gerçek Şehir Verileri Ekleme Aracı")
     print("----------------------------------")
     
     try:
-        num_aq_data, num_anomaly_data = add_data_to_mongodb()
-        print(f"\nToplam {num_aq_data} hava kalitesi verisi ve {num_anomaly_data} anomali verisi eklendi.")
-        print("\nVerileri görüntülemek için test_mongodb_direct.py scriptini çalıştırın:")
-        print("python scripts/test_mongodb_direct.py")
+        if args.via_queue:
+            num_aq_data = publish_data_to_queue()
+            print(f"\nToplam {num_aq_data} hava kalitesi verisi kuyruğa eklendi.")
+        else:
+            num_aq_data, num_anomaly_data = add_data_to_mongodb()
+            print(f"\nToplam {num_aq_data} hava kalitesi verisi ve {num_anomaly_data} anomali verisi eklendi.")
+            print("\nVerileri görüntülemek için test_mongodb_direct.py scriptini çalıştırın:")
+            print("python scripts/test_mongodb_direct.py")
     except Exception as e:
         logger.error(f"Veri ekleme sırasında hata oluştu: {e}")
         sys.exit(1) 
\ No newline at end of file
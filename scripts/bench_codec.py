@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+RabbitMQ mesaj kodlamalarının boyut ve CPU maliyetini karşılaştırır.
+
+Eski yol: to_mongo_document() (GeoJSON location dahil) + json.dumps(CustomJSONEncoder),
+tüketicide json.loads. Yeni yol: to_message() (location yok) + MessageCodec ile
+JSON (orjson) / msgpack, toplu mesajlarda isteğe bağlı zstd/lz4. Her iki yolda da
+tüketicinin sonrasında yaptığı Pydantic doğrulaması aynıdır ve ölçüme dahil değildir.
+
+Kullanım:
+    python scripts/bench_codec.py --batch 500 --repeat 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bson import ObjectId
+from app.models.air_quality import AirQualityData
+from app.services.codec import MessageCodec, decode, zstandard, lz4_frame
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    """Kaldırılan rabbitmq.CustomJSONEncoder."""
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        return super().default(obj)
+
+
+def generate_readings(count):
+    """API'den gelen okumalara benzer örnekler üretir."""
+    now = datetime.utcnow()
+    return [
+        AirQualityData(
+            latitude=random.uniform(36, 42),
+            longitude=random.uniform(26, 45),
+            timestamp=now - timedelta(seconds=i),
+            pm25=round(random.uniform(5, 180), 2),
+            pm10=round(random.uniform(10, 200), 2),
+            no2=round(random.uniform(5, 100), 2),
+            so2=round(random.uniform(1, 50), 2),
+            o3=round(random.uniform(10, 120), 2),
+            source="bench",
+            city="İstanbul",
+            country="Türkiye",
+            station_id=random.randint(1, 500)
+        )
+        for i in range(count)
+    ]
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesaj kodlaması karşılaştırması")
+    parser.add_argument("--batch", type=int, default=500, help="Toplu mesajdaki okuma sayısı")
+    parser.add_argument("--repeat", type=int, default=200, help="Tekrar sayısı")
+    args = parser.parse_args()
+
+    random.seed(42)
+    readings = generate_readings(args.batch)
+    legacy_single, legacy_batch = readings[0].to_mongo_document(), [r.to_mongo_document() for r in readings]
+    wire_single, wire_batch = readings[0].to_message(), [r.to_message() for r in readings]
+
+    variants = [("eski json", None, None)]
+    variants += [("orjson", "json", "none"), ("msgpack", "msgpack", "none")]
+    if zstandard is not None:
+        variants.append(("msgpack+zstd", "msgpack", "zstd"))
+    if lz4_frame is not None:
+        variants.append(("msgpack+lz4", "msgpack", "lz4"))
+
+    print(f"Toplu mesaj: {args.batch} okuma, tekrar: {args.repeat}")
+    print(f"{'kodlama':<14}{'tekil bayt':>11}{'toplu bayt':>12}{'kodlama µs':>12}{'çözme µs':>11}  (toplu mesaj)")
+    for name, codec_name, compression in variants:
+        if codec_name is None:
+            single = json.dumps(legacy_single, cls=LegacyJSONEncoder).encode()
+            body = json.dumps(legacy_batch, cls=LegacyJSONEncoder).encode()
+            encode_time = measure(lambda: json.dumps(legacy_batch, cls=LegacyJSONEncoder).encode(), args.repeat)
+            decode_time = measure(lambda: json.loads(body), args.repeat)
+        else:
+            codec = MessageCodec(codec=codec_name, compression=compression, compress_min_bytes=0)
+            single, _ = MessageCodec(codec=codec_name).encode(wire_single)
+            body, properties = codec.encode(wire_batch)
+            encode_time = measure(lambda: codec.encode(wire_batch), args.repeat)
+            decode_time = measure(
+                lambda: decode(body, properties["content_type"], properties.get("content_encoding")), args.repeat
+            )
+        print(
+            f"{name:<14}{len(single):>11,}{len(body):>12,}"
+            f"{encode_time * 1e6:>12,.0f}{decode_time * 1e6:>11,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
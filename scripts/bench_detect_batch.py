@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+AnomalyDetector.detect_batch'in vektörel eşik ve tarihsel kontrol hızını ölçer.
+
+Karşılaştırılan yollar:
+  - okuma başına: check_threshold_anomaly (getattr + anomali başına Pydantic modeli)
+  - vektörel eşik: detect_batch(historical=False), sadece sonuç dizileri
+  - vektörel tam: detect_batch + istasyon istatistikleriyle Z-score
+
+Kullanım:
+    python scripts/bench_detect_batch.py --readings 1000000 --stations 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+from app.models.air_quality import AirQualityData
+from app.services.anomaly_detection import AnomalyDetector
+from app.services.rolling_stats import PARAMETERS
+
+
+def generate_columns(count, stations, rng):
+    """Rastgele sütunsal okuma batch'i üretir (eksik değerlerin ~%10'u NaN)."""
+    columns = {}
+    for parameter in PARAMETERS:
+        values = rng.gamma(2.0, 20.0, size=count)
+        values[rng.random(count) < 0.1] = np.nan
+        columns[parameter] = values
+    columns["station"] = rng.integers(0, stations, size=count).astype(object)
+    now = np.datetime64(datetime.utcnow().replace(microsecond=0), "us")
+    columns["timestamp"] = now - rng.integers(0, 3600 * 10**6, size=count).astype("timedelta64[us]")
+    return columns
+
+
+def warm_detector(detector, stations, rng):
+    """Her istasyon/parametre için 200 saatlik geçmiş istatistik üretir."""
+    now = datetime.utcnow()
+    for station in range(stations):
+        for i in range(200):
+            timestamp = now - timedelta(hours=200 - i)
+            for parameter in PARAMETERS:
+                detector.stats.add(station, parameter, float(rng.gamma(2.0, 20.0)), timestamp)
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toplu anomali tespiti karşılaştırması")
+    parser.add_argument("--readings", type=int, default=1000000, help="Batch'teki okuma sayısı")
+    parser.add_argument("--stations", type=int, default=200, help="İstasyon sayısı")
+    parser.add_argument("--per-reading", type=int, default=20000, help="Okuma başına yolda ölçülecek okuma sayısı")
+    parser.add_argument("--repeat", type=int, default=5, help="Tekrar sayısı")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    rng = np.random.default_rng(42)
+    detector = AnomalyDetector()
+    columns = generate_columns(args.readings, args.stations, rng)
+
+    # Okuma başına yol: aynı değerlerden oluşturulmuş Pydantic modelleri
+    readings = [
+        AirQualityData(latitude=41.0, longitude=29.0, **{
+            parameter: float(columns[parameter][i])
+            for parameter in PARAMETERS if not np.isnan(columns[parameter][i])
+        })
+        for i in range(args.per_reading)
+    ]
+
+    async def per_reading():
+        for reading in readings:
+            await detector.check_threshold_anomaly(reading)
+
+    per_reading_time = measure(lambda: asyncio.run(per_reading()), 1)
+    threshold_time = measure(lambda: detector.detect_batch(columns, historical=False), args.repeat)
+
+    warm_detector(detector, args.stations, rng)
+    full_time = measure(lambda: detector.detect_batch(columns), args.repeat)
+    result = detector.detect_batch(columns)
+
+    print(f"Okuma: {args.readings}, istasyon: {args.stations}, parametre: {len(PARAMETERS)}")
+    print(f"Okuma başına eşik  : {args.per_reading / per_reading_time:12,.0f} okuma/sn")
+    print(f"Vektörel eşik      : {args.readings / threshold_time:12,.0f} okuma/sn ({threshold_time * 1000:.1f} ms)")
+    print(f"Vektörel eşik+tarih: {args.readings / full_time:12,.0f} okuma/sn ({full_time * 1000:.1f} ms)")
+    print(f"Tespit edilen anomali hücresi: {result.anomaly_count:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+detect_batch_async'in olay döngüsü gecikmesine etkisini ve yürütücü türüne göre hızını ölçer.
+
+Ölçüm sırasında olay döngüsünde 1 ms'de bir uyanan bir görev çalışır; gecikmesi (planlanan
+ile gerçekleşen uyanma arasındaki fark) HTTP/WebSocket isteklerinin göreceği beklemeyi temsil
+eder. Her yürütücü türü (inline, thread, process) için aynı batch'ler işlenir.
+
+--update, worker'daki gibi okumaları kontrolden sonra istatistiklere ekler. Worker boyutundaki
+batch'lerde süreyi istatistiklerin diziye alınması ve güncellenmesi belirler; thread satırı
+varsayılan DETECTION_EXECUTOR=thread ayarında worker'ın olay döngüsünün göreceği gecikmedir.
+
+Kullanım:
+    python scripts/bench_executor.py --readings 200000 --batches 10 --workers 4
+    python scripts/bench_executor.py --readings 500 --batches 200 --stations 500 --kinds inline,thread --update
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+from app.services import anomaly_detection
+from app.services.anomaly_detection import AnomalyDetector
+from app.services.executor import DetectionExecutor
+from bench_detect_batch import generate_columns, warm_detector
+
+
+async def measure_lag(stop: asyncio.Event, lags: list, interval: float = 0.001):
+    """Olay döngüsünün her interval saniyelik uykudan ne kadar geç uyandığını kaydeder."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(kind, detector, batches, workers, chunk_rows, update):
+    anomaly_detection.detection_executor = DetectionExecutor(kind, workers=workers, chunk_rows=chunk_rows, min_rows=0)
+    # Havuzu ısıt (süreç başlatma maliyeti ölçüme girmesin)
+    await detector.detect_batch_async(batches[0])
+
+    stop = asyncio.Event()
+    lags = []
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    for batch in batches:
+        await detector.detect_batch_async(batch, update=update)
+    elapsed = time.perf_counter() - started
+    # Engellenen son uykunun gecikmesi de kaydedilsin
+    await asyncio.sleep(0.01)
+    stop.set()
+    await lag_task
+    anomaly_detection.detection_executor.shutdown()
+
+    rows = sum(len(batch["pm25"]) for batch in batches)
+    lags_ms = np.array(lags) * 1000
+    print(
+        f"{kind:<8}{rows / elapsed:14,.0f} okuma/sn   döngü gecikmesi p50 {np.percentile(lags_ms, 50):6.1f} ms, "
+        f"p99 {np.percentile(lags_ms, 99):6.1f} ms, en fazla {lags_ms.max():6.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Anomali tespiti yürütücü karşılaştırması")
+    parser.add_argument("--readings", type=int, default=200000, help="Batch başına okuma sayısı")
+    parser.add_argument("--batches", type=int, default=10, help="Batch sayısı")
+    parser.add_argument("--stations", type=int, default=200, help="İstasyon sayısı")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Havuz boyutu")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="Görev başına satır sayısı")
+    parser.add_argument("--kinds", default="inline,thread,process", help="Virgülle ayrılmış yürütücü türleri")
+    parser.add_argument("--update", action="store_true", help="Okumaları istatistiklere ekle (worker yolu)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    rng = np.random.default_rng(42)
+    detector = AnomalyDetector()
+    warm_detector(detector, args.stations, rng)
+    batches = [generate_columns(args.readings, args.stations, rng) for _ in range(args.batches)]
+
+    print(f"Batch: {args.batches} x {args.readings} okuma, havuz: {args.workers}, CPU: {os.cpu_count()}")
+    for kind in args.kinds.split(","):
+        await run(kind, detector, batches, args.workers, args.chunk_rows, args.update)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
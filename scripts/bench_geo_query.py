@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+/api/air-quality/{latitude}/{longitude} sorgusunun koleksiyon boyutuna göre gecikmesini ölçer.
+
+Her boyut için ayrı bir deneme koleksiyonu sentetik verilerle doldurulur ve iki sorgu
+karşılaştırılır:
+  - eski:  sadece zaman aralığı + istemci tarafında mesafe filtresi
+  - yeni:  $geoWithin/$centerSphere + zaman aralığı, (location, timestamp) indeksiyle
+
+Kullanım:
+    MONGODB_URL=mongodb://localhost:27017 python scripts/bench_geo_query.py --sizes 10000 100000 1000000
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from pymongo import MongoClient, DESCENDING, GEOSPHERE
+
+MONGODB_URL = os.environ.get("MONGODB_URL", "mongodb://localhost:27017")
+MONGODB_DB_NAME = os.environ.get("MONGODB_DB_NAME", "air_quality_bench")
+EARTH_RADIUS_KM = 6378.1
+
+# Sorgu merkezi (İstanbul) ve veri üretim alanı (Türkiye ve çevresi)
+CENTER = (41.0082, 28.9784)
+LAT_RANGE = (36.0, 42.0)
+LON_RANGE = (26.0, 45.0)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """İki nokta arasındaki büyük çember mesafesi (km)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def populate(collection, size, batch_size=10000):
+    """Koleksiyonu son 7 güne yayılmış rastgele okumalarla doldurur."""
+    collection.drop()
+    now = datetime.utcnow()
+    for start in range(0, size, batch_size):
+        docs = []
+        for _ in range(min(batch_size, size - start)):
+            latitude = random.uniform(*LAT_RANGE)
+            longitude = random.uniform(*LON_RANGE)
+            docs.append({
+                "latitude": latitude,
+                "longitude": longitude,
+                "timestamp": now - timedelta(seconds=random.uniform(0, 7 * 86400)),
+                "pm25": random.uniform(5, 180),
+                "location": {"type": "Point", "coordinates": [longitude, latitude]},
+            })
+        collection.insert_many(docs, ordered=False)
+    collection.create_index([("location", GEOSPHERE), ("timestamp", DESCENDING)])
+    collection.create_index([("timestamp", DESCENDING)])
+
+
+def legacy_query(collection, radius_km, start_time, end_time, limit):
+    """Eski davranış: zamana göre tüm veriyi çek, mesafeyi istemcide filtrele."""
+    cursor = collection.find({"timestamp": {"$gte": start_time, "$lte": end_time}}).sort("timestamp", -1)
+    results = []
+    for doc in cursor:
+        if haversine_km(CENTER[0], CENTER[1], doc["latitude"], doc["longitude"]) <= radius_km:
+            results.append(doc)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def geo_query(collection, radius_km, start_time, end_time, limit):
+    """Yeni davranış: Database.get_air_quality_near ile aynı sorgu."""
+    query = {
+        "location": {"$geoWithin": {"$centerSphere": [[CENTER[1], CENTER[0]], radius_km / EARTH_RADIUS_KM]}},
+        "timestamp": {"$gte": start_time, "$lte": end_time},
+    }
+    return list(collection.find(query).sort("timestamp", -1).limit(limit))
+
+
+def measure(func, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konum sorgusu gecikme karşılaştırması")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Koleksiyon boyutları")
+    parser.add_argument("--radius", type=float, default=10.0, help="Arama yarıçapı (km)")
+    parser.add_argument("--limit", type=int, default=100, help="Maksimum sonuç sayısı")
+    parser.add_argument("--repeat", type=int, default=10, help="Tekrar sayısı")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGODB_URL)[MONGODB_DB_NAME]
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(days=1)
+
+    print(f"{'boyut':>10} {'eski (ms)':>12} {'yeni (ms)':>12} {'plan':>10}")
+    for size in args.sizes:
+        collection = db[f"bench_geo_{size}"]
+        populate(collection, size)
+
+        legacy_ms = measure(legacy_query, args.repeat, collection, args.radius, start_time, end_time, args.limit)
+        geo_ms = measure(geo_query, args.repeat, collection, args.radius, start_time, end_time, args.limit)
+
+        explain = collection.find({
+            "location": {"$geoWithin": {"$centerSphere": [[CENTER[1], CENTER[0]], args.radius / EARTH_RADIUS_KM]}},
+            "timestamp": {"$gte": start_time, "$lte": end_time},
+        }).sort("timestamp", -1).limit(args.limit).explain()
+        stage = explain["queryPlanner"]["winningPlan"].get("inputStage", {}).get("stage", "?")
+
+        print(f"{size:>10} {legacy_ms:>12.2f} {geo_ms:>12.2f} {stage:>10}")
+        collection.drop()
+
+
+if __name__ == "__main__":
+    main()
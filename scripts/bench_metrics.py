@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Worker yolundaki Prometheus ölçümünün maliyetini ölçer.
+
+Tek okumalık mesajlar için worker'ın süreç içi CPU işi (Pydantic modeli, Mongo dokümanı,
+sütunsal dönüşüm, detect_batch, anomali modelleri) ölçümsüz olarak zamanlanır ve aynı mesaj/batch/
+anomali sayılarıyla yapılan ölçüm çağrılarının (mesaj başına consume-to-ack gözlemi, batch başına
+Mongo yazma ve detector süreleri, anomali sayaçları) süresiyle karşılaştırılır. Broker ve
+veritabanı gidiş-dönüşleri dahil edilmez; bu yüzden oran gerçek orandan yüksektir.
+
+İz (tracing) maliyeti ayrıca, verilen örnekleme oranları için ölçülür: API'de başlığın üretilmesi
+ve worker'da mesaj başına başlığın çözülmesi, noktaların işaretlenmesi ve izin halka tampona
+eklenmesi.
+
+Kullanım:
+    python scripts/bench_metrics.py --messages 10000 --batch-size 200 --trace-rates 1.0 0.01
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+from app.models.air_quality import AirQualityData
+from app.services.anomaly_detection import AnomalyDetector, readings_to_columns
+from app.services.metrics import (
+    ANOMALIES_TOTAL, DETECTION_SECONDS, MONGO_INSERT_SECONDS, WORKER_CONSUME_TO_ACK_SECONDS
+)
+from app.services.tracing import TraceContext, Tracer
+from bench_detect_batch import warm_detector
+
+
+def generate_messages(count, stations, rng):
+    now = datetime.utcnow().isoformat()
+    return [
+        {
+            "latitude": 39.0 + station * 0.01,
+            "longitude": 32.0 + station * 0.01,
+            "timestamp": now,
+            "station_id": int(station),
+            "pm25": float(rng.gamma(2.0, 10.0)),
+            "pm10": float(rng.gamma(2.0, 20.0)),
+            "no2": float(rng.gamma(2.0, 20.0)),
+        }
+        for station in rng.integers(0, stations, size=count)
+    ]
+
+
+def worker_cpu(detector, messages, batch_size):
+    """Worker'ın ölçümsüz süreç içi işi; batch başına anomali listelerini döndürür."""
+    detect_batch = AnomalyDetector.detect_batch.__wrapped__
+    batches = []
+    for start in range(0, len(messages), batch_size):
+        readings = [AirQualityData(**item) for item in messages[start:start + batch_size]]
+        [reading.to_mongo_document() for reading in readings]
+        result = detect_batch(detector, readings_to_columns(readings))
+        batches.append([anomaly for found in result.to_anomalies(readings) for anomaly in found])
+    return batches
+
+
+def instrumentation(messages, batch_size, anomaly_batches):
+    """Aynı sayıda mesaj, batch ve anomali için worker'ın yaptığı ölçüm çağrıları."""
+    ack = WORKER_CONSUME_TO_ACK_SECONDS.labels(outcome="ack")
+    batch_histograms = [
+        MONGO_INSERT_SECONDS.labels(collection="air_quality_data", operation="insert_many"),
+        MONGO_INSERT_SECONDS.labels(collection="anomalies", operation="insert_many"),
+        DETECTION_SECONDS.labels(method="detect_batch_async"),
+    ]
+    for _ in range(messages):
+        received_at = time.perf_counter()
+        ack.observe(time.perf_counter() - received_at)
+    for _ in range(-(-messages // batch_size)):
+        for histogram in batch_histograms:
+            started = time.perf_counter()
+            histogram.observe(time.perf_counter() - started)
+    for anomalies in anomaly_batches:
+        for (parameter, severity), count in Counter((a.parameter, a.severity) for a in anomalies).items():
+            ANOMALIES_TOTAL.labels(parameter=parameter, severity=severity).inc(count)
+
+
+def tracing(messages, batch_size, sample_rate):
+    """Worker'ın _PendingMessage ve onay yolundaki iz işi; API'de başlık üretimi ayrı döndürülür."""
+    tracer = Tracer(sample_rate=sample_rate, buffer_size=1000)
+    started = time.perf_counter()
+    headers = [tracer.start_headers() for _ in range(messages)]
+    api = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for start in range(0, messages, batch_size):
+        traces = []
+        for message_headers in headers[start:start + batch_size]:
+            trace = TraceContext.from_headers(message_headers)
+            if trace is not None:
+                trace.mark("raw_queue")
+            traces.append(trace)
+        now = time.time()
+        hops = [(hop, now) for hop in ("buffer", "mongo", "rollups", "detection", "anomaly_store", "notify")]
+        for trace in traces:
+            if trace is not None:
+                trace.hops.extend(hops)
+                trace.mark("ack")
+                tracer.record(trace, "reading", batch_readings=batch_size)
+    return api, time.perf_counter() - started
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrik ölçümü maliyeti")
+    parser.add_argument("--messages", type=int, default=10000, help="Mesaj sayısı")
+    parser.add_argument("--batch-size", type=int, default=200, help="Worker mikro-batch boyutu")
+    parser.add_argument("--stations", type=int, default=200, help="İstasyon sayısı")
+    parser.add_argument("--repeat", type=int, default=5, help="Tekrar sayısı (medyan alınır)")
+    parser.add_argument("--trace-rates", type=float, nargs="+", default=[1.0, 0.01],
+                        help="Ölçülecek iz örnekleme oranları")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    rng = np.random.default_rng(42)
+    detector = AnomalyDetector()
+    warm_detector(detector, args.stations, rng)
+    messages = generate_messages(args.messages, args.stations, rng)
+
+    anomaly_batches = worker_cpu(detector, messages, args.batch_size)
+    anomalies = sum(len(batch) for batch in anomaly_batches)
+    work = measure(lambda: worker_cpu(detector, messages, args.batch_size), args.repeat)
+    overhead = measure(lambda: instrumentation(args.messages, args.batch_size, anomaly_batches), args.repeat)
+
+    per_message = overhead / args.messages * 1e6
+    print(f"{args.messages} mesaj, batch {args.batch_size}, {anomalies} anomali")
+    print(f"  worker süreç içi iş   {work / args.messages * 1e6:8.2f} µs/mesaj")
+    print(f"  ölçüm                 {per_message:8.2f} µs/mesaj ({overhead / work * 100:.2f}% ek yük)")
+    print(f"  10k mesaj/sn'de ölçümün tek çekirdekteki payı: {per_message * 10000 / 1e6 * 100:.2f}%")
+
+    for rate in args.trace_rates:
+        timings = [tracing(args.messages, args.batch_size, rate) for _ in range(args.repeat)]
+        api = statistics.median(api for api, _ in timings) / args.messages * 1e6
+        worker = statistics.median(worker for _, worker in timings)
+        print(
+            f"  {f'iz (oran {rate:g})':<22}{worker / args.messages * 1e6:8.2f} µs/mesaj worker "
+            f"({worker / work * 100:.2f}% ek yük), API'de {api:.2f} µs/yayın"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+ConfirmPublisher'ın onay penceresi boyutuna göre yayınlama hızını ölçer (msg/sn).
+
+Yerel bir RabbitMQ gerektirir. Ölçüm uygulamanın exchange'ine dokunmaz: geçici bir
+exchange ve ona bağlı, ölçüm sonunda silinen bir kuyruk kullanılır. Pencere 1 iken
+davranış eski publish() ile aynıdır (her mesajın onayı sırayla beklenir).
+
+Kullanım:
+    python scripts/bench_publish.py --messages 20000 --windows 1,8,32,128,512 --modes safety,throughput
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import orjson
+from aio_pika import connect_robust, ExchangeType
+from app.config import settings
+from app.services.rabbitmq import ConfirmPublisher
+
+BENCH_EXCHANGE = "bench_publish_exchange"
+BENCH_QUEUE = "bench_publish"
+
+
+async def run(mode, window, messages, concurrency, body, exchange, queue):
+    """Tek bir (mod, pencere) ölçümü; kuyruk her ölçümden önce boşaltılır."""
+    await queue.purge()
+    publisher = ConfirmPublisher(mode=mode, window=window)
+    publisher.exchange = exchange
+
+    async def producer(count):
+        for _ in range(count):
+            await publisher.publish("bench", publisher.message(body, content_type="application/json"))
+
+    per_producer = messages // concurrency
+    started = time.perf_counter()
+    await asyncio.gather(*(producer(per_producer) for _ in range(concurrency)))
+    await publisher.flush()
+    elapsed = time.perf_counter() - started
+
+    total = per_producer * concurrency
+    stats = publisher.get_stats()
+    print(
+        f"{mode:<10} pencere={window:<5} {total / elapsed:12,.0f} msg/sn "
+        f"(onay: {stats['confirmed']}, tekrar: {stats['retried']}, hata: {stats['failed']})"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Publisher confirm penceresi karşılaştırması")
+    parser.add_argument("--messages", type=int, default=20000, help="Ölçüm başına mesaj sayısı")
+    parser.add_argument("--windows", default="1,8,32,128,512", help="Virgülle ayrılmış pencere boyutları")
+    parser.add_argument("--modes", default="safety,throughput", help="Virgülle ayrılmış modlar")
+    parser.add_argument("--concurrency", type=int, default=64, help="Eşzamanlı üretici sayısı")
+    parser.add_argument("--size", type=int, default=300, help="Mesaj gövdesinin yaklaşık boyutu (bayt)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    body = orjson.dumps({"latitude": 41.0082, "longitude": 28.9784, "pm25": 12.5, "pad": "x" * max(0, args.size - 80)})
+
+    connection = await connect_robust(settings.RABBITMQ_URL)
+    try:
+        channel = await connection.channel(publisher_confirms=True, on_return_raises=True)
+        exchange = await channel.declare_exchange(BENCH_EXCHANGE, ExchangeType.TOPIC, auto_delete=True)
+        queue = await channel.declare_queue(BENCH_QUEUE, durable=True)
+        await queue.bind(exchange, "bench")
+
+        print(f"Mesaj: {args.messages}, boyut: {len(body)} bayt, üretici: {args.concurrency}")
+        for mode in args.modes.split(","):
+            for window in (int(value) for value in args.windows.split(",")):
+                await run(mode, window, args.messages, args.concurrency, body, exchange, queue)
+
+        await queue.delete(if_unused=False, if_empty=False)
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Büyük /api/air-quality yanıtlarının serileştirme süresini ölçer.
+
+Eski yol (route içinde ObjectId dönüşümü + jsonable_encoder + JSONResponse +
+custom_json_serializer middleware'inin loads/dumps/loads/dumps zinciri) ile
+MongoJSONResponse'un tek geçişli orjson yolu aynı dokümanlar üzerinde karşılaştırılır.
+
+Kullanım:
+    python scripts/bench_serialization.py --documents 10000 --repeat 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.utils.json_encoder import MongoJSONResponse
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    """Kaldırılan middleware'in kullandığı encoder."""
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def generate_documents(count):
+    """MongoDB'den dönen hava kalitesi dokümanlarına benzer örnekler üretir."""
+    now = datetime.utcnow()
+    docs = []
+    for i in range(count):
+        latitude = random.uniform(36, 42)
+        longitude = random.uniform(26, 45)
+        docs.append({
+            "_id": ObjectId(),
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": now - timedelta(seconds=i),
+            "pm25": random.uniform(5, 180),
+            "pm10": random.uniform(10, 200),
+            "no2": random.uniform(5, 100),
+            "so2": random.uniform(1, 50),
+            "o3": random.uniform(10, 120),
+            "source": "bench",
+            "city": "İstanbul",
+            "country": "Türkiye",
+            "location": {"type": "Point", "coordinates": [longitude, latitude]},
+        })
+    return docs
+
+
+def legacy_path(docs):
+    """Değişiklik öncesi yanıt üretim zinciri."""
+    results = [dict(doc, _id=str(doc["_id"])) for doc in docs]
+    response = JSONResponse(content=jsonable_encoder(results))
+    body_dict = json.loads(response.body)
+    json_compatible_body = json.dumps(body_dict, cls=LegacyJSONEncoder)
+    return JSONResponse(content=json.loads(json_compatible_body)).body
+
+
+def fast_path(docs):
+    """MongoJSONResponse ile tek geçişli serileştirme."""
+    return MongoJSONResponse(docs).body
+
+
+def measure(func, docs, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(docs)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yanıt serileştirme karşılaştırması")
+    parser.add_argument("--documents", type=int, default=10000, help="Yanıttaki doküman sayısı")
+    parser.add_argument("--repeat", type=int, default=20, help="Tekrar sayısı")
+    args = parser.parse_args()
+
+    docs = generate_documents(args.documents)
+    legacy_median, legacy_min = measure(legacy_path, docs, args.repeat)
+    fast_median, fast_min = measure(fast_path, docs, args.repeat)
+
+    print(f"Doküman sayısı: {args.documents}, tekrar: {args.repeat}")
+    print(f"Eski yol      : medyan {legacy_median:8.2f} ms, en iyi {legacy_min:8.2f} ms")
+    print(f"MongoJSON     : medyan {fast_median:8.2f} ms, en iyi {fast_min:8.2f} ms")
+    print(f"Hızlanma      : {legacy_median / fast_median:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
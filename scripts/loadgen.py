@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+"""
+Uçtan uca yük üreteci ve gecikme ölçümü (scripts/auto-test.sh'ın yerine).
+
+Çok istasyonlu okumaları /api/data'ya (ya da --batch-size > 1 ise /api/data/batch'e)
+gönderirken aynı anda /ws/anomalies'e abone olur ve şu aşamaların gecikmesini ölçer:
+
+  - ingest:     isteğin planlandığı an -> API'nin 201 yanıtı
+  - store:      okumanın gönderilmesi -> GET /api/air-quality ile okunabilir olması
+                (--store-sample oranında örneklenen okumalar için)
+  - anomaly_ws: enjekte edilen anomalili okumanın gönderilmesi -> anomali bildiriminin
+                WebSocket'ten gelmesi (ingest -> kuyruk -> worker -> kayıt -> bildirim)
+
+Her okumanın "source" alanı çalışmaya ve sıraya özgüdür (loadgen:<run_id>:<sıra>); WebSocket
+bildirimleri ve kayıtlar bu alanla okumaya eşlenir.
+
+Modlar:
+  - open:   Poisson varışlı açık döngü (--rate istek/sn). Gecikme, yanıt beklenirken biriken
+            isteklerin beklemesini de içerecek şekilde planlanan andan ölçülür.
+  - closed: --concurrency kadar kullanıcı, her biri yanıtı aldıktan sonra (--think-time
+            bekleyip) sıradaki isteği gönderir.
+
+Sonuçlar JSON olarak yazılır; --compare ile önceki bir çalışmayla karşılaştırılır.
+
+Kullanım:
+    python scripts/loadgen.py --mode open --rate 200 --duration 60 --stations 500 --anomaly-chance 5
+    python scripts/loadgen.py --mode closed --concurrency 32 --batch-size 100 --output run.json
+    python scripts/loadgen.py --mode open --rate 200 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+# Şehir merkezleri (scripts/add_real_city_data.py ile aynı şehirler)
+CITIES = [
+    ("İstanbul", 41.0082, 28.9784),
+    ("Ankara", 39.9334, 32.8597),
+    ("Niğde", 37.9667, 34.6792),
+    ("Yalova", 40.6500, 29.2667),
+    ("Kütahya", 39.4200, 29.9833),
+    ("Erzurum", 39.9054, 41.2658),
+    ("Rize", 41.0201, 40.5234),
+    ("Mardin", 37.3212, 40.7245),
+    ("Kocaeli", 40.7667, 29.9167),
+]
+
+# Normal okumaların değer aralıkları (WHO eşiklerinin altında)
+NORMAL_RANGES = {
+    "pm25": (5, 20),
+    "pm10": (10, 40),
+    "no2": (10, 60),
+    "so2": (2, 25),
+    "o3": (20, 80),
+}
+
+# Sunucunun varsayılan eşikleri (THRESHOLD_*); enjekte edilen değerler bunların katlarıdır
+THRESHOLDS = {"pm25": 25, "pm10": 50, "no2": 200, "so2": 500, "o3": 100}
+ANOMALY_MULTIPLIER = (2, 5)
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """Gecikme örneklerinin (saniye) özetini milisaniye cinsinden döndürür."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def make_stations(count: int, rng: random.Random) -> List[Tuple[str, float, float]]:
+    """Şehirlerin çevresine dağılmış sabit koordinatlı istasyonlar üretir."""
+    stations = []
+    for index in range(count):
+        city, lat, lon = CITIES[index % len(CITIES)]
+        # ~20 km'lik alan; istasyonlar STATION_SNAP_RADIUS_M'den uzak düşer
+        stations.append((city, round(lat + rng.uniform(-0.2, 0.2), 5), round(lon + rng.uniform(-0.2, 0.2), 5)))
+    return stations
+
+
+def reading_source(message: Dict[str, Any]) -> Optional[str]:
+    """new_anomaly WebSocket mesajından anomalinin okumasının source alanını çıkarır."""
+    payload = message.get("data")
+    # Worker bildirimi anomali dokümanını "data" alanında taşır
+    anomaly = payload.get("data") if isinstance(payload, dict) and isinstance(payload.get("data"), dict) else payload
+    if not isinstance(anomaly, dict):
+        return None
+    reading = anomaly.get("data")
+    return reading.get("source") if isinstance(reading, dict) else None
+
+
+class LoadGenerator:
+    """Trafiği üretir, bildirimleri dinler ve ölçümleri toplar."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:8]
+        self.rng = random.Random(args.seed)
+        self.stations = make_stations(args.stations, self.rng)
+        self.seq = 0
+
+        # source -> gönderim anı; anomali beklenen okumalar için
+        self.pending_anomalies: Dict[str, float] = {}
+        self.matched: set = set()
+        self.inflight = 0
+        self.probes: List[asyncio.Task] = []
+
+        self.latency: Dict[str, List[float]] = {"ingest": [], "store": [], "anomaly_ws": []}
+        self.counts = {
+            "requests_sent": 0, "requests_ok": 0, "requests_failed": 0, "requests_skipped": 0,
+            "readings_sent": 0, "readings_accepted": 0, "anomalies_injected": 0,
+            "ws_messages": 0, "ws_anomalies_matched": 0, "ws_anomalies_unexpected": 0,
+            "store_probes": 0, "store_probes_missed": 0,
+        }
+        self.errors: Dict[str, int] = {}
+        self.ws_ready = asyncio.Event()
+
+    def _reading(self) -> Tuple[Dict[str, Any], bool]:
+        city, lat, lon = self.rng.choice(self.stations)
+        self.seq += 1
+        reading = {
+            "latitude": lat,
+            "longitude": lon,
+            "timestamp": datetime.utcnow().isoformat(),
+            "city": city,
+            "country": "Türkiye",
+            "source": f"loadgen:{self.run_id}:{self.seq}",
+        }
+        for parameter, (low, high) in NORMAL_RANGES.items():
+            reading[parameter] = round(self.rng.uniform(low, high), 2)
+
+        inject = self.rng.random() * 100 < self.args.anomaly_chance
+        if inject:
+            parameter = self.rng.choice(list(THRESHOLDS))
+            reading[parameter] = round(THRESHOLDS[parameter] * self.rng.uniform(*ANOMALY_MULTIPLIER), 2)
+        return reading, inject
+
+    def _error(self, key: str):
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    async def send(self, client: httpx.AsyncClient, scheduled: float):
+        """
+        Tek bir isteği (tek okuma ya da batch) gönderir ve ingest gecikmesini kaydeder.
+
+        Args:
+            client (httpx.AsyncClient): HTTP istemcisi
+            scheduled (float): İsteğin planlandığı an (perf_counter)
+        """
+        readings = [self._reading() for _ in range(self.args.batch_size)]
+        sent_at = time.perf_counter()
+        for reading, inject in readings:
+            if inject:
+                self.pending_anomalies[reading["source"]] = sent_at
+        self.counts["anomalies_injected"] += sum(1 for _, inject in readings if inject)
+        self.counts["readings_sent"] += len(readings)
+        self.counts["requests_sent"] += 1
+
+        self.inflight += 1
+        try:
+            if self.args.batch_size == 1:
+                response = await client.post("/api/data", json=readings[0][0])
+            else:
+                response = await client.post("/api/data/batch", json=[reading for reading, _ in readings])
+        except httpx.HTTPError as e:
+            self._failed(readings, type(e).__name__)
+            return
+        finally:
+            self.inflight -= 1
+
+        if response.status_code != 201:
+            self._failed(readings, f"http_{response.status_code}")
+            return
+
+        self.latency["ingest"].append(time.perf_counter() - scheduled)
+        self.counts["requests_ok"] += 1
+        accepted = response.json().get("accepted", 1) if self.args.batch_size > 1 else 1
+        self.counts["readings_accepted"] += accepted
+
+        for reading, _ in readings:
+            if self.rng.random() < self.args.store_sample:
+                self.probes.append(asyncio.create_task(self.probe_store(client, reading, sent_at)))
+
+    def _failed(self, readings, reason: str):
+        self.counts["requests_failed"] += 1
+        self._error(reason)
+        for reading, _ in readings:
+            self.pending_anomalies.pop(reading["source"], None)
+
+    async def probe_store(self, client: httpx.AsyncClient, reading: Dict[str, Any], sent_at: float):
+        """Okuma konum sorgusunda görünene kadar yoklar ve store gecikmesini kaydeder."""
+        self.counts["store_probes"] += 1
+        deadline = sent_at + self.args.duration + self.args.drain
+        url = f"/api/air-quality/{reading['latitude']}/{reading['longitude']}"
+        params = {"radius": 0.05, "limit": 50}
+        while time.perf_counter() < deadline:
+            try:
+                response = await client.get(url, params=params)
+                if response.status_code == 200 and any(
+                    item.get("source") == reading["source"] for item in response.json()
+                ):
+                    self.latency["store"].append(time.perf_counter() - sent_at)
+                    return
+            except httpx.HTTPError as e:
+                self._error(f"store_{type(e).__name__}")
+            await asyncio.sleep(self.args.probe_interval)
+        self.counts["store_probes_missed"] += 1
+
+    async def listen(self, ws_url: str):
+        """/ws/anomalies bildirimlerini dinler ve enjekte edilen okumalarla eşler."""
+        async with websockets.connect(f"{ws_url}/ws/anomalies", max_size=None) as websocket:
+            self.ws_ready.set()
+            prefix = f"loadgen:{self.run_id}:"
+            async for raw in websocket:
+                received_at = time.perf_counter()
+                self.counts["ws_messages"] += 1
+                message = json.loads(raw)
+                if message.get("type") != "new_anomaly":
+                    continue
+                source = reading_source(message)
+                if not source or not source.startswith(prefix):
+                    continue
+                # Okuma başına ilk bildirim sayılır (aynı okuma birden fazla anomali üretebilir)
+                if source in self.matched:
+                    continue
+                self.matched.add(source)
+                sent_at = self.pending_anomalies.pop(source, None)
+                if sent_at is not None:
+                    self.latency["anomaly_ws"].append(received_at - sent_at)
+                    self.counts["ws_anomalies_matched"] += 1
+                else:
+                    # Enjekte edilmemiş okumada anomali (ör. tarihsel yöntemle tespit)
+                    self.counts["ws_anomalies_unexpected"] += 1
+
+    async def open_loop(self, client: httpx.AsyncClient, end: float):
+        """Poisson varışlı açık döngü; --max-inflight aşılırsa istek atlanır ve sayılır."""
+        tasks = set()
+        scheduled = time.perf_counter()
+        while True:
+            scheduled += self.rng.expovariate(self.args.rate)
+            if scheduled >= end:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            if self.inflight >= self.args.max_inflight:
+                self.counts["requests_skipped"] += 1
+                continue
+            task = asyncio.create_task(self.send(client, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def closed_loop(self, client: httpx.AsyncClient, end: float):
+        """--concurrency kullanıcılı kapalı döngü."""
+        async def user():
+            while time.perf_counter() < end:
+                await self.send(client, time.perf_counter())
+                if self.args.think_time:
+                    await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+
+    async def run(self) -> Dict[str, Any]:
+        args = self.args
+        ws_url = args.ws_url or args.url.replace("http", "ws", 1)
+        listener = asyncio.create_task(self.listen(ws_url))
+        try:
+            await asyncio.wait_for(self.ws_ready.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            listener.cancel()
+            raise SystemExit(f"WebSocket bağlantısı kurulamadı: {ws_url}/ws/anomalies")
+
+        connections = args.max_inflight if args.mode == "open" else args.concurrency
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            end = started + args.duration
+            if args.mode == "open":
+                await self.open_loop(client, end)
+            else:
+                await self.closed_loop(client, end)
+            elapsed = time.perf_counter() - started
+
+            # Bekleyen bildirimler ve kayıt yoklamaları için süre tanı
+            drain_end = time.perf_counter() + args.drain
+            while self.pending_anomalies and time.perf_counter() < drain_end:
+                await asyncio.sleep(0.1)
+            if self.probes:
+                await asyncio.wait(self.probes, timeout=max(0.0, drain_end - time.perf_counter()))
+                for probe in self.probes:
+                    probe.cancel()
+
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+        injected = self.counts["anomalies_injected"]
+        return {
+            "run_id": self.run_id,
+            "started_at": started_at.isoformat(),
+            "elapsed_sec": round(elapsed, 3),
+            "config": vars(args),
+            "counts": self.counts,
+            "errors": self.errors,
+            "throughput": {
+                "requests_per_sec": round(self.counts["requests_ok"] / elapsed, 2),
+                "readings_per_sec": round(self.counts["readings_accepted"] / elapsed, 2),
+            },
+            "latency_ms": {stage: percentiles(samples) for stage, samples in self.latency.items()},
+            "anomaly_delivery_ratio": round(self.counts["ws_anomalies_matched"] / injected, 4) if injected else None,
+        }
+
+
+def print_summary(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Sonucu, verilirse önceki çalışmaya göre farklarıyla yazdırır."""
+    def delta(current, previous):
+        if previous in (None, 0) or current is None:
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    base_throughput = baseline["throughput"] if baseline else {}
+    print(f"Çalışma {result['run_id']} ({result['config']['mode']}, {result['elapsed_sec']} sn)")
+    for key, value in result["throughput"].items():
+        print(f"  {key:<18}{value:12,.1f}{delta(value, base_throughput.get(key))}")
+
+    for stage, summary in result["latency_ms"].items():
+        if not summary["count"]:
+            print(f"  {stage:<12} örnek yok")
+            continue
+        base = baseline["latency_ms"].get(stage, {}) if baseline else {}
+        parts = [f"{p} {summary[p]:9.1f} ms{delta(summary[p], base.get(p))}" for p in ("p50", "p95", "p99")]
+        print(f"  {stage:<12} n={summary['count']:<7} " + "  ".join(parts))
+
+    print(f"  anomali teslim oranı: {result['anomaly_delivery_ratio']}, hatalar: {result['errors'] or 'yok'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uçtan uca yük üreteci")
+    parser.add_argument("--url", default="http://localhost:8000", help="API adresi")
+    parser.add_argument("--ws-url", default=None, help="WebSocket adresi (varsayılan: --url'den türetilir)")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open", help="Açık (Poisson) ya da kapalı döngü")
+    parser.add_argument("--duration", type=float, default=60, help="Yük süresi (saniye)")
+    parser.add_argument("--rate", type=float, default=50, help="Açık döngüde ortalama istek/sn")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Açık döngüde en fazla bekleyen istek")
+    parser.add_argument("--concurrency", type=int, default=16, help="Kapalı döngüde kullanıcı sayısı")
+    parser.add_argument("--think-time", type=float, default=0, help="Kapalı döngüde istekler arası ortalama bekleme (saniye)")
+    parser.add_argument("--batch-size", type=int, default=1, help="İstek başına okuma (>1 ise /api/data/batch)")
+    parser.add_argument("--stations", type=int, default=100, help="İstasyon sayısı")
+    parser.add_argument("--anomaly-chance", type=float, default=10, help="Anomali enjekte edilen okuma yüzdesi (0-100)")
+    parser.add_argument("--store-sample", type=float, default=0.01, help="Kayıt gecikmesi yoklanan okuma oranı (0-1)")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Kayıt yoklama aralığı (saniye)")
+    parser.add_argument("--drain", type=float, default=10, help="Yük bittikten sonra bildirimler için bekleme (saniye)")
+    parser.add_argument("--timeout", type=float, default=30, help="HTTP istek zaman aşımı (saniye)")
+    parser.add_argument("--seed", type=int, default=None, help="Rastgele üreteç tohumu")
+    parser.add_argument("--output", default=None, help="Sonuç dosyası (varsayılan: loadgen-<run_id>.json)")
+    parser.add_argument("--compare", default=None, help="Karşılaştırılacak önceki sonuç dosyası")
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size en az 1 olmalı")
+
+    result = asyncio.run(LoadGenerator(args).run())
+
+    output = args.output or f"loadgen-{result['run_id']}.json"
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    print_summary(result, baseline)
+    print(f"Sonuç yazıldı: {output}")
+
+
+if __name__ == "__main__":
+    main()
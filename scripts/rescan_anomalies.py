@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Saklanan okumaları belirli bir zaman aralığı için yeniden tarayıp anomalileri yeniden hesaplar.
+
+THRESHOLD_* ayarları ya da şiddet seviyeleri değiştiğinde geçmişi yeniden değerlendirmek için
+kullanılır. İstasyonlar station_id'ye göre ardışık N aralığa bölünür; her süreç kendi aralığını
+{station_id, timestamp} indeksi sırasıyla (istasyon başına zaman sırası) batch'li bir cursor ile
+okur, AnomalyDetector.detect_batch ile parçalar halinde değerlendirir ve sonuçları toplu upsert'lerle
+yazar. Kayan istatistikler istasyon başına tutulduğu için istasyonlar arası sıra önemsizdir; zaman
+dilimlerine bölmek ise her dilimin önceki dilimlerin istatistiklerini görmemesi demek olurdu.
+
+Yazma idempotenttir: anomaliler (reading_id, parameter, detection_method) ile anahtarlanır ve
+aynı okuma için bu çalıştırmada üretilmeyen eski anomaliler silinir. Betik aynı aralık için
+tekrar çalıştırıldığında aynı sonucu üretir. Yeniden taranan anomalilerin detected_at değeri
+okumanın zamanıdır, böylece "son anomaliler" listeleri geçmiş anomalilerle dolmaz.
+
+reading_id alanı eklenmeden önce worker'ın yazdığı anomaliler okumalarına bağlanamaz. Tarama
+başlamadan önce, okuma zamanı (data.timestamp) aralıkta olan reading_id'siz anomaliler silinir;
+aksi halde ilk yeniden taramada bu okumaların anomalileri ikiye katlanırdı. Aralıktaki tüm
+okumalar yeniden tarandığı için silinen her anomalinin yerine (hâlâ geçerliyse) yenisi yazılır.
+--keep-legacy bu adımı atlar; --dry-run sadece silinecek anomalileri sayar.
+
+station_id'si olmayan eski okumalar 0 numaralı sürece düşer. Bölümlerin dayandığı
+station_id_1_timestamp_1 indeksi yoksa betik onu oluşturur.
+
+Kullanım:
+    THRESHOLD_PM25=35 python scripts/rescan_anomalies.py --start 2026-09-01 --end 2026-10-01 --workers 8
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+from pymongo import ReplaceOne, DeleteMany, ASCENDING
+from app.config import settings
+from app.models.air_quality import AirQualityData, station_key_of
+from app.services.anomaly_detection import AnomalyDetector
+from app.services.indexes import INDEX_SPECS
+from app.services.rolling_stats import PARAMETERS, to_naive_utc
+from app.utils.database import bulk_write, get_sync_database
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+PROJECTION = {"meta": 0, "location": 0}
+# Bölüm cursor'larının sırası; station_id_1_timestamp_1 indeksinden okunur
+PARTITION_SORT = [("station_id", ASCENDING), ("timestamp", ASCENDING)]
+PARTITION_INDEX = "station_id_1_timestamp_1"
+
+
+class LazyReadings:
+    """Dokümanlardan AirQualityData modelini sadece istenen satırlar için üreten dizi görünümü."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._models = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __getitem__(self, index):
+        model = self._models.get(index)
+        if model is None:
+            doc = {k: v for k, v in self.docs[index].items() if k != "_id"}
+            model = self._models[index] = AirQualityData(**doc)
+        return model
+
+
+def to_columns(docs):
+    """Ham dokümanları detect_batch'in sütunsal biçimine çevirir."""
+    columns = {
+        parameter: np.array([doc.get(parameter, np.nan) for doc in docs], dtype=np.float64)
+        for parameter in PARAMETERS
+    }
+    stations = np.empty(len(docs), dtype=object)
+    stations[:] = [station_key_of(doc) for doc in docs]
+    columns["station"] = stations
+    columns["timestamp"] = np.array([to_naive_utc(doc["timestamp"]) for doc in docs], dtype="datetime64[us]")
+    return columns
+
+
+def station_ranges(database, workers):
+    """
+    İstasyon kimliklerini istasyon sayısı dengeli, ardışık en fazla workers aralığa böler.
+
+    distinct, station_id_1_timestamp_1 indeksinin önekinden okunur.
+
+    Returns:
+        list: (ilk, son) station_id çiftleri; hiç istasyon yoksa boş
+    """
+    stations = sorted(s for s in database.air_quality_data.distinct("station_id") if isinstance(s, int))
+    if not stations:
+        return []
+    workers = min(workers, len(stations))
+    bounds = [len(stations) * i // workers for i in range(workers + 1)]
+    return [(stations[bounds[i]], stations[bounds[i + 1] - 1]) for i in range(workers)]
+
+
+def partition_query(index, ranges, start, end):
+    """Sürecin istasyon aralığını seçen sorgu; station_id'si olmayan okumalar 0. bölüme düşer."""
+    timestamp = {"$gte": start, "$lt": end}
+    without_station = {"station_id": None, "timestamp": timestamp}
+    if not ranges:
+        return without_station
+    first, last = ranges[index]
+    query = {"station_id": {"$gte": first, "$lte": last}, "timestamp": timestamp}
+    if index == 0:
+        query = {"$or": [query, without_station]}
+    return query
+
+
+def delete_legacy_anomalies(database, start, end, dry_run=False):
+    """
+    Okuma zamanı aralıkta olan, reading_id'siz (yeniden taramalarla eşleşmeyen) eski anomalileri siler.
+
+    Worker anomaliyi okumadan sonra yazdığı için detected_at >= okuma zamanıdır; bu koşul
+    sorgunun detected_at indeksini kullanmasını sağlar.
+
+    Returns:
+        int: Silinen (dry_run ise silinecek) anomali sayısı
+    """
+    query = {
+        "reading_id": {"$exists": False},
+        "detected_at": {"$gte": start},
+        "data.timestamp": {"$gte": start, "$lt": end}
+    }
+    if dry_run:
+        return database.anomalies.count_documents(query)
+    return database.anomalies.delete_many(query).deleted_count
+
+
+def write_chunk(database, docs, anomalies_by_reading, run_id):
+    """Bir parçanın anomalilerini upsert eder ve aynı okumaların eski anomalilerini siler."""
+    operations = []
+    for doc, anomalies in zip(docs, anomalies_by_reading):
+        for anomaly in anomalies:
+            anomaly_doc = anomaly.to_mongo_document()
+            anomaly_doc.update(reading_id=doc["_id"], detected_at=doc["timestamp"], rescan_id=run_id)
+            key = {"reading_id": doc["_id"], "parameter": anomaly.parameter, "detection_method": anomaly.detection_method}
+            operations.append(ReplaceOne(key, anomaly_doc, upsert=True))
+    operations.append(DeleteMany({
+        "reading_id": {"$in": [doc["_id"] for doc in docs]},
+        "rescan_id": {"$ne": run_id}
+    }))
+    # Sıralı yazma: bir upsert başarısız olursa bu okumaların eski anomalileri silinmez
+    counts = bulk_write(database.anomalies, operations, ordered=True)
+    return counts["upserted"] + counts["modified"], counts["deleted"]
+
+
+def scan_partition(index, ranges, args, run_id):
+    """Tek bir sürecin istasyon bölümünü tarar; sayaçları döndürür."""
+    logging.disable(logging.WARNING)  # Anomali başına uyarı logları taramayı yavaşlatır
+    # Her süreç kendi istemcisini oluşturur (istemciler süreç kimliğine göre önbelleğe alınır)
+    database = get_sync_database()
+    detector = AnomalyDetector()
+    started = time.perf_counter()
+
+    # Aralığın başındaki istatistikleri oluşturmak için önceki günleri istatistiklere ekle
+    if args.historical and args.warmup_days > 0:
+        warmup_start = args.start - timedelta(days=args.warmup_days)
+        query = partition_query(index, ranges, warmup_start, args.start)
+        for doc in database.air_quality_data.find(query, PROJECTION).sort(PARTITION_SORT).batch_size(args.batch_size):
+            detector.stats.add_document(doc)
+
+    readings = anomalies = written = deleted = 0
+    query = partition_query(index, ranges, args.start, args.end)
+    cursor = database.air_quality_data.find(query, PROJECTION).sort(PARTITION_SORT).batch_size(args.batch_size)
+
+    def flush(docs):
+        nonlocal anomalies, written, deleted
+        result = detector.detect_batch(to_columns(docs), historical=args.historical, update=args.historical)
+        anomalies += result.anomaly_count
+        if args.dry_run:
+            return
+        upserted, removed = write_chunk(database, docs, result.to_anomalies(LazyReadings(docs)), run_id)
+        written += upserted
+        deleted += removed
+
+    chunk = []
+    for doc in cursor:
+        chunk.append(doc)
+        readings += 1
+        if len(chunk) >= args.chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return {
+        "partition": index,
+        "readings": readings,
+        "anomalies": anomalies,
+        "written": written,
+        "deleted": deleted,
+        "seconds": time.perf_counter() - started
+    }
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saklanan okumalarda anomalileri yeniden hesaplar")
+    parser.add_argument("--start", type=parse_time, required=True, help="Başlangıç zamanı (ISO, UTC)")
+    parser.add_argument("--end", type=parse_time, default=datetime.utcnow(), help="Bitiş zamanı (ISO, UTC)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Süreç sayısı")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Cursor batch boyutu")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Tek detect_batch çağrısındaki okuma sayısı")
+    parser.add_argument("--warmup-days", type=int, default=settings.ROLLING_STATS_WARMUP_DAYS,
+                        help="Tarihsel istatistikler için aralıktan önce okunacak gün sayısı")
+    parser.add_argument("--no-historical", dest="historical", action="store_false",
+                        help="Sadece eşik kontrolü yap")
+    parser.add_argument("--keep-legacy", action="store_true",
+                        help="reading_id'siz eski anomalileri silme (ilk taramada anomaliler ikiye katlanır)")
+    parser.add_argument("--dry-run", action="store_true", help="Anomalileri yazmadan sadece say")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex
+    database = get_sync_database()
+    spec = next(spec for spec in INDEX_SPECS if spec.name == PARTITION_INDEX)
+    database.air_quality_data.create_indexes([spec.to_index_model()])
+    ranges = station_ranges(database, args.workers)
+    partitions = max(1, len(ranges))
+    logger.info(
+        f"Yeniden tarama başlıyor: {args.start.isoformat()} - {args.end.isoformat()}, "
+        f"{partitions} süreç, çalıştırma {run_id}"
+    )
+
+    started = time.perf_counter()
+    totals = {"readings": 0, "anomalies": 0, "written": 0, "deleted": 0}
+    if not args.keep_legacy:
+        legacy = delete_legacy_anomalies(database, args.start, args.end, args.dry_run)
+        logger.info(f"reading_id'siz eski anomali: {legacy} {'silinecek' if args.dry_run else 'silindi'}")
+        if not args.dry_run:
+            totals["deleted"] += legacy
+
+    with ProcessPoolExecutor(max_workers=partitions) as executor:
+        futures = [executor.submit(scan_partition, index, ranges, args, run_id) for index in range(partitions)]
+        for future in as_completed(futures):
+            result = future.result()
+            for key in totals:
+                totals[key] += result[key]
+            logger.info(
+                f"Bölüm {result['partition']}: {result['readings']} okuma, {result['anomalies']} anomali, "
+                f"{result['seconds']:.1f} sn ({result['readings'] / max(result['seconds'], 1e-9):,.0f} okuma/sn)"
+            )
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Tamamlandı: {totals['readings']} okuma, {totals['anomalies']} anomali, "
+        f"{totals['written']} yazılan, {totals['deleted']} silinen eski anomali, {elapsed:.1f} sn "
+        f"({totals['readings'] / max(elapsed, 1e-9):,.0f} okuma/sn)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+AnomalyDetector.detect_batch'in okuma başına yolla (check_threshold_anomaly +
+check_historical_anomaly) aynı anomalileri ürettiğini doğrular.
+
+Veritabanı gerektirmez; kayan istatistikler sabit tohumla bellekte doldurulur. Eksik
+değerler (NaN), saatlik pencerenin kullanılmadığı istasyonlar, az verili ve sabit değerli
+istasyonlar da batch'te yer alır.
+
+Kullanım:
+    python -m pytest test_detect_batch.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.models.air_quality import AirQualityData
+from app.services.anomaly_detection import AnomalyDetector, readings_to_columns
+from app.services.rolling_stats import PARAMETERS
+
+# Geçmişin bittiği an; okumalar bundan sonraki 24 saate yayılır
+HISTORY_END = datetime(2024, 3, 1, 0, 0)
+
+
+def seed_history(detector, rng):
+    """
+    İstasyon türlerine göre geçmiş istatistik üretir.
+
+    0-5: 10 gün saatlik geçmiş (saatlik pencere kullanılır)
+    6-9: 30 okumalık geçmiş, çoğu gece 00-02 arası, 3'ü 12:00'de (saatlik pencerede 5'ten az
+         veri olan saatlerde genel Z-score'a düşülür)
+    10: 10 okuma (tarihsel kontrol için yetersiz)
+    11: sabit değerler (standart sapma sıfır)
+    12-13: sadece pm25 ve no2 geçmişi (diğer parametreler boş)
+    """
+    for station in range(6):
+        for i in range(240):
+            timestamp = HISTORY_END - timedelta(hours=240 - i)
+            for parameter in PARAMETERS:
+                detector.stats.add(station, parameter, float(rng.gamma(4.0, 8.0)), timestamp)
+    for station in range(6, 10):
+        for i in range(30):
+            hour = 12 if i >= 27 else i % 3
+            timestamp = HISTORY_END - timedelta(days=10 - i // 3) + timedelta(hours=hour)
+            for parameter in PARAMETERS:
+                detector.stats.add(station, parameter, float(rng.gamma(4.0, 8.0)), timestamp)
+    for i in range(10):
+        for parameter in PARAMETERS:
+            detector.stats.add(10, parameter, float(rng.gamma(4.0, 8.0)), HISTORY_END - timedelta(hours=10 - i))
+    for i in range(40):
+        for parameter in PARAMETERS:
+            detector.stats.add(11, parameter, 20.0, HISTORY_END - timedelta(hours=40 - i))
+    for station in (12, 13):
+        for i in range(60):
+            timestamp = HISTORY_END - timedelta(hours=60 - i)
+            for parameter in ("pm25", "no2"):
+                detector.stats.add(station, parameter, float(rng.gamma(4.0, 8.0)), timestamp)
+
+
+def sample_batch(rng):
+    """
+    İstasyon başına 1-3 okuma üretir; okumaların ~%15'i eksik (NaN), ~%10'u ani yükselmedir.
+
+    detect_batch hareketli ortalamayı istasyonun batch'teki en yeni okuma zamanına göre
+    hesapladığından bir istasyonun okumaları aynı zaman damgasını taşır.
+    """
+    readings = []
+    for station in range(14):
+        timestamp = HISTORY_END + timedelta(hours=int(rng.integers(0, 24)), minutes=int(rng.integers(0, 60)))
+        for _ in range(int(rng.integers(1, 4))):
+            values = {}
+            for parameter in PARAMETERS:
+                if rng.random() < 0.15:
+                    continue
+                value = float(rng.gamma(4.0, 8.0))
+                if rng.random() < 0.1:
+                    value *= 4
+                values[parameter] = round(value, 1)
+            readings.append(AirQualityData(
+                latitude=41.0 + station * 0.1, longitude=29.0, timestamp=timestamp, station_id=station, **values
+            ))
+    return readings
+
+
+def anomaly_key(anomaly):
+    return (anomaly.parameter, anomaly.detection_method, anomaly.severity, anomaly.actual_value)
+
+
+async def per_reading(detector, readings):
+    """Okuma başına yolun anomalileri; istatistikler güncellenmez (batch başı istatistikler)."""
+    result = []
+    for reading in readings:
+        threshold = await detector.check_threshold_anomaly(reading) or []
+        historical = await detector.check_historical_anomaly(reading, update=False) or []
+        result.append(threshold + historical)
+    return result
+
+
+@pytest.mark.parametrize("seed", [7, 42, 2024])
+def test_detect_batch_matches_per_reading(seed):
+    rng = np.random.default_rng(seed)
+    detector = AnomalyDetector()
+    seed_history(detector, rng)
+    readings = sample_batch(rng)
+
+    expected = asyncio.run(per_reading(detector, readings))
+    result = detector.detect_batch(readings_to_columns(readings))
+    actual = result.to_anomalies(readings)
+
+    assert len(actual) == len(expected)
+    for reading, batch_anomalies, single_anomalies in zip(readings, actual, expected):
+        assert sorted(map(anomaly_key, batch_anomalies)) == sorted(map(anomaly_key, single_anomalies)), reading
+        batch_thresholds = {(a.parameter, a.detection_method): a.threshold for a in batch_anomalies}
+        for anomaly in single_anomalies:
+            assert batch_thresholds[(anomaly.parameter, anomaly.detection_method)] == pytest.approx(anomaly.threshold)
+
+    # Karşılaştırma boş geçmesin: her iki kontrol türü de anomali üretmiş olmalı
+    methods = {anomaly.detection_method for anomalies in expected for anomaly in anomalies}
+    assert "threshold" in methods
+    assert methods - {"threshold"}
+    assert np.isnan(result.values).any()
+
+
+def test_hourly_filter_falls_back_to_overall_z_score():
+    rng = np.random.default_rng(1)
+    detector = AnomalyDetector()
+    seed_history(detector, rng)
+
+    # 6-9 numaralı istasyonların 12:00 penceresinde 5'ten az veri var; 0-5'inkinde yeterli
+    stats = detector.stats.get(6, "pm25")
+    assert 0 < stats.hourly_window(12, margin=1).count < 5
+    assert stats.hourly_window(12, margin=1).std > 0
+    assert detector.stats.get(0, "pm25").hourly_window(12, margin=1).count >= 5
+
+    timestamp = HISTORY_END + timedelta(hours=12)
+    readings = [
+        AirQualityData(latitude=41.0, longitude=29.0, timestamp=timestamp, station_id=station,
+                       pm25=stats.overall.mean + 3.2 * stats.overall.std)
+        for station in (0, 6)
+    ]
+    result = detector.detect_batch(readings_to_columns(readings))
+    column = result.parameters.index("pm25")
+
+    # Saatlik pencerede yeterli veri yoksa birleşik Z-score genel Z-score'dur
+    expected_z = (readings[1].pm25 - stats.overall.mean) / stats.overall.std
+    assert result.z_scores[1, column] == pytest.approx(expected_z)
+
+    expected = asyncio.run(per_reading(detector, readings))
+    actual = result.to_anomalies(readings)
+    for batch_anomalies, single_anomalies in zip(actual, expected):
+        assert sorted(map(anomaly_key, batch_anomalies)) == sorted(map(anomaly_key, single_anomalies))
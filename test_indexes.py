@@ -0,0 +1,103 @@
+"""
+İndeks yöneticisinin tanımladığı indekslerin sıcak sorgular tarafından kullanıldığını explain() ile doğrular.
+
+Çalışan bir MongoDB gerektirir (MONGODB_URL); bağlanılamazsa testler atlanır.
+
+Kullanım:
+    MONGODB_URL=mongodb://localhost:27017 python -m pytest test_indexes.py
+"""
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from app.services.database import with_meta
+from app.services.indexes import POLLUTANTS, index_manager, query_shapes
+
+MONGODB_URL = os.environ.get("MONGODB_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = "air_quality_index_test"
+
+
+def mongodb_available():
+    try:
+        MongoClient(MONGODB_URL, serverSelectionTimeoutMS=2000).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not mongodb_available(), reason="MongoDB'ye bağlanılamadı")
+
+
+def sample_readings(count=2000):
+    """Son 2 güne yayılmış, her okumada parametrelerin bir kısmı olan örnek veriler."""
+    now = datetime.utcnow()
+    readings = []
+    for _ in range(count):
+        latitude, longitude = random.uniform(36, 42), random.uniform(26, 45)
+        doc = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "timestamp": now - timedelta(seconds=random.uniform(0, 2 * 86400)),
+            "location": {"type": "Point", "coordinates": [longitude, latitude]},
+            "city": "Test"
+        }
+        for parameter in random.sample(POLLUTANTS, 2):
+            doc[parameter] = random.uniform(0, 200)
+        readings.append(with_meta(doc))
+    return readings
+
+
+async def build_report():
+    client = AsyncIOMotorClient(MONGODB_URL)
+    database = client[TEST_DB_NAME]
+    try:
+        await client.drop_database(TEST_DB_NAME)
+        await database.air_quality_data.insert_many(sample_readings())
+        # Eski şemadaki hatalı indeks kaldırılmalı
+        await database.air_quality_data.create_index([("parameter", 1), ("timestamp", -1)])
+        await index_manager.ensure(database)
+        indexes = await database.air_quality_data.index_information()
+        results = await index_manager.report(database)
+        return indexes, results
+    finally:
+        await client.drop_database(TEST_DB_NAME)
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def report():
+    return asyncio.run(build_report())
+
+
+def test_obsolete_parameter_index_is_dropped(report):
+    indexes, _ = report
+    assert "parameter_1_timestamp_-1" not in indexes
+    for parameter in POLLUTANTS:
+        assert f"timestamp_-1_{parameter}_1_partial" in indexes
+
+
+def test_every_query_shape_is_explained(report):
+    _, results = report
+    assert {r["name"] for r in results} == {shape["name"] for shape in query_shapes()}
+
+
+def test_no_query_falls_back_to_collscan(report):
+    _, results = report
+    collscans = [r["name"] for r in results if r["collscan"]]
+    assert not collscans, f"COLLSCAN kullanan sorgular: {collscans}"
+
+
+def test_station_and_location_queries_use_their_indexes(report):
+    _, results = report
+    by_name = {r["name"]: r for r in results}
+    assert "meta.station_1_timestamp_-1" in by_name["istasyon_gecmisi"]["indexes"]
+    assert "location_2dsphere_timestamp_-1" in by_name["yakindaki_okumalar"]["indexes"]
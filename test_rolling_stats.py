@@ -0,0 +1,78 @@
+"""
+Kayan istatistiklerin pencere dışına çıkan ölçümleri unuttuğunu doğrular.
+
+Veritabanı gerektirmez; ölçümler bellekte eklenir.
+
+Kullanım:
+    python -m pytest test_rolling_stats.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.services.rolling_stats import RollingStatistics
+
+START = datetime(2024, 3, 1, 0, 0)
+
+
+def fill(stats, days, value_for_day, start=START):
+    """Her gün için saatte bir ölçüm ekler."""
+    for day in range(days):
+        for hour in range(24):
+            stats.add(1, "pm25", value_for_day(day), start + timedelta(days=day, hours=hour))
+
+
+def test_old_readings_stop_affecting_baseline():
+    stats = RollingStatistics(window_days=7)
+    # İlk 10 gün 100, sonraki 10 gün 20 civarı (sürüklenen istasyon)
+    fill(stats, 10, lambda day: 100.0)
+    fill(stats, 10, lambda day: 20.0 + day % 2, start=START + timedelta(days=10))
+
+    parameter_stats = stats.get(1, "pm25")
+    assert min(parameter_stats.days) >= (START + timedelta(days=19)).toordinal() - 7
+    assert parameter_stats.overall.mean == pytest.approx(20.5, abs=0.1)
+    assert parameter_stats.hourly_window(12).mean == pytest.approx(20.5, abs=0.1)
+
+
+def test_window_matches_fresh_warm_up():
+    rng = np.random.default_rng(3)
+    values = rng.gamma(4.0, 8.0, size=30 * 24)
+    timestamps = [START + timedelta(hours=i) for i in range(len(values))]
+
+    running = RollingStatistics(window_days=7)
+    for value, timestamp in zip(values, timestamps):
+        running.add(1, "pm25", float(value), timestamp)
+
+    # Yeniden başlatmada yalnızca pencere içindeki günler okunur
+    cutoff = timestamps[-1].toordinal() - 7
+    fresh = RollingStatistics(window_days=7)
+    for value, timestamp in zip(values, timestamps):
+        if timestamp.toordinal() >= cutoff:
+            fresh.add(1, "pm25", float(value), timestamp)
+
+    a, b = running.get(1, "pm25"), fresh.get(1, "pm25")
+    assert a.overall.count == b.overall.count
+    assert a.overall.mean == pytest.approx(b.overall.mean)
+    assert a.overall.std == pytest.approx(b.overall.std)
+    for hour in range(24):
+        assert a.hourly[hour].mean == pytest.approx(b.hourly[hour].mean)
+
+
+def test_get_expires_idle_station():
+    stats = RollingStatistics(window_days=7)
+    fill(stats, 3, lambda day: 50.0)
+    assert stats.get(1, "pm25").overall.count == 72
+
+    # İstasyon uzun süre veri göndermediyse eski günler sorguda silinir
+    later = START + timedelta(days=30)
+    assert stats.get(1, "pm25", later).overall.count == 0
+
+    # Pencereden eski bir ölçüm (ör. geç gelen veri) taban çizgisine eklenmez
+    stats.add(1, "pm25", 500.0, later)
+    stats.add(1, "pm25", 500.0, START)
+    assert stats.get(1, "pm25").overall.count == 1